@@ -1,211 +1,125 @@
 from flask import Flask, render_template, request, jsonify, send_from_directory
 import random
-from itertools import combinations
 import os
 import json
+import logging
+import multiprocessing
+
+from cards import SUITS, RANKS, CARD_FORMATS, Deck, encode_cards, decode_cards, format_cards, new_deck
+from hand_evaluator import evaluate5, hand_description, sort_hand, prepare_board, best_hand_cache
+from equity import estimate_equity
+from leaderboard_store import create_store
+from player_index import PlayerIndex
+from game_sessions import GameState, create_session_store
+from game_tokens import DIFFICULTIES, InvalidToken, create_game_tokens
+from eval_pool import EvalPoolTimeout, create_eval_pool
+from drills import generate_drills, ndjson_lines, parse_drill_options
+from deal_pool import create_deal_pool
+from metrics import metrics, install as install_metrics
+from rate_limit import create_rate_limiter, retry_after_header
+from http_cache import VersionedCache, encode_body, etag_matches
+from build_assets import BUILD_DIR, IMMUTABLE, create_built_assets
 
 app = Flask(__name__)
-
-# Example deck of cards
-SUITS = ['♥', '♦', '♣', '♠']
-RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
-DECK = [{'rank': rank, 'suit': suit} for suit in SUITS for rank in RANKS]
+# Per-route latency histograms and request counters, see /admin/metrics
+install_metrics(app)
+
+# Per-client token buckets on the write and evaluation routes, off unless
+# RATE_LIMITS turns them on (rate_limit.py)
+rate_limiter = create_rate_limiter()
+
+@app.before_request
+def _rate_limit():
+    if request.url_rule is None:
+        return None
+    route = request.url_rule.rule
+    retry_after = rate_limiter.check(route, rate_limiter.client(request.remote_addr, request.headers.get('X-Forwarded-For')))
+    if not retry_after:
+        return None
+    metrics.inc('rate_limited_total', route=route)
+    response = jsonify({"error": "Too many requests, please slow down."})
+    response.status_code = 429
+    response.headers['Retry-After'] = retry_after_header(retry_after)
+    return response
+
+@app.after_request
+def _compress_json(response):
+    # gzip/brotli for JSON bodies over COMPRESS_MIN_SIZE (see http_cache.py);
+    # streams and responses that come already encoded are left alone
+    if (response.status_code != 200 or response.mimetype != 'application/json'
+            or response.is_streamed or response.direct_passthrough or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    body, encoding = encode_body(response.get_data(), request.headers.get('Accept-Encoding'))
+    if encoding:
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+# Off unless EVAL_POOL_WORKERS is set (see eval_pool.py). The workers are
+# started and warmed here, in the serving process only: spawned workers that
+# re-import this module must not start pools of their own.
+eval_pool = create_eval_pool()
+if eval_pool.enabled and multiprocessing.parent_process() is None:
+    eval_pool.start()
+
+def card_format():
+    # Response card format: clients opt into compact cards ("Th" strings or ints)
+    # with ?cards=str|int or an X-Card-Format header; the default stays dicts.
+    # Requests may use any format, encode_cards() accepts all of them.
+    return negotiate_card_format(request.args.get('cards'), request.headers.get('X-Card-Format'))
+
+def negotiate_card_format(query_value, header_value):
+    fmt = query_value or header_value or 'dict'
+    return fmt if fmt in CARD_FORMATS else 'dict'
+
+def deal_game(num_players, num_flops, rng=random):
+    # A deck seeded from rng: the same rng state always deals the same game
+    deck = Deck(rng.getrandbits(64))
+
+    # Deal 4 cards to each player, then 5 cards per flop (3 exposed + 2 flipped).
+    # What is left of the deck iterates in the order it would be dealt
+    hands = [deck.deal_many(4) for _ in range(num_players)]
+    boards = [deck.deal_many(5) for _ in range(2 if num_flops == 2 else 1)]
+    return hands, boards, deck
 
 def generate_deck():
-    return [{'rank': rank, 'suit': suit} for suit in SUITS for rank in RANKS]
+    return new_deck()
 
 # Helper functions
 def create_deck():
-    suits = {'Hearts': '♥', 'Diamonds': '♦', 'Clubs': '♣', 'Spades': '♠'}
-    ranks = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
-    return [{'suit': suits[suit], 'rank': rank} for suit in suits for rank in ranks]
+    return new_deck()
 
 def shuffle_deck():
     deck = create_deck()  # Create a standard deck of cards
     random.shuffle(deck)  # Shuffle the deck
     return deck
 
-def compare_two_pair(hand1, hand2):
-    # hand1 and hand2 are tuples: (rank, [pair1, pair2, kicker])
-    # Higher pair wins, then lower pair, then kicker
-    for i in range(3):
-        if hand1[1][i] > hand2[1][i]:
-            return 1
-        elif hand1[1][i] < hand2[1][i]:
-            return -1
-    return 0
-
 def evaluate_hand(cards):
-    suits = [card['suit'] for card in cards]
-    ranks = [card['rank'] for card in cards]
-    rank_order = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
-    rank_counts = {rank: ranks.count(rank) for rank in ranks}
-    unique_suits = set(suits)
-
-    # Proper poker hand rankings (from lowest to highest):
-    # 0: High Card
-    # 1: One Pair
-    # 2: Two Pair
-    # 3: Three of a Kind
-    # 4: Straight
-    # 5: Flush
-    # 6: Full House
-    # 7: Four of a Kind
-    # 8: Straight Flush
-    # 9: Royal Flush
-
-    def card_sort_key(card):
-        return rank_order.index(card['rank'])
-
-    # Check for straight
-    rank_indices = sorted([rank_order.index(rank) for rank in ranks])
-    is_straight = False
-    straight_high = None
-    
-    # Check for regular straight
-    if len(set(rank_indices)) == 5 and rank_indices[-1] - rank_indices[0] == 4:
-        is_straight = True
-        straight_high = rank_order[rank_indices[-1]]
-    
-    # Check for A-2-3-4-5 straight (ace low)
-    elif set(rank_indices) == {0, 1, 2, 3, 12}:  # A, 2, 3, 4, 5
-        is_straight = True
-        straight_high = '5'  # In ace-low straight, 5 is the high card
-
-    # Check for flush
-    is_flush = len(unique_suits) == 1
-
-    # Check for straight flush / royal flush
-    if is_straight and is_flush:
-        if straight_high == 'A' and set(ranks) == {'10', 'J', 'Q', 'K', 'A'}:
-            return (9, "Royal Flush", sorted(cards, key=card_sort_key, reverse=True))
-        else:
-            return (8, f"Straight Flush, {straight_high} high", sorted(cards, key=card_sort_key, reverse=True))
-
-    # Four of a Kind
-    if 4 in rank_counts.values():
-        return (7, "Four of a Kind", sorted(cards, key=lambda card: (rank_counts[card['rank']], card_sort_key(card)), reverse=True))
-
-    # Full House
-    if 3 in rank_counts.values() and 2 in rank_counts.values():
-        return (6, "Full House", sorted(cards, key=lambda card: (rank_counts[card['rank']], card_sort_key(card)), reverse=True))
-
-    # Flush
-    if is_flush:
-        sorted_flush_cards = sorted(cards, key=card_sort_key, reverse=True)
-        high_card = sorted_flush_cards[0]['rank']
-        # Convert rank to readable format for flush high card
-        high_card_readable = high_card
-        if high_card == 'A':
-            high_card_readable = 'Ace'
-        elif high_card == 'K':
-            high_card_readable = 'King'
-        elif high_card == 'Q':
-            high_card_readable = 'Queen'
-        elif high_card == 'J':
-            high_card_readable = 'Jack'
-        return (5, f"{high_card_readable}-high Flush", sorted_flush_cards)
-
-    # Straight
-    if is_straight:
-        return (4, f"Straight, {straight_high}", sorted(cards, key=card_sort_key, reverse=True))
-
-    # Three of a Kind
-    if 3 in rank_counts.values():
-        return (3, "Three of a Kind", sorted(cards, key=lambda card: (rank_counts[card['rank']], card_sort_key(card)), reverse=True))
-
-    # Two Pair
-    if list(rank_counts.values()).count(2) == 2:
-        pairs = sorted([rank for rank, count in rank_counts.items() if count == 2], key=rank_order.index, reverse=True)
-        kicker = sorted([rank for rank, count in rank_counts.items() if count == 1], key=rank_order.index, reverse=True)[0]
-        return (2, [pairs[0], pairs[1], kicker], sorted(cards, key=card_sort_key, reverse=True))
-
-    # One Pair
-    if 2 in rank_counts.values():
-        pair_rank = max([rank for rank, count in rank_counts.items() if count == 2], key=lambda r: rank_order.index(r))
-        kickers = sorted([rank for rank, count in rank_counts.items() if count == 1], key=rank_order.index, reverse=True)[:3]
-        sorted_cards = (
-            [card for card in cards if card['rank'] == pair_rank] +
-            sorted([card for card in cards if card['rank'] != pair_rank], key=card_sort_key, reverse=True)
-        )
-        return (1, [pair_rank] + kickers, sorted_cards)
-
-    # High Card
-    return (0, "High Card", sorted(cards, key=card_sort_key, reverse=True))
+    # cards: five int cards. Returns (strength, hand_type, sorted_cards) where
+    # strength is the hand's equivalence class from hand_evaluator: a single
+    # int, higher is better and equal strengths are an exact tie.
+    strength = evaluate5(*cards)
+    return (strength, hand_description(strength), sort_hand(cards))
 
 def compare_hands(hand1, hand2):
-    # hand1 and hand2 are tuples: (rank, tiebreakers, sorted_cards)
-    rank_order = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
-    def safe_index(val):
-        if val in rank_order:
-            return rank_order.index(val)
-        return -1
-
-    if hand1[0] > hand2[0]:
-        return 1
-    elif hand1[0] < hand2[0]:
-        return -1
-    # If both are two pair, compare pairs and kicker by rank_order
-    if hand1[0] == 2:  # Two Pair
-        # Compare each value in tiebreakers (pair1, pair2, kicker)
-        for a, b in zip(hand1[1], hand2[1]):
-            if safe_index(a) > safe_index(b):
-                return 1
-            elif safe_index(a) < safe_index(b):
-                return -1
-        # If all tiebreakers are equal, compare sorted_cards by suit for deterministic result
-        for card1, card2 in zip(hand1[2], hand2[2]):
-            if safe_index(card1['rank']) > safe_index(card2['rank']):
-                return 1
-            elif safe_index(card1['rank']) < safe_index(card2['rank']):
-                return -1
-            # If ranks are equal, compare suit unicode (for deterministic but arbitrary order)
-            if card1['suit'] > card2['suit']:
-                return 1
-            elif card1['suit'] < card2['suit']:
-                return -1
-        return 0
-    # For One Pair, High Card, etc, compare tiebreakers by rank_order
-    for a, b in zip(hand1[1], hand2[1]):
-        if safe_index(a) > safe_index(b):
-            return 1
-        elif safe_index(a) < safe_index(b):
-            return -1
-    # If still tied, compare sorted_cards by rank then suit
-    for card1, card2 in zip(hand1[2], hand2[2]):
-        if safe_index(card1['rank']) > safe_index(card2['rank']):
-            return 1
-        elif safe_index(card1['rank']) < safe_index(card2['rank']):
-            return -1
-        if card1['suit'] > card2['suit']:
-            return 1
-        elif card1['suit'] < card2['suit']:
-            return -1
-    return 0
+    # hand1 and hand2 are tuples: (strength, hand_type, sorted_cards)
+    return (hand1[0] > hand2[0]) - (hand1[0] < hand2[0])
 
 def determine_winner(hand1, hand2, flop):
-    # Define rank order for comparing card ranks
-    rank_order = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+    # Accepts JSON dict cards or int cards; everything below works on ints
+    hand1 = encode_cards(hand1)
+    hand2 = encode_cards(hand2)
+    flop = encode_cards(flop)
 
-    # Generate all valid combinations of 2 player cards + 3 flop cards
-    player1_combinations = [
-        list(comb) for comb in combinations(hand1 + flop, 5)
-        if sum(1 for card in comb if card in hand1) == 2  # Ensure exactly 2 cards are from Player 1's hand
-    ]
-    player2_combinations = [
-        list(comb) for comb in combinations(hand2 + flop, 5)
-        if sum(1 for card in comb if card in hand2) == 2  # Ensure exactly 2 cards are from Player 2's hand
-    ]
-
-    # Evaluate all combinations and find the best hand
-    player1_best = max(player1_combinations, key=lambda hand: evaluate_hand(hand)[0:2])
-    player2_best = max(player2_combinations, key=lambda hand: evaluate_hand(hand)[0:2])
+    # Best hand using exactly 2 player cards + 3 flop cards
+    board = prepare_board(flop)
+    player1_eval = evaluate_hand(best_hand_cache.best_hand(hand1, board)[1])
+    player2_eval = evaluate_hand(best_hand_cache.best_hand(hand2, board)[1])
 
-    player1_eval = evaluate_hand(player1_best)
-    player2_eval = evaluate_hand(player2_best)
-
-    print("Player 1 Evaluated Hand:", player1_eval[2], "Type:", player1_eval[1], "Score:", player1_eval[0])
-    print("Player 2 Evaluated Hand:", player2_eval[2], "Type:", player2_eval[1], "Score:", player2_eval[0])
+    if app.logger.isEnabledFor(logging.DEBUG):
+        app.logger.debug("Player 1 Evaluated Hand: %s Type: %s Score: %s", format_cards(player1_eval[2]), player1_eval[1], player1_eval[0])
+        app.logger.debug("Player 2 Evaluated Hand: %s Type: %s Score: %s", format_cards(player2_eval[2]), player2_eval[1], player2_eval[0])
 
     cmp = compare_hands(player1_eval, player2_eval)
     if cmp > 0:
@@ -216,208 +130,325 @@ def determine_winner(hand1, hand2, flop):
         return "Tie", player1_eval[1], player1_eval[2]
 
 def determine_winner_multiple(players, flop):
-    print("Debug: Players data:", players)
-    print("Debug: Flop data:", flop)
+    # players: [{'cards': [...]}, ...] or plain lists of cards; cards may be dicts or ints
+    return determine_winner_boards(players, [flop])[0]
+
+def determine_winner_boards(players, boards, cached=True):
+    # determine_winner_multiple() for several boards at once, so a big table's
+    # evaluations can go to the process pool together. cached=False keeps
+    # one-off deals (drills) out of best_hand_cache
+    boards = [encode_cards(board) for board in boards]
+    if app.logger.isEnabledFor(logging.DEBUG):
+        app.logger.debug("Players data: %s", players)
+        for board in boards:
+            app.logger.debug("Flop data: %s", format_cards(board))
+
+    hands = []
+    for player in players:
+        player_hand = player.get('cards', []) if isinstance(player, dict) else player
+        if not isinstance(player_hand, list):
+            app.logger.warning("Player hand is not a list: %s", player_hand)
+            hands.append(None)
+            continue
+        hands.append(encode_cards(player_hand))
+
+    return rank_boards(hands, boards, cached)
+
+def rank_hands(hands, board):
+    # hands: int hole cards per seat (None for a seat to skip); board: 3-5 int cards.
+    # Returns (winner or list of tied winners, hand_type, best hand as int cards).
+    return rank_boards(hands, [board])[0]
+
+def rank_boards(hands, boards, cached=True):
+    # rank_hands() for each board. The board triples and their rank/suit masks
+    # are shared by every player
+    boards = [prepare_board(board) for board in boards]
+
+    # For bombpot poker, players must use exactly 2 cards from their 4-card hand.
+    # Big tables go to the process pool (when enabled) chunked by player and board
+    jobs = [(hand, board) for board in boards for hand in hands if hand is not None]
+    results = iter(eval_pool.best_hands(jobs, best_hand_cache if cached else None))
+    return [
+        pick_winners([next(results) if hand is not None else None for hand in hands])
+        for board in boards
+    ]
 
-    best_score = -1
-    winners = []  # Changed to list to support multiple winners
-    best_hand_type = None
+def pick_winners(results):
+    # results: (strength, best five) per seat, None for a skipped seat.
+    # Returns (winner or list of tied winners, hand_type, best hand as int cards).
     player_evaluations = []  # Store all evaluations for tie detection
-
-    for index, player in enumerate(players):
-        player_hand = player.get('cards', [])
-        if not isinstance(player_hand, list):
-            print("Error: Player hand is not a list:", player_hand)
+    for index, result in enumerate(results):
+        if result is None:
             continue
+        best_score_for_player, best_combination_for_player = result
 
-        # For bombpot poker, players must use exactly 2 cards from their 4-card hand
-        # Generate all combinations of 2 cards from the player's 4 cards
-        player_card_combinations = list(combinations(player_hand, 2))
-        
-        best_score_for_player = -1
-        best_combination_for_player = None
-        best_eval_for_player = None
-        
-        # Try each combination of 2 cards from player's hand
-        for player_two_cards in player_card_combinations:
-            # Generate all combinations of 5 cards (2 from player + 3 from flop)
-            flop_combinations = list(combinations(flop, 3))
-            
-            for flop_three_cards in flop_combinations:
-                # Combine 2 player cards + 3 flop cards
-                five_card_hand = list(player_two_cards) + list(flop_three_cards)
-                score, hand_type, sorted_cards = evaluate_hand(five_card_hand)
-                
-                if score > best_score_for_player:
-                    best_score_for_player = score
-                    best_combination_for_player = five_card_hand
-                    best_eval_for_player = (score, hand_type, sorted_cards)
-                elif score == best_score_for_player:
-                    # If scores are equal, use compare_hands to determine the better hand
-                    current_eval = (score, hand_type, sorted_cards)
-                    if compare_hands(current_eval, best_eval_for_player) > 0:
-                        best_combination_for_player = five_card_hand
-                        best_eval_for_player = current_eval
-
-        if best_combination_for_player and best_eval_for_player:
+        if best_combination_for_player:
             player_evaluations.append({
                 'player': f"Player {index + 1}",
                 'score': best_score_for_player,
-                'hand_type': best_eval_for_player[1],
-                'hand': best_combination_for_player,
-                'evaluation': best_eval_for_player
+                'hand': best_combination_for_player
             })
 
     if not player_evaluations:
         raise ValueError("No valid hands to evaluate.")
 
-    # Sort players using compare_hands for proper comparison
-    from functools import cmp_to_key
-    
-    def compare_player_evaluations(p1, p2):
-        # Use compare_hands to compare the evaluation tuples
-        return -compare_hands(p1['evaluation'], p2['evaluation'])  # Negative for descending order
-    
-    player_evaluations.sort(key=cmp_to_key(compare_player_evaluations))
-    
-    # Find all players with the best hand
-    best_eval = player_evaluations[0]['evaluation']
-    winners = []
-    
-    for player_eval in player_evaluations:
-        # Compare hands using the compare_hands function
-        if compare_hands(player_eval['evaluation'], best_eval) == 0:
-            winners.append(player_eval['player'])
-        else:
-            break  # Since sorted, no need to check further
-    
-    # Return winners list and hand info
+    # Strengths are plain ints, so the best hands are simply the highest scores
+    player_evaluations.sort(key=lambda p: p['score'], reverse=True)
+    best_score = player_evaluations[0]['score']
+    winners = [p['player'] for p in player_evaluations if p['score'] == best_score]
+    # The description is only built for the winning hand
+    best_hand_type = hand_description(best_score)
+
+    # Return winners list and hand info (best hand is int cards, decode for JSON)
     if len(winners) == 1:
-        return winners[0], player_evaluations[0]['hand_type'], player_evaluations[0]['hand']
+        return winners[0], best_hand_type, player_evaluations[0]['hand']
     else:
         # Multiple winners (tie)
-        return winners, player_evaluations[0]['hand_type'], player_evaluations[0]['hand']
-
-LEADERBOARD_FILE = os.path.join(os.path.dirname(__file__), "leaderboard.json")
+        return winners, best_hand_type, player_evaluations[0]['hand']
+
+def determine_winners_batch(deals):
+    # Score many deals in one pass. Each deal is {'players': [...], 'boards': [board, ...]}
+    # (or 'first_flop'/'second_flop' like /reveal_winner), boards having 3-5 cards.
+    # Results come back in the same order; a bad deal gets {'error': ...} in its slot
+    # instead of failing the whole batch.
+    parsed = []
+    for deal in deals:
+        try:
+            if not isinstance(deal, dict):
+                raise ValueError("Deal must be an object")
+            players = deal.get('players')
+            if not players or not isinstance(players, list):
+                raise ValueError("Invalid or missing players data")
+            boards = deal.get('boards')
+            if boards is None:
+                boards = [board for board in (deal.get('first_flop'), deal.get('second_flop')) if board]
+            if not boards or not isinstance(boards, list):
+                raise ValueError("Invalid or missing boards data")
+
+            hands = [encode_cards(player.get('cards', []) if isinstance(player, dict) else player) for player in players]
+            prepared = []
+            for board in boards:
+                if not isinstance(board, list) or len(board) < 3 or len(board) > 5:
+                    raise ValueError("Each board must have 3-5 cards")
+                prepared.append(prepare_board(encode_cards(board)))
+            parsed.append((hands, prepared))
+        except (ValueError, TypeError, AttributeError) as e:
+            parsed.append(str(e))
+
+    # Every (player, board) of every deal in one go, so the pool gets even chunks
+    jobs = [
+        (hand, board)
+        for deal in parsed if not isinstance(deal, str)
+        for board in deal[1]
+        for hand in deal[0]
+    ]
+    # One-off deals: kept out of best_hand_cache, which is there for the
+    # reveals of live games and would only lose those entries to these
+    evaluated = iter(eval_pool.best_hands(jobs, None))
+
+    results = []
+    for deal in parsed:
+        if isinstance(deal, str):
+            results.append({'error': deal})
+            continue
+        hands, boards = deal
+        board_results = [[next(evaluated) for _ in hands] for _ in boards]
+        try:
+            scored = []
+            for board_result in board_results:
+                winner, hand_type, best = pick_winners(board_result)
+                scored.append({'winner': winner, 'hand_type': hand_type, 'best_hand': best})
+            results.append({'boards': scored})
+        except ValueError as e:
+            results.append({'error': str(e)})
+    return results
+
+MAX_BATCH_DEALS = 10000
+
+# Ready-to-serve games for /start_game with every street already scored.
+# Off unless DEAL_POOL_SIZE is set (see deal_pool.py): every game is then
+# dealt on demand and no producer thread is started
+deal_pool = create_deal_pool(deal_game, pick_winners)
+
+# Leaderboard storage lives in leaderboard_store.py (SQLite by default,
+# LEADERBOARD_BACKEND=json for the original leaderboard.json file)
+_leaderboard_store = None
+
+def get_leaderboard_store():
+    global _leaderboard_store
+    if _leaderboard_store is None:
+        _leaderboard_store = create_store()
+    return _leaderboard_store
+
+# Per-player ranks, brought up to date with the store before every read
+_player_index = PlayerIndex()
+
+def player_index():
+    _player_index.sync(get_leaderboard_store())
+    return _player_index
 
 def load_leaderboard():
-    # Always try to load from disk, never cache in memory
-    if not os.path.exists(LEADERBOARD_FILE):
-        # If file does not exist, create an empty file
-        with open(LEADERBOARD_FILE, "w", encoding="utf-8") as f:
-            json.dump([], f)
-        return []
-    try:
-        with open(LEADERBOARD_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        # If file is corrupted, reset to empty list
-        with open(LEADERBOARD_FILE, "w", encoding="utf-8") as f:
-            json.dump([], f)
-        return []
+    with metrics.timer('leaderboard_duration_ms', op='load'):
+        return get_leaderboard_store().load()
 
 def save_leaderboard(leaderboard):
+    with metrics.timer('leaderboard_duration_ms', op='save'):
+        get_leaderboard_store().save(leaderboard)
+
+# --- Route logic ---
+#
+# Each handler below takes the parsed JSON body (or query value) and the card
+# format and returns (payload, status). The Flask routes further down and the
+# ASGI app in asgi.py are thin wrappers around them, so both serving modes
+# expose the same API.
+
+def handle_leaderboard(difficulty):
+    # Entries with at least 20 flops, best accuracy then most flops first, top 10 only
+    with metrics.timer('leaderboard_duration_ms', op='top'):
+        leaderboard = get_leaderboard_store().top(difficulty, limit=10)
+    return {"leaderboard": leaderboard}, 200
+
+def _int_arg(query, key, default):
     try:
-        with open(LEADERBOARD_FILE, "w", encoding="utf-8") as f:
-            json.dump(leaderboard, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print("Error saving leaderboard:", e)
-
-@app.route('/leaderboard', methods=['GET'])
-def get_leaderboard():
-    # Get difficulty parameter from query string
-    difficulty = request.args.get('difficulty', 'easy')
-    
-    leaderboard = load_leaderboard()
-    # Filter by difficulty and minimum 20 flops
-    leaderboard = [
-        entry for entry in leaderboard 
-        if entry.get("total", 0) >= 20 and entry.get("difficulty", "easy") == difficulty
-    ]
-    # Sort by accuracy (correct/total), then by total (descending)
-    leaderboard = sorted(
-        leaderboard,
-        key=lambda x: ((x.get("correct", 0) / x.get("total", 1)) if x.get("total", 0) > 0 else 0, x.get("total", 0)),
-        reverse=True
-    )
-    # Only show top 10
-    leaderboard = leaderboard[:10]
-    return jsonify({"leaderboard": leaderboard})
+        return int(query.get(key, default))
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} must be an integer")
 
-@app.route('/update_leaderboard', methods=['POST'])
-def update_leaderboard():
-    data = request.get_json()
+def handle_leaderboard_players(query):
+    # One page of players (best run each, with lifetime totals), ranked like /leaderboard
+    difficulty = query.get('difficulty', 'easy')
+    try:
+        page = _int_arg(query, 'page', 1)
+        per_page = _int_arg(query, 'per_page', 20)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    with metrics.timer('leaderboard_duration_ms', op='players'):
+        players, count = player_index().page(difficulty, page, per_page)
+    return {"players": players, "page": max(page, 1), "ranked_players": count}, 200
+
+def handle_player_rank(query):
+    # A player's rank and rollup, plus the players ranked around them
+    name = (query.get('name') or '').strip()
+    difficulty = query.get('difficulty', 'easy')
+    if not name:
+        return {"error": "name is required"}, 400
+    try:
+        radius = _int_arg(query, 'radius', 5)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    with metrics.timer('leaderboard_duration_ms', op='rank'):
+        index = player_index()
+        player = index.player(name, difficulty)
+        around, _ = index.around(name, difficulty, radius)
+    if player is None:
+        return {"error": "No runs for this name"}, 404
+    return {"player": player, "around": around}, 200
+
+# ASSETS_MODE=built serves the page and its fingerprinted, precompressed
+# assets from `python build_assets.py`; otherwise the template is rendered
+# once and kept
+built_assets = create_built_assets()
+_index_page = None
+
+# Rendered /leaderboard bodies per difficulty, with their compressed forms,
+# valid for as long as the store's version() stays the same
+leaderboard_cache = VersionedCache()
+
+def leaderboard_response(difficulty, if_none_match=None, accept_encoding=None):
+    # (body bytes, status, headers) for GET /leaderboard. The ETag is the
+    # store's version: a poll that sends it back gets a 304, and until the
+    # leaderboard changes every other poll is answered from leaderboard_cache
+    version = get_leaderboard_store().version()
+    cached = leaderboard_cache.get(difficulty, version)
+    if cached is None:
+        payload, status = handle_leaderboard(difficulty)
+        cached = leaderboard_cache.put(difficulty, version, (app.json.dumps(payload) + '\n').encode('utf-8'))
+    body, encoding, etag = cached.encoded(accept_encoding)
+    headers = [('ETag', etag), ('Cache-Control', 'no-cache'), ('Vary', 'Accept-Encoding')]
+    if etag_matches(if_none_match, etag) or etag_matches(if_none_match, cached.etag):
+        metrics.inc('leaderboard_not_modified_total')
+        return b'', 304, headers
+    if encoding:
+        headers.append(('Content-Encoding', encoding))
+    return body, 200, headers
+
+def handle_update_leaderboard(data):
     name = data.get("name", "").strip()
     correct = int(data.get("correct", 0))
     total = int(data.get("total", 0))
     difficulty = data.get("difficulty", "easy")
 
     if not name or total < 20:
-        return jsonify({"error": "Invalid name or not enough flops"}), 400
+        return {"error": "Invalid name or not enough flops"}, 400
+    if difficulty not in DIFFICULTIES:
+        return {"error": f"difficulty must be one of {', '.join(DIFFICULTIES)}"}, 400
 
-    leaderboard = load_leaderboard()
     # Always allow multiple entries for the same name (append new entry)
-    leaderboard.append({
-        "name": name,
-        "correct": correct,
-        "total": total,
-        "difficulty": difficulty
-    })
-    save_leaderboard(leaderboard)
-    return jsonify({"success": True})
-
-@app.route('/favicon.ico')
-def favicon():
-    # Return a 204 No Content response for favicon requests
-    # This prevents 404 errors in the browser console
-    return '', 204
-
-@app.route('/game-options')
-@app.route('/')
-def index():
-    return render_template('index.html')
+    with metrics.timer('leaderboard_duration_ms', op='add_entry'):
+        get_leaderboard_store().add_entry({
+            "name": name,
+            "correct": correct,
+            "total": total,
+            "difficulty": difficulty
+        })
+    return {"success": True}, 200
 
-@app.route('/start_game', methods=['POST'])
-def start_game():
-    data = request.json
+def handle_start_game(data, fmt):
     num_players = data.get('num_players', 4)  # Changed default from 2 to 4
     num_flops = data.get('num_flops', 2)  # Default to 2 flops
     difficulty = data.get('difficulty', 'easy')  # Get difficulty level
 
-    # Shuffle the deck
-    deck = DECK[:]
-    random.shuffle(deck)
+    if data.get('token'):
+        # Nothing kept on the server: the signed token is the game
+        try:
+            token, state = game_tokens.new_game(num_players, num_flops, difficulty)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        return public_game(state, fmt, token=token), 200
+
+    game = deal_pool.take(num_players, num_flops, difficulty)
+    if game is None:
+        hands, boards, deck = deal_game(num_players, num_flops)
+    else:
+        hands, boards, deck = game.hands, game.boards, game.deck
+
+    if data.get('session'):
+        # Keep the game on the server and only send what the player may see
+        revealed = [5 if difficulty == 'easy' else 3] * len(boards)
+        state = GameState(hands, boards, revealed, difficulty, game.scores if game is not None else None)
+        return public_game(state, fmt, game_id=game_sessions.create(state)), 200
 
-    # Deal 4 cards to each player
-    players = [{'cards': [deck.pop() for _ in range(4)]} for _ in range(num_players)]
+    if game is not None:
+        # The client posts the cards back on every reveal: have the answers cached
+        game.prefill(best_hand_cache)
+
+    players = [{'cards': decode_cards(hand, fmt)} for hand in hands]
 
     # Create the flops with 3 exposed cards and 2 flipped cards
     # For easy mode, we'll still structure it the same way but the frontend will handle display
     first_flop = {
-        'exposed': [deck.pop() for _ in range(3)],
-        'flipped': [deck.pop() for _ in range(2)]
+        'exposed': decode_cards(boards[0][:3], fmt),
+        'flipped': decode_cards(boards[0][3:], fmt)
     }
     second_flop = {
-        'exposed': [deck.pop() for _ in range(3)],
-        'flipped': [deck.pop() for _ in range(2)]
+        'exposed': decode_cards(boards[1][:3], fmt),
+        'flipped': decode_cards(boards[1][3:], fmt)
     } if num_flops == 2 else None
 
-    return jsonify({
+    return {
         'players': players,
         'first_flop': first_flop,
         'second_flop': second_flop,
-        'deck': deck,
+        'deck': decode_cards(deck, fmt),
         'difficulty': difficulty
-    })
+    }, 200
 
-@app.route('/reveal_card', methods=['POST'])
-def reveal_card():
+def handle_reveal_card(data, fmt):
     try:
-        data = request.get_json()
         app.logger.debug(f"Received payload in /reveal_card: {data}")  # Debugging
 
         if not data:
-            return jsonify({'error': 'Invalid request payload. No data provided.'}), 400
+            return {'error': 'Invalid request payload. No data provided.'}, 400
 
         flop = data.get('flop')
         index = data.get('index')
@@ -428,11 +459,11 @@ def reveal_card():
 
         # Only allow reveal if both predictions are made (non-empty)
         if not prediction_first or not prediction_second:
-            return jsonify({'error': 'Both player predictions must be made before revealing cards.'}), 403
+            return {'error': 'Both player predictions must be made before revealing cards.'}, 403
 
         if not flop or not isinstance(index, int) or not flops:
             app.logger.error(f"Invalid payload structure: {data}")  # Debugging
-            return jsonify({'error': 'Invalid request payload. Missing or invalid "flop", "index", or "flops" key.'}), 400
+            return {'error': 'Invalid request payload. Missing or invalid "flop", "index", or "flops" key.'}, 400
 
         # Enforce: 5th card cannot be revealed until both 4th cards are revealed
         # Only applies if both flops exist and have 2 flipped cards each
@@ -445,231 +476,520 @@ def reveal_card():
             # Only allow if the other flop has no flipped cards left (i.e., its 4th card is already revealed)
             other_flop = "second_flop" if flop == "first_flop" else "first_flop"
             if len(flops.get(other_flop, {}).get("flipped", [])) > 1:
-                return jsonify({'error': 'You must reveal the 4th card on both flops before revealing the 5th card.'}), 403
+                return {'error': 'You must reveal the 4th card on both flops before revealing the 5th card.'}, 403
 
         if flop not in flops or index >= len(flops[flop]['flipped']):
             app.logger.error(f"Invalid flop or index: flop={flop}, index={index}, flops={flops}")  # Debugging
-            return jsonify({'error': 'Invalid flop or index.'}), 400
+            return {'error': 'Invalid flop or index.'}, 400
 
         # Reveal the card
         revealed_card = flops[flop]['flipped'].pop(index)
         flops[flop]['exposed'].append(revealed_card)
 
+        # Send the cards back in the format the client asked for
+        for board in flops.values():
+            if isinstance(board, dict):
+                for part in ('exposed', 'flipped'):
+                    board[part] = decode_cards(encode_cards(board.get(part, [])), fmt)
+
         app.logger.debug(f"Updated flops after revealing card: {flops}")  # Debugging
-        return jsonify({'flops': flops})  # Return the updated flops
+        return {'flops': flops}, 200  # Return the updated flops
+    except ValueError as e:
+        return {'error': f'Invalid card data: {e}'}, 400
     except Exception as e:
         app.logger.error(f"Error in reveal_card: {e}")
-        return jsonify({'error': 'An unexpected error occurred.'}), 500
+        return {'error': 'An unexpected error occurred.'}, 500
 
-@app.route('/determine_winner', methods=['POST'])
-def determine_winner_route():
-    data = request.json
-    player1_hand = data['player1_hand']
-    player2_hand = data['player2_hand']
-    first_flop = data['first_flop']
-    second_flop = data['second_flop']
+def handle_determine_winner(data, fmt):
+    player1_hand = encode_cards(data['player1_hand'])
+    player2_hand = encode_cards(data['player2_hand'])
+    first_flop = encode_cards(data['first_flop'])
+    second_flop = encode_cards(data['second_flop'])
 
     # Determine winners for each flop
     winner_first, hand_type_first, best_hand_first = determine_winner(player1_hand, player2_hand, first_flop)
     winner_second, hand_type_second, best_hand_second = determine_winner(player1_hand, player2_hand, second_flop)
 
     # Debugging: Print all combinations and the winning hands to the terminal
-    print("First Flop Winning Hand:")
-    print(best_hand_first)
-    print("Second Flop Winning Hand:")
-    print(best_hand_second)
+    if app.logger.isEnabledFor(logging.DEBUG):
+        app.logger.debug("First Flop Winning Hand: %s", format_cards(best_hand_first))
+        app.logger.debug("Second Flop Winning Hand: %s", format_cards(best_hand_second))
 
-    return jsonify({
+    return {
         'winner_first': winner_first,
         'hand_type_first': hand_type_first,
-        'best_hand_first': best_hand_first,
+        'best_hand_first': decode_cards(best_hand_first, fmt),
         'winner_second': winner_second,
         'hand_type_second': hand_type_second,
-        'best_hand_second': best_hand_second
-    })
-
-@app.route('/reveal_turn', methods=['POST'])
-def reveal_turn():
-    data = request.json
-    deck = data['deck']
-    first_flop = data['first_flop']
-    second_flop = data['second_flop']
+        'best_hand_second': decode_cards(best_hand_second, fmt)
+    }, 200
+
+def handle_next_street(data, fmt, action='reveal_turn'):
+    # /reveal_turn and /reveal_river: the next card of the deck goes on each flop
+    if data.get('token'):
+        # A token game's boards are dealt from its seed, there is no deck to send
+        return handle_game_action(dict(data, action=action), fmt)
+    deck = encode_cards(data['deck'])
+    first_flop = encode_cards(data['first_flop'])
+    second_flop = encode_cards(data['second_flop'])
 
     first_flop.append(deck.pop(0))
     second_flop.append(deck.pop(0))
 
-    return jsonify({
-        'first_flop': first_flop,
-        'second_flop': second_flop,
-        'deck': deck
-    })
-
-@app.route('/reveal_river', methods=['POST'])
-def reveal_river():
-    data = request.json
-    deck = data['deck']
-    first_flop = data['first_flop']
-    second_flop = data['second_flop']
+    return {
+        'first_flop': decode_cards(first_flop, fmt),
+        'second_flop': decode_cards(second_flop, fmt),
+        'deck': decode_cards(deck, fmt)
+    }, 200
 
-    first_flop.append(deck.pop(0))
-    second_flop.append(deck.pop(0))
-
-    return jsonify({
-        'first_flop': first_flop,
-        'second_flop': second_flop,
-        'deck': deck
-    })
-
-@app.route('/reveal_winner', methods=['POST'])
-def reveal_winner():
+def handle_reveal_winner(data, fmt):
     try:
-        data = request.get_json()
-        print("Data received in /reveal_winner:", data)  # Debugging: Log the received data
+        app.logger.debug("Data received in /reveal_winner: %s", data)  # Debugging: Log the received data
 
         # Validate required fields
         if not data:
-            return jsonify({'error': 'No data received'}), 400
-            
+            return {'error': 'No data received'}, 400
+
         players = data.get('players')
         first_flop = data.get('first_flop')
         second_flop = data.get('second_flop')
         prediction_first = data.get('prediction_first')
         prediction_second = data.get('prediction_second')
-        
+
         # Validate all required fields are present
         if not players or not isinstance(players, list):
-            return jsonify({'error': 'Invalid or missing players data'}), 400
+            return {'error': 'Invalid or missing players data'}, 400
         if first_flop is None or not isinstance(first_flop, list):
-            return jsonify({'error': 'Invalid or missing first_flop data'}), 400
+            return {'error': 'Invalid or missing first_flop data'}, 400
         if second_flop is None or not isinstance(second_flop, list):
-            return jsonify({'error': 'Invalid or missing second_flop data'}), 400
-            
+            return {'error': 'Invalid or missing second_flop data'}, 400
+
         # Allow 3, 4, or 5 cards for partial winner checking
         if len(first_flop) < 3 or len(first_flop) > 5:
-            return jsonify({'error': f'First flop must have 3-5 cards, got {len(first_flop)}'}), 400
+            return {'error': f'First flop must have 3-5 cards, got {len(first_flop)}'}, 400
         if len(second_flop) < 3 or len(second_flop) > 5:
-            return jsonify({'error': f'Second flop must have 3-5 cards, got {len(second_flop)}'}), 400
+            return {'error': f'Second flop must have 3-5 cards, got {len(second_flop)}'}, 400
+
+        # Convert the JSON cards to ints once; everything below works on ints
+        try:
+            players = [encode_cards(player.get('cards', [])) for player in players]
+            first_flop = encode_cards(first_flop)
+            second_flop = encode_cards(second_flop)
+        except (ValueError, AttributeError, TypeError) as e:
+            return {'error': f'Invalid card data: {e}'}, 400
 
         # Debugging: Log the received predictions
-        print("Prediction for First Flop:", prediction_first)
-        print("Prediction for Second Flop:", prediction_second)
+        app.logger.debug("Prediction for First Flop: %s", prediction_first)
+        app.logger.debug("Prediction for Second Flop: %s", prediction_second)
 
         # Process the data and determine the winners
         # Handle cases where we might have less than 5 cards (for intermediate updates)
         winner_first = None
         hand_type_first = None
         best_hand_first = None
-        
+
         winner_second = None
         hand_type_second = None
         best_hand_second = None
-        
-        # Only calculate winners if we have at least 3 cards
-        if len(first_flop) >= 3:
-            # Pad with dummy cards if less than 5 for evaluation
-            eval_first_flop = first_flop[:]
-            while len(eval_first_flop) < 5:
-                # Add dummy cards that won't affect hand evaluation
-                eval_first_flop.append({'rank': '2', 'suit': '♣'})
-            
-            winner_first, hand_type_first, best_hand_first = determine_winner_multiple(players, eval_first_flop)
-        
-        if len(second_flop) >= 3:
-            # Pad with dummy cards if less than 5 for evaluation
-            eval_second_flop = second_flop[:]
-            while len(eval_second_flop) < 5:
-                # Add dummy cards that won't affect hand evaluation
-                eval_second_flop.append({'rank': '2', 'suit': '♦'})
-            
-            winner_second, hand_type_second, best_hand_second = determine_winner_multiple(players, eval_second_flop)
+
+        # Partial boards (3 or 4 cards) are evaluated as they are: the best
+        # 2 + 3 among the cards actually showing. Both boards go together so a
+        # big table can be spread over the evaluation pool
+        (
+            (winner_first, hand_type_first, best_hand_first),
+            (winner_second, hand_type_second, best_hand_second)
+        ) = determine_winner_boards(players, [first_flop, second_flop])
 
         # Check if the predictions were correct
-        # For ties, check if prediction is in the winners list
-        prediction_correct_first = False
-        prediction_correct_second = False
-        
-        if winner_first:
-            if isinstance(winner_first, list):
-                prediction_correct_first = prediction_first in winner_first
-            else:
-                prediction_correct_first = prediction_first == winner_first
-        
-        if winner_second:
-            if isinstance(winner_second, list):
-                prediction_correct_second = prediction_second in winner_second
-            else:
-                prediction_correct_second = prediction_second == winner_second
+        prediction_correct_first = prediction_matches(prediction_first, winner_first)
+        prediction_correct_second = prediction_matches(prediction_second, winner_second)
 
         # Debugging: Log the results
-        print("Winner First Flop:", winner_first, hand_type_first)
-        print("Winner Second Flop:", winner_second, hand_type_second)
+        app.logger.debug("Winner First Flop: %s %s", winner_first, hand_type_first)
+        app.logger.debug("Winner Second Flop: %s %s", winner_second, hand_type_second)
 
-        return jsonify({
+        return {
             "winner_first": winner_first,
             "hand_type_first": hand_type_first,
-            "best_hand_first": best_hand_first,
+            "best_hand_first": decode_cards(best_hand_first, fmt) if best_hand_first else best_hand_first,
             "prediction_correct_first": prediction_correct_first,
             "winner_second": winner_second,
             "hand_type_second": hand_type_second,
-            "best_hand_second": best_hand_second,
+            "best_hand_second": decode_cards(best_hand_second, fmt) if best_hand_second else best_hand_second,
             "prediction_correct_second": prediction_correct_second
-        })
-        
+        }, 200
+
+    except EvalPoolTimeout as e:
+        return {'error': str(e)}, 503
     except Exception as e:
-        print(f"Error in /reveal_winner: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({'error': f'Server error: {str(e)}'}), 500
+        app.logger.exception(f"Error in /reveal_winner: {e}")
+        return {'error': f'Server error: {str(e)}'}, 500
+
+def prediction_matches(prediction, winner):
+    # For ties, check if prediction is in the winners list
+    if not winner:
+        return False
+    if isinstance(winner, list):
+        return prediction in winner
+    return prediction == winner
+
+# --- Server-side game sessions (start_game with "session": true) and
+# stateless signed game tokens (start_game with "token": true) ---
+
+game_sessions = create_session_store()
+# GAME_TOKEN_SECRET signs the tokens, it must be the same on every worker
+game_tokens = create_game_tokens(deal_game)
+BOARD_KEYS = ['first_flop', 'second_flop']
+
+def public_game(state, fmt='dict', game_id=None, token=None):
+    # What the client sees of a session or token game: no deck and no face-down cards
+    game = {'game_id': game_id} if token is None else {'token': token}
+    game.update({
+        'players': [{'cards': decode_cards(hand, fmt)} for hand in state.hands],
+        'difficulty': state.difficulty
+    })
+    for board_index, key in enumerate(BOARD_KEYS):
+        game[key] = {
+            'exposed': decode_cards(state.exposed(board_index), fmt),
+            'hidden': state.hidden_count(board_index)
+        } if board_index < len(state.boards) else None
+    return game
+
+def handle_game_action(data, fmt):
+    # Play a session game: {"game_id": ..., "action": "reveal_card" | "reveal_turn" |
+    # "reveal_river" | "reveal_winner", plus "flop"/"index" and the predictions}.
+    # Token games send {"token": ...} instead and get the updated token back
+    if not data:
+        return {'error': 'Invalid request payload. No data provided.'}, 400
+
+    game_id = data.get('game_id')
+    token = data.get('token')
+    action = data.get('action')
+    if token is not None:
+        try:
+            seed, state = game_tokens.load(token)
+        except InvalidToken as e:
+            return {'error': str(e)}, 400
+    else:
+        state = game_sessions.get(game_id) if isinstance(game_id, str) else None
+        if state is None:
+            return {'error': 'Unknown or expired game.'}, 404
 
-# Add admin routes
-@app.route('/admin')
-def admin():
-    return render_template('admin.html')
+    # One request at a time per game: reveals change the state in place
+    with state.lock:
+        prediction_first = data.get('prediction_first')
+        prediction_second = data.get('prediction_second')
+        result = {}
+
+        if action == 'reveal_card':
+            # Only allow reveal if both predictions are made (non-empty)
+            if not prediction_first or not prediction_second:
+                return {'error': 'Both player predictions must be made before revealing cards.'}, 403
+            flop = data.get('flop')
+            index = data.get('index', 0)
+            if flop not in BOARD_KEYS[:len(state.boards)] or not isinstance(index, int):
+                return {'error': 'Invalid flop or index.'}, 400
+            board_index = BOARD_KEYS.index(flop)
+            if index < 0 or index >= state.hidden_count(board_index):
+                return {'error': 'Invalid flop or index.'}, 400
+            # Enforce: 5th card cannot be revealed until both 4th cards are revealed
+            if state.revealed[board_index] == 4 and 3 in state.revealed:
+                return {'error': 'You must reveal the 4th card on both flops before revealing the 5th card.'}, 403
+            state.reveal(board_index, index)
+
+        elif action in ('reveal_turn', 'reveal_river'):
+            street = 4 if action == 'reveal_turn' else 5
+            if any(revealed != street - 1 for revealed in state.revealed):
+                return {'error': f'Cannot {action.replace("_", " ")} now.'}, 400
+            for board_index in range(len(state.boards)):
+                state.reveal(board_index)
+
+        elif action == 'reveal_winner':
+            predictions = [prediction_first, prediction_second]
+            for board_index, key in enumerate(BOARD_KEYS[:len(state.boards)]):
+                suffix = key.split('_')[0]
+                # Precomputed for pooled games; otherwise kept up to date card by
+                # card, so only the first ask evaluates the full board
+                scored = state.winner(board_index)
+                winner, hand_type, best = scored if scored is not None else pick_winners(state.best_hands(board_index))
+                result.update({
+                    f'winner_{suffix}': winner,
+                    f'hand_type_{suffix}': hand_type,
+                    f'best_hand_{suffix}': decode_cards(best, fmt),
+                    f'prediction_correct_{suffix}': prediction_matches(predictions[board_index], winner)
+                })
 
-@app.route('/admin/clear_leaderboard', methods=['POST'])
-def clear_leaderboard():
-    data = request.get_json()
+        else:
+            return {'error': f'Unknown action: {action}'}, 400
+
+        if token is not None:
+            game = public_game(state, fmt, token=game_tokens.dump(seed, state))
+        else:
+            game = public_game(state, fmt, game_id=game_id)
+            # The best hands kept for reveal_winner grow the game
+            game_sessions.resize(game_id, state)
+    game.update(result)
+    return game, 200
+
+def handle_reveal_winner_batch(data, fmt):
+    # Winner determination for many deals in one request (training clients, drills)
+    deals = data.get('deals') if isinstance(data, dict) else None
+    if not isinstance(deals, list):
+        return {'error': 'Invalid or missing deals data'}, 400
+    if len(deals) > MAX_BATCH_DEALS:
+        return {'error': f'At most {MAX_BATCH_DEALS} deals per request, got {len(deals)}'}, 400
+
+    try:
+        results = determine_winners_batch(deals)
+    except EvalPoolTimeout as e:
+        return {'error': str(e)}, 503
+    for result in results:
+        for board in result.get('boards', []):
+            board['best_hand'] = decode_cards(board['best_hand'], fmt)
+    return {'results': results}, 200
+
+def handle_equity(data, fmt):
+    # Win/tie probability for every player on each board after the flop or turn
+    if not data:
+        return {'error': 'No data received'}, 400
+
+    players = data.get('players')
+    first_flop = data.get('first_flop')
+    second_flop = data.get('second_flop')
+
+    if not players or not isinstance(players, list):
+        return {'error': 'Invalid or missing players data'}, 400
+    if first_flop is None or not isinstance(first_flop, list):
+        return {'error': 'Invalid or missing first_flop data'}, 400
+    if second_flop is not None and not isinstance(second_flop, list):
+        return {'error': 'Invalid second_flop data'}, 400
+    if len(first_flop) < 3 or len(first_flop) > 5:
+        return {'error': f'First flop must have 3-5 cards, got {len(first_flop)}'}, 400
+    if second_flop and (len(second_flop) < 3 or len(second_flop) > 5):
+        return {'error': f'Second flop must have 3-5 cards, got {len(second_flop)}'}, 400
+
+    try:
+        target_error = float(data.get('target_error', 0.01))
+        time_budget_ms = min(float(data.get('time_budget_ms', 200)), 2000)
+        hands = [encode_cards(player.get('cards', [])) for player in players]
+        if len({len(hand) for hand in hands}) != 1 or len(hands[0]) < 2:
+            return {'error': 'Every player needs the same number of hole cards, at least 2'}, 400
+        boards = [encode_cards(first_flop)]
+        if second_flop:
+            boards.append(encode_cards(second_flop))
+        # On a pool worker when enabled, given its time budget on top of the pool timeout
+        result = eval_pool.call(
+            estimate_equity, hands, boards, target_error=target_error, time_budget_ms=time_budget_ms,
+            timeout=time_budget_ms / 1000 + eval_pool.timeout
+        )
+    except (ValueError, AttributeError, TypeError) as e:
+        return {'error': f'Invalid equity request: {e}'}, 400
+    except EvalPoolTimeout as e:
+        return {'error': str(e)}, 503
+
+    return {
+        'equity_first': result['boards'][0],
+        'equity_second': result['boards'][1] if second_flop else None,
+        'samples': result['samples'],
+        'exact': result['exact'],
+        'elapsed_ms': result['elapsed_ms']
+    }, 200
+
+def score_drill(hands, boards):
+    # Drill deals are never seen again: scored without filling best_hand_cache
+    return determine_winner_boards(hands, boards, cached=False)
+
+def handle_drills(query, fmt):
+    # Pre-scored deals as NDJSON lines (a generator, so nothing is built up
+    # front), or an error payload
+    options = dict(query)
+    options['cards'] = fmt
+    try:
+        options = parse_drill_options(options)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    return ndjson_lines(generate_drills(deal_game, score_drill, **options)), 200
+
+def handle_clear_leaderboard(data):
     difficulty = data.get('difficulty', None)
     password = data.get('password', '')
-    
+
     # Simple password protection (change this to a secure password)
     ADMIN_PASSWORD = "P@ssw0rd"  # Change this to your desired password
-    
+
     if password != ADMIN_PASSWORD:
-        return jsonify({"error": "Invalid password"}), 401
-    
-    leaderboard = load_leaderboard()
-    
-    if difficulty:
-        # Clear only specific difficulty
-        leaderboard = [
-            entry for entry in leaderboard 
-            if entry.get("difficulty", "easy") != difficulty
-        ]
+        return {"error": "Invalid password"}, 401
+
+    with metrics.timer('leaderboard_duration_ms', op='clear'):
+        get_leaderboard_store().clear(difficulty)
+    return {"success": True}, 200
+
+def handle_admin_stats():
+    # {difficulty: {"entries": n, "qualified": n}}, counters the store keeps
+    # current on every write, so this doesn't depend on the leaderboard size
+    with metrics.timer('leaderboard_duration_ms', op='stats'):
+        counts = get_leaderboard_store().stats()
+
+    stats = {"total_entries": sum(c["entries"] for c in counts.values())}
+    # easy_* and difficult_* for the admin page; any other difficulty left
+    # in the store by older versions only shows up under "difficulties"
+    for difficulty in DIFFICULTIES:
+        difficulty_counts = counts.get(difficulty, {"entries": 0, "qualified": 0})
+        stats[f"{difficulty}_entries"] = difficulty_counts["entries"]
+        stats[f"{difficulty}_qualified"] = difficulty_counts["qualified"]
+    stats["difficulties"] = counts
+
+    return stats, 200
+
+def handle_admin_metrics(output_format=None):
+    # JSON by default; the Prometheus text exposition (a str) with output_format='prometheus'
+    caches = {
+        'best_hand_cache': best_hand_cache.stats(),
+        'game_sessions': game_sessions.stats(),
+        'eval_pool': eval_pool.stats(),
+        'deal_pool': deal_pool.stats(),
+        'rate_limiter': rate_limiter.stats(),
+        'leaderboard_cache': leaderboard_cache.stats()
+    }
+    if output_format == 'prometheus':
+        gauges = {
+            f'{cache}_{key}': int(value) if isinstance(value, bool) else value
+            for cache, stats in caches.items()
+            for key, value in stats.items()
+        }
+        return metrics.prometheus_text(gauges), 200
+    snapshot = metrics.snapshot()
+    snapshot.update(caches)
+    return snapshot, 200
+
+# --- Flask routes ---
+
+def respond(result):
+    payload, status = result
+    return jsonify(payload), status
+
+@app.route('/leaderboard', methods=['GET'])
+def get_leaderboard():
+    # Get difficulty parameter from query string
+    body, status, headers = leaderboard_response(
+        request.args.get('difficulty', 'easy'),
+        request.headers.get('If-None-Match'),
+        request.headers.get('Accept-Encoding'),
+    )
+    return app.response_class(body, status=status, headers=headers, mimetype='application/json')
+
+@app.route('/leaderboard/players', methods=['GET'])
+def get_leaderboard_players():
+    return respond(handle_leaderboard_players(request.args))
+
+@app.route('/leaderboard/rank', methods=['GET'])
+def get_player_rank():
+    return respond(handle_player_rank(request.args))
+
+@app.route('/update_leaderboard', methods=['POST'])
+def update_leaderboard():
+    return respond(handle_update_leaderboard(request.get_json()))
+
+@app.route('/favicon.ico')
+def favicon():
+    # Return a 204 No Content response for favicon requests
+    # This prevents 404 errors in the browser console
+    return '', 204
+
+@app.route('/game-options')
+@app.route('/')
+def index():
+    global _index_page
+    if built_assets is not None:
+        body, status, headers = built_assets.index(request.headers.get('If-None-Match'), request.headers.get('Accept-Encoding'))
+        return app.response_class(body, status=status, headers=headers, mimetype='text/html')
+    # The page takes no context, so one rendering serves every request
+    # (re-rendered in debug mode, where the template may be edited)
+    if _index_page is None or app.debug:
+        _index_page = render_template('index.html')
+    return _index_page
+
+@app.route('/static/build/<path:filename>')
+def built_asset(filename):
+    # Content-hashed files never change: cached for a year, and sent
+    # precompressed when the build has a variant the client accepts
+    if built_assets is None:
+        name, encoding, mimetype = filename, None, None
+        directory = BUILD_DIR
     else:
-        # Clear all
-        leaderboard = []
-    
-    save_leaderboard(leaderboard)
-    return jsonify({"success": True})
+        name, encoding, mimetype = built_assets.asset(filename, request.headers.get('Accept-Encoding'))
+        directory = built_assets.build_dir
+    response = send_from_directory(directory, name, mimetype=mimetype)
+    response.headers['Cache-Control'] = IMMUTABLE
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+@app.route('/start_game', methods=['POST'])
+def start_game():
+    return respond(handle_start_game(request.json, card_format()))
+
+@app.route('/reveal_card', methods=['POST'])
+def reveal_card():
+    return respond(handle_reveal_card(request.get_json(), card_format()))
+
+@app.route('/determine_winner', methods=['POST'])
+def determine_winner_route():
+    return respond(handle_determine_winner(request.json, card_format()))
+
+@app.route('/reveal_turn', methods=['POST'])
+def reveal_turn():
+    return respond(handle_next_street(request.json, card_format(), 'reveal_turn'))
+
+@app.route('/reveal_river', methods=['POST'])
+def reveal_river():
+    return respond(handle_next_street(request.json, card_format(), 'reveal_river'))
+
+@app.route('/reveal_winner', methods=['POST'])
+def reveal_winner():
+    return respond(handle_reveal_winner(request.get_json(), card_format()))
+
+@app.route('/game_action', methods=['POST'])
+def game_action():
+    return respond(handle_game_action(request.get_json(silent=True), card_format()))
+
+@app.route('/reveal_winner_batch', methods=['POST'])
+def reveal_winner_batch():
+    return respond(handle_reveal_winner_batch(request.get_json(silent=True), card_format()))
+
+@app.route('/equity', methods=['POST'])
+def equity():
+    return respond(handle_equity(request.get_json(silent=True), card_format()))
+
+@app.route('/drills', methods=['GET'])
+def drills():
+    body, status = handle_drills(request.args.to_dict(), card_format())
+    if status != 200:
+        return jsonify(body), status
+    return app.response_class(body, mimetype='application/x-ndjson')
+
+# Add admin routes
+@app.route('/admin')
+def admin():
+    return render_template('admin.html')
+
+@app.route('/admin/clear_leaderboard', methods=['POST'])
+def clear_leaderboard():
+    return respond(handle_clear_leaderboard(request.get_json()))
 
 @app.route('/admin/get_stats', methods=['GET'])
 def get_admin_stats():
-    leaderboard = load_leaderboard()
-    
-    # Calculate stats
-    easy_entries = [e for e in leaderboard if e.get("difficulty", "easy") == "easy"]
-    difficult_entries = [e for e in leaderboard if e.get("difficulty", "easy") == "difficult"]
-    
-    stats = {
-        "total_entries": len(leaderboard),
-        "easy_entries": len(easy_entries),
-        "difficult_entries": len(difficult_entries),
-        "easy_qualified": len([e for e in easy_entries if e.get("total", 0) >= 20]),
-        "difficult_qualified": len([e for e in difficult_entries if e.get("total", 0) >= 20])
-    }
-    
-    return jsonify(stats)
+    return respond(handle_admin_stats())
+
+@app.route('/admin/metrics', methods=['GET'])
+def get_admin_metrics():
+    # JSON by default, Prometheus text exposition with ?format=prometheus
+    output_format = request.args.get('format')
+    body, status = handle_admin_metrics(output_format)
+    if output_format == 'prometheus':
+        return app.response_class(body, status=status, mimetype='text/plain; version=0.0.4')
+    return jsonify(body), status
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
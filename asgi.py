@@ -0,0 +1,364 @@
+# ASGI serving mode for the game API. Run the ASGI callable,
+# asgi:application, under an ASGI server:
+#
+#   uvicorn asgi:application --port 8000
+#   hypercorn asgi:application --bind 127.0.0.1:8000
+#   python asgi.py --port 8000        shorthand for the uvicorn line
+#
+# The JSON routes are served on the event loop with the same handlers as the
+# Flask routes in app.py. Leaderboard reads and writes run on an I/O thread
+# pool and the evaluation heavy routes on a separate CPU executor, so the loop
+# itself never blocks: a client sitting between reveals costs a coroutine and
+# a socket, not a thread. Everything else (the HTML pages, static files) is
+# handed to the Flask app through a small WSGI bridge on the I/O pool. HTTP
+# parsing, keep-alive and chunking are left to the server.
+#
+# ASGI_IO_THREADS and ASGI_CPU_THREADS size the two pools; ASGI_MAX_BODY caps
+# request bodies (bytes).
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from urllib.parse import parse_qs, unquote
+
+from app import (
+    app, eval_pool, deal_pool, rate_limiter, negotiate_card_format,
+    leaderboard_response, handle_leaderboard_players, handle_player_rank, handle_update_leaderboard,
+    handle_start_game, handle_reveal_card,
+    handle_determine_winner, handle_next_street, handle_reveal_winner, handle_game_action,
+    handle_reveal_winner_batch, handle_equity, handle_clear_leaderboard, handle_admin_stats,
+    handle_admin_metrics, handle_drills,
+)
+from metrics import metrics
+from rate_limit import retry_after_header
+from http_cache import encode_body
+
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+MAX_BODY = int(os.environ.get('ASGI_MAX_BODY', 10 * 1024 * 1024))
+
+# Where each route runs: 'loop' (cheap, no I/O), 'io' (leaderboard storage),
+# 'cpu' (hand evaluation) or 'stream' (a generator of lines, produced in
+# batches on the CPU executor and sent as it goes). Handlers take (data, query,
+# fmt, headers) with the request headers as a lowercase str dict, and return
+# (payload, status), or (bytes, status, headers) for a body they rendered.
+STREAM_BATCH = 64
+
+ROUTES = {
+    ('GET', '/leaderboard'): ('io', lambda data, query, fmt, headers: leaderboard_response(
+        query.get('difficulty', 'easy'), headers.get('if-none-match'), headers.get('accept-encoding'))),
+    ('GET', '/leaderboard/players'): ('io', lambda data, query, fmt, headers: handle_leaderboard_players(query)),
+    ('GET', '/leaderboard/rank'): ('io', lambda data, query, fmt, headers: handle_player_rank(query)),
+    ('POST', '/update_leaderboard'): ('io', lambda data, query, fmt, headers: handle_update_leaderboard(data)),
+    ('POST', '/start_game'): ('loop', lambda data, query, fmt, headers: handle_start_game(data, fmt)),
+    ('POST', '/reveal_card'): ('loop', lambda data, query, fmt, headers: handle_reveal_card(data, fmt)),
+    ('POST', '/reveal_turn'): ('loop', lambda data, query, fmt, headers: handle_next_street(data, fmt, 'reveal_turn')),
+    ('POST', '/reveal_river'): ('loop', lambda data, query, fmt, headers: handle_next_street(data, fmt, 'reveal_river')),
+    ('POST', '/determine_winner'): ('cpu', lambda data, query, fmt, headers: handle_determine_winner(data, fmt)),
+    ('POST', '/reveal_winner'): ('cpu', lambda data, query, fmt, headers: handle_reveal_winner(data, fmt)),
+    ('POST', '/game_action'): ('cpu', lambda data, query, fmt, headers: handle_game_action(data, fmt)),
+    ('POST', '/reveal_winner_batch'): ('cpu', lambda data, query, fmt, headers: handle_reveal_winner_batch(data, fmt)),
+    ('POST', '/equity'): ('cpu', lambda data, query, fmt, headers: handle_equity(data, fmt)),
+    ('POST', '/admin/clear_leaderboard'): ('io', lambda data, query, fmt, headers: handle_clear_leaderboard(data)),
+    ('GET', '/admin/get_stats'): ('io', lambda data, query, fmt, headers: handle_admin_stats()),
+    ('GET', '/admin/metrics'): ('loop', lambda data, query, fmt, headers: handle_admin_metrics(query.get('format'))),
+    ('GET', '/drills'): ('stream', lambda data, query, fmt, headers: handle_drills(query, fmt)),
+}
+
+_executors = {}
+
+
+def get_executor(kind):
+    # Created on first use so importing this module starts no threads
+    executor = _executors.get(kind)
+    if executor is None:
+        if kind == 'io':
+            workers = int(os.environ.get('ASGI_IO_THREADS', 8))
+        else:
+            workers = int(os.environ.get('ASGI_CPU_THREADS', os.cpu_count() or 1))
+        executor = _executors[kind] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'asgi-{kind}')
+    return executor
+
+
+def shutdown_executors():
+    for executor in _executors.values():
+        executor.shutdown(wait=False)
+    _executors.clear()
+    eval_pool.shutdown()
+    deal_pool.stop()
+
+
+async def _read_body(receive):
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY:
+            raise ValueError('Request body too large')
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def _send(send, status, body, content_type='application/json', headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', content_type.encode('latin-1')),
+            (b'content-length', str(len(body)).encode('latin-1')),
+        ] + list(headers),
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _send_json(send, payload, status, accept_encoding=None):
+    # Same encoder as jsonify() and the same compression as app._compress_json,
+    # so both serving modes send identical JSON
+    body = (app.json.dumps(payload) + '\n').encode('utf-8')
+    headers = []
+    if status == 200:
+        headers.append((b'vary', b'Accept-Encoding'))
+        body, encoding = encode_body(body, accept_encoding)
+        if encoding:
+            headers.append((b'content-encoding', encoding.encode('latin-1')))
+    await _send(send, status, body, headers=headers)
+
+
+async def _send_rendered(send, status, body, headers):
+    # A body the handler rendered itself (/leaderboard), with its own headers;
+    # a 304 has neither a body nor a content-length
+    response_headers = [(b'content-type', b'application/json')]
+    response_headers += [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+    if status != 304:
+        response_headers.append((b'content-length', str(len(body)).encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _run(handler, data, query, fmt, headers):
+    # (payload, status, response headers)
+    try:
+        result = handler(data, query, fmt, headers)
+    except Exception as e:
+        # The Flask routes would answer these with a 500 page; keep it JSON here
+        app.logger.exception(f"Error in ASGI route: {e}")
+        return {'error': f'Server error: {e}'}, 500, ()
+    return result if len(result) == 3 else (result[0], result[1], ())
+
+
+async def _serve_route(scope, receive, send, kind, handler):
+    route = scope['path']
+    start = time.perf_counter()
+    try:
+        body = await _read_body(receive)
+    except ValueError:
+        await _send_json(send, {'error': 'Request body too large'}, 413)
+        return
+    if body is None:
+        return
+    headers = dict(scope.get('headers', []))
+    client = rate_limiter.client(
+        (scope.get('client') or ('', 0))[0], headers.get(b'x-forwarded-for', b'').decode('latin-1')
+    )
+    retry_after = rate_limiter.check(route, client)
+    if retry_after:
+        metrics.inc('rate_limited_total', route=route)
+        await _send(
+            send, 429, (app.json.dumps({'error': 'Too many requests, please slow down.'}) + '\n').encode('utf-8'),
+            headers=[(b'retry-after', retry_after_header(retry_after).encode('latin-1'))],
+        )
+        metrics.inc('http_requests_total', route=route, method=scope['method'], status='429')
+        return
+
+    data = None
+    if body:
+        try:
+            data = json.loads(body)
+        except ValueError:
+            await _send_json(send, {'error': 'Invalid JSON body'}, 400)
+            return
+    if scope['method'] == 'POST' and not isinstance(data, dict):
+        # Every POST handler reads its fields off a JSON object; Flask turns a
+        # missing or non-JSON body away before the handler too
+        await _send_json(send, {'error': 'Request body must be a JSON object'}, 400)
+        return
+    query = {key: values[0] for key, values in parse_qs(scope.get('query_string', b'').decode('latin-1')).items()}
+    fmt = negotiate_card_format(query.get('cards'), headers.get(b'x-card-format', b'').decode('latin-1'))
+    request_headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in headers.items()}
+
+    if kind == 'stream':
+        # Only builds the generator; validation errors come back as a payload
+        payload, status, response_headers = _run(handler, data, query, fmt, request_headers)
+        if status == 200:
+            status = await _stream_lines(send, payload)
+            payload = None
+    elif kind == 'loop':
+        payload, status, response_headers = _run(handler, data, query, fmt, request_headers)
+    else:
+        loop = asyncio.get_running_loop()
+        payload, status, response_headers = await loop.run_in_executor(
+            get_executor(kind), _run, handler, data, query, fmt, request_headers
+        )
+
+    if payload is None:
+        pass
+    elif isinstance(payload, bytes):
+        await _send_rendered(send, status, payload, response_headers)
+    elif isinstance(payload, str):
+        # /admin/metrics?format=prometheus
+        await _send(send, status, payload.encode('utf-8'), 'text/plain; version=0.0.4')
+    else:
+        await _send_json(send, payload, status, request_headers.get('accept-encoding'))
+    metrics.observe('http_request_duration_ms', (time.perf_counter() - start) * 1000, route=route, method=scope['method'])
+    metrics.inc('http_requests_total', route=route, method=scope['method'], status=str(status))
+
+
+def _next_batch(lines):
+    return ''.join(islice(lines, STREAM_BATCH))
+
+
+async def _stream_lines(send, lines):
+    # No content-length: the server sends it chunked as the batches arrive
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'application/x-ndjson')],
+    })
+    loop = asyncio.get_running_loop()
+    executor = get_executor('cpu')
+    while True:
+        try:
+            batch = await loop.run_in_executor(executor, _next_batch, lines)
+        except Exception as e:
+            # Headers are out already, all that is left is to end the stream
+            app.logger.exception(f"Error in ASGI stream: {e}")
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+            return 500
+        if not batch:
+            await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+            return 200
+        await send({'type': 'http.response.body', 'body': batch.encode('utf-8'), 'more_body': True})
+
+
+def _wsgi_environ(scope, body):
+    path = scope.get('raw_path') or scope['path'].encode('utf-8')
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': unquote(path.decode('latin-1'), encoding='latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': (scope.get('server') or ('localhost', 80))[0],
+        'SERVER_PORT': str((scope.get('server') or ('localhost', 80))[1]),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = 'HTTP_' + name
+            environ[key] = environ[key] + ',' + value if key in environ else value
+    return environ
+
+
+def _call_wsgi(environ):
+    # Runs the Flask app on a pool thread and collects the whole response
+    response = {}
+    chunks = []
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = headers
+        return chunks.append
+
+    result = app(environ, start_response)
+    try:
+        for chunk in result:
+            chunks.append(chunk)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return response['status'], response['headers'], b''.join(chunks)
+
+
+async def _serve_wsgi(scope, receive, send):
+    try:
+        body = await _read_body(receive)
+    except ValueError:
+        await _send_json(send, {'error': 'Request body too large'}, 413)
+        return
+    if body is None:
+        return
+    loop = asyncio.get_running_loop()
+    status, headers, content = await loop.run_in_executor(get_executor('io'), _call_wsgi, _wsgi_environ(scope, body))
+    headers = [
+        (name.lower().encode('latin-1'), value.encode('latin-1'))
+        for name, value in headers if name.lower() != 'content-length'
+    ]
+    headers.append((b'content-length', str(len(content)).encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': content})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            shutdown_executors()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+    route = ROUTES.get((scope['method'], scope['path']))
+    if route is None:
+        await _serve_wsgi(scope, receive, send)
+    else:
+        kind, handler = route
+        await _serve_route(scope, receive, send, kind, handler)
+
+
+def main(argv=None):
+    # Runs the app under uvicorn, the same as `uvicorn asgi:application`
+    parser = argparse.ArgumentParser(description='Serve the game API in ASGI mode (needs uvicorn).')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args(argv)
+    if uvicorn is None:
+        sys.exit('ASGI mode needs an ASGI server: pip install uvicorn (or run asgi:application under hypercorn)')
+    uvicorn.run(application, host=args.host, port=args.port, lifespan='on')
+
+
+if __name__ == '__main__':
+    main()
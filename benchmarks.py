@@ -0,0 +1,306 @@
+# Seeded benchmark suite for the evaluator, the winner logic, the routes and
+# the leaderboard stores.
+#
+#   python benchmarks.py                       run everything, write bench_results.json
+#   python benchmarks.py --levels eval,winners --quick
+#   python benchmarks.py --save-baseline       store this machine's numbers as the baseline
+#   python benchmarks.py --tolerance 0.2       fail (exit 1) if anything is >20% slower
+#
+# Every case reports the time per operation in microseconds (the best of
+# --repeat runs, which is the least noisy estimate). When a baseline file
+# exists each case is compared against it and the run fails if one regressed
+# past the tolerance. Baselines are machine specific and are not committed.
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+from cards import NUM_CARDS
+
+LEVELS = ('eval', 'winners', 'flows', 'leaderboard')
+DEFAULT_OUTPUT = 'bench_results.json'
+DEFAULT_BASELINE = 'bench_baseline.json'
+DEFAULT_LEADERBOARD_SIZES = '1000,100000,1000000'
+
+
+def _time_per_op(run, ops, repeat):
+    # Best of `repeat` runs of run(), in microseconds per operation
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / ops * 1e6
+
+
+def _deals(rng, count, num_players, num_boards):
+    # Seeded bombpot deals: four hole cards per player, five cards per board
+    deals = []
+    for _ in range(count):
+        cards = rng.sample(range(NUM_CARDS), num_players * 4 + num_boards * 5)
+        hands = [cards[i * 4:i * 4 + 4] for i in range(num_players)]
+        rest = cards[num_players * 4:]
+        boards = [rest[i * 5:i * 5 + 5] for i in range(num_boards)]
+        deals.append((hands, boards))
+    return deals
+
+
+def bench_eval(rng, scale, repeat):
+    # Single five card evaluations, the legacy evaluate_hand() and compare_hands(),
+    # best hands, and the NumPy batch versions when NumPy is installed
+    from hand_evaluator import evaluate5
+    from app import evaluate_hand, compare_hands
+
+    count = 20000 * scale
+    hands = [rng.sample(range(NUM_CARDS), 5) for _ in range(count)]
+
+    def run_evaluate5():
+        for hand in hands:
+            evaluate5(*hand)
+
+    def run_evaluate_hand():
+        for hand in hands:
+            evaluate_hand(hand)
+
+    evaluated = [evaluate_hand(hand) for hand in hands]
+
+    def run_compare():
+        for first, second in zip(evaluated, evaluated[1:]):
+            compare_hands(first, second)
+
+    results = {
+        'eval/evaluate5': _time_per_op(run_evaluate5, count, repeat),
+        'eval/evaluate_hand': _time_per_op(run_evaluate_hand, count, repeat),
+        'eval/compare_hands': _time_per_op(run_compare, count - 1, repeat),
+    }
+
+    # Best 2 + 3 hands on river boards, one at a time and (with NumPy) batched
+    import vector_eval
+    from hand_evaluator import best_hand
+
+    rows = [rng.sample(range(NUM_CARDS), 9) for _ in range(count // 4)]
+    holes = [row[:4] for row in rows]
+    boards = [row[4:] for row in rows]
+
+    def run_best_hand():
+        for hole, board in zip(holes, boards):
+            best_hand(hole, board)
+
+    results['eval/best_hand'] = _time_per_op(run_best_hand, len(rows), repeat)
+    if vector_eval.AVAILABLE:
+        import numpy as np
+
+        cards = np.array(hands)
+        hole_array, board_array = np.array(holes), np.array(boards)
+        results['eval/evaluate5_batch'] = _time_per_op(lambda: vector_eval.evaluate5_batch(cards), count, repeat)
+        results['eval/best_hands_batch'] = _time_per_op(
+            lambda: vector_eval.best_hands_batch(hole_array, board_array), len(rows), repeat
+        )
+    return results
+
+
+def bench_winners(rng, scale, repeat):
+    # determine_winner_multiple() for 2-10 players on one and two boards, with
+    # the best hand cache off so every run measures the evaluator
+    from app import determine_winner_multiple
+    from hand_evaluator import best_hand_cache
+
+    results = {}
+    saved_size = best_hand_cache.max_size
+    best_hand_cache.max_size = 0
+    try:
+        for num_boards in (1, 2):
+            for num_players in range(2, 11):
+                count = max(1, 2000 * scale // num_players)
+                deals = _deals(rng, count, num_players, num_boards)
+
+                def run():
+                    for hands, boards in deals:
+                        for board in boards:
+                            determine_winner_multiple(hands, board)
+
+                name = f'winners/players={num_players}/boards={num_boards}'
+                results[name] = _time_per_op(run, count, repeat)
+    finally:
+        best_hand_cache.max_size = saved_size
+    return results
+
+
+def bench_flows(rng, scale, repeat):
+    # /start_game -> /reveal_winner through the Flask test client, cards as
+    # the front end sends them
+    from app import app, deal_pool, rate_limiter
+    from hand_evaluator import best_hand_cache
+
+    client = app.test_client()
+    results = {}
+    # Every game dealt from the seeded module random: pooled games come from
+    # the pool's own rng and arrive with their answers already cached. The
+    # best hand cache is off too: every repeat replays the same games, which
+    # would otherwise all be cache hits after the first. None of the requests
+    # are rate limited either
+    saved_size, saved_limits, saved_cache_size = deal_pool.size, rate_limiter.limits, best_hand_cache.max_size
+    deal_pool.size = 0
+    rate_limiter.limits = {}
+    best_hand_cache.max_size = 0
+    try:
+        for num_players in (2, 6, 10):
+            count = max(1, 200 * scale // num_players)
+            seed = rng.random()
+
+            def run():
+                # start_game shuffles with the module level random
+                random.seed(seed)
+                for _ in range(count):
+                    game = client.post('/start_game', json={
+                        'num_players': num_players, 'num_flops': 2, 'difficulty': 'easy'
+                    }).get_json()
+                    response = client.post('/reveal_winner', json={
+                        'players': game['players'],
+                        'first_flop': game['first_flop']['exposed'] + game['first_flop']['flipped'],
+                        'second_flop': game['second_flop']['exposed'] + game['second_flop']['flipped'],
+                        'prediction_first': 'Player 1',
+                        'prediction_second': 'Player 1'
+                    })
+                    if response.status_code != 200:
+                        raise RuntimeError(f'/reveal_winner failed: {response.get_data(as_text=True)}')
+
+            results[f'flows/players={num_players}'] = _time_per_op(run, count, repeat)
+    finally:
+        deal_pool.size = saved_size
+        rate_limiter.limits = saved_limits
+        best_hand_cache.max_size = saved_cache_size
+    return results
+
+
+def _leaderboard_entries(rng, size):
+    return [
+        {
+            'name': f'player{index}',
+            'correct': rng.randint(0, 100),
+            'total': rng.randint(1, 100),
+            'difficulty': rng.choice(('easy', 'difficult')),
+        }
+        for index in range(size)
+    ]
+
+
+def bench_leaderboard(rng, sizes, repeat):
+    # Cold load, top 10, one appended entry and a full save for both backends
+    from leaderboard_store import JsonLeaderboardStore, SqliteLeaderboardStore
+
+    results = {}
+    entry = {'name': 'bench', 'correct': 18, 'total': 20, 'difficulty': 'easy'}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            entries = _leaderboard_entries(rng, size)
+            # Large stores take seconds per operation, fewer repeats keep the run short
+            runs = repeat if size <= 100000 else 1
+            for backend in ('json', 'sqlite'):
+                json_path = os.path.join(tmp, f'{backend}-{size}.json')
+                db_path = os.path.join(tmp, f'{backend}-{size}.db')
+                if backend == 'json':
+                    def open_store():
+                        return JsonLeaderboardStore(json_path)
+                else:
+                    def open_store():
+                        return SqliteLeaderboardStore(db_path, json_path=None)
+
+                prefix = f'leaderboard/{backend}/n={size}'
+                results[f'{prefix}/save'] = _time_per_op(lambda: open_store().save(entries), 1, runs)
+                # A new store each time so nothing is served from memory
+                results[f'{prefix}/load'] = _time_per_op(lambda: open_store().load(), 1, runs)
+                results[f'{prefix}/top'] = _time_per_op(lambda: open_store().top('easy'), 1, runs)
+                store = open_store()
+                store.load()
+                results[f'{prefix}/add_entry'] = _time_per_op(lambda: store.add_entry(entry), 1, runs)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    # [(name, baseline_us, current_us)] for every case slower than allowed
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous and current > previous * (1 + tolerance):
+            regressions.append((name, previous, current))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the evaluator, winner logic, routes and leaderboard.')
+    parser.add_argument('--levels', default=','.join(LEVELS), help=f'comma separated subset of {",".join(LEVELS)}')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--repeat', type=int, default=3, help='runs per case, the fastest one is reported')
+    parser.add_argument('--quick', action='store_true', help='smaller workloads and leaderboards (1k entries)')
+    parser.add_argument('--leaderboard-sizes', default=None, help=f'comma separated entry counts (default {DEFAULT_LEADERBOARD_SIZES})')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='where to write the JSON results')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='write these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown vs the baseline (0.25 = 25%%)')
+    args = parser.parse_args(argv)
+
+    levels = [level.strip() for level in args.levels.split(',') if level.strip()]
+    unknown = set(levels) - set(LEVELS)
+    if unknown:
+        parser.error(f'unknown levels: {", ".join(sorted(unknown))}')
+    scale = 1 if args.quick else 5
+    sizes_arg = args.leaderboard_sizes or ('1000' if args.quick else DEFAULT_LEADERBOARD_SIZES)
+    sizes = [int(size) for size in sizes_arg.split(',') if size.strip()]
+
+    # Each level gets its own seeded generator so running a subset gives the same deals
+    results = {}
+    for level in levels:
+        rng = random.Random(f'{args.seed}-{level}')
+        start = time.perf_counter()
+        if level == 'eval':
+            results.update(bench_eval(rng, scale, args.repeat))
+        elif level == 'winners':
+            results.update(bench_winners(rng, scale, args.repeat))
+        elif level == 'flows':
+            results.update(bench_flows(rng, scale, args.repeat))
+        elif level == 'leaderboard':
+            results.update(bench_leaderboard(rng, sizes, args.repeat))
+        print(f'{level}: done in {time.perf_counter() - start:.1f}s', file=sys.stderr)
+
+    for name, per_op in results.items():
+        print(f'{name:48} {per_op:12.2f} us/op')
+
+    report = {
+        'seed': args.seed,
+        'quick': args.quick,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': {name: round(per_op, 3) for name, per_op in results.items()},
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f'Baseline saved to {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f'No baseline at {args.baseline}, run with --save-baseline to create one')
+        return 0
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f).get('results', {})
+    regressions = compare(report['results'], baseline, args.tolerance)
+    for name, previous, current in regressions:
+        print(f'REGRESSION {name}: {previous:.2f} -> {current:.2f} us/op ({current / previous - 1:+.0%})')
+    if regressions:
+        return 1
+    print(f'No regressions beyond {args.tolerance:.0%} of {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,451 @@
+# Static asset build for the single-page UI.
+#
+#   python build_assets.py            # writes static/build/
+#   ASSETS_MODE=built python app.py   # serves from it
+#
+# templates/index.html carries all of its CSS and JS inline, so every page
+# load downloaded them again and the backgrounds and logo were full-size
+# files without cache headers. The build:
+#
+#   - moves the inline <style> and <script> into app.<hash>.css/.js, minified
+#     (with rcssmin/rjsmin when installed, else a conservative built-in pass
+#     that drops comments and indentation but keeps line breaks)
+#   - copies the images the page uses under content-hashed names, scaled down
+#     when Pillow is installed: a smaller background for phones (picked by a
+#     media query) and a logo at twice its displayed size
+#   - writes .gz (and .br with the brotli package) next to every text asset
+#   - writes the rewritten page as index.html and a manifest.json
+#
+# Hashed files never change, so they are served with a year-long immutable
+# Cache-Control. BuiltAssets is the serving side: the page and its
+# compressed forms are read once and kept in memory.
+
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import re
+import shutil
+import sys
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+from http_cache import accepted_encoding, etag_matches
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE = os.path.join(BASE_DIR, 'templates', 'index.html')
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+BUILD_DIR = os.path.join(STATIC_DIR, 'build')
+BUILD_URL = '/static/build/'
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+TEXT_TYPES = ('.css', '.js', '.html', '.json', '.svg')
+# Phones get the smaller background variant below this viewport width
+MOBILE_MAX_WIDTH = 768
+
+# Image -> (width of the main variant, width of the phone variant or None),
+# about twice the CSS pixels each is shown at: the page background covers
+# the viewport, the felt is a 300px tile and the logo is at most 140px
+IMAGES = {
+    'casino-felt.jpg': (1920, 640),
+    'poker-felt.jpg': (600, None),
+    'logo.png': (280, None),
+}
+JPEG_QUALITY = 80
+
+_STYLE = re.compile(r'<style>(.*?)</style>', re.S)
+_SCRIPT = re.compile(r'<script type="text/javascript">(.*?)</script>', re.S)
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def hashed_name(name, data):
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{content_hash(data)}{ext}'
+
+
+# --- Minifiers ---
+
+def _skip_string(source, i, quote):
+    # Index just past the string literal starting at source[i]
+    i += 1
+    while i < len(source) and source[i] != quote:
+        i += 2 if source[i] == '\\' else 1
+    return i + 1
+
+
+def minify_css(source):
+    if rcssmin is not None:
+        return rcssmin.cssmin(source)
+    out = []
+    i = 0
+    while i < len(source):
+        char = source[i]
+        if char in '"\'':
+            end = _skip_string(source, i, char)
+            out.append(source[i:end])
+            i = end
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = len(source) if end < 0 else end + 2
+        elif char.isspace():
+            while i < len(source) and source[i].isspace():
+                i += 1
+            # A space only matters between two parts of a selector or value
+            # (never after a colon: "a :hover" has it before)
+            if out and out[-1][-1:] not in '{};,>:' and i < len(source) and source[i] not in '{};,>':
+                out.append(' ')
+        else:
+            if char in '{};,>' and out and out[-1] == ' ':
+                out.pop()
+            out.append(char)
+            i += 1
+    return ''.join(out).replace(';}', '}').strip()
+
+
+# A / after one of these (or after these keywords) starts a regex, not a division
+_REGEX_AFTER = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = ('return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'void', 'yield', 'await')
+
+
+def _skip_regex(source, i):
+    i += 1
+    in_class = False
+    while i < len(source):
+        char = source[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif char == '/' and not in_class:
+            i += 1
+            break
+        elif char == '\n':
+            break
+        i += 1
+    while i < len(source) and (source[i].isalpha()):
+        i += 1
+    return i
+
+
+def _after_keyword(out):
+    match = re.search(r'([A-Za-z_$]+)\s*$', ''.join(out[-16:]))
+    return match is not None and match.group(1) in _REGEX_KEYWORDS
+
+
+def minify_js(source):
+    # Comments and indentation go, strings, template literals and regexes are
+    # copied as they are, and line breaks stay (automatic semicolon insertion
+    # depends on them)
+    if rjsmin is not None:
+        return rjsmin.jsmin(source)
+    out = []
+    i = 0
+    # Brace depth of each open ${ } inside a template literal
+    templates = []
+    depth = 0
+    # Last code character written, whitespace aside
+    last = ''
+    while i < len(source):
+        char = source[i]
+        if char in '"\'':
+            end = _skip_string(source, i, char)
+            out.append(source[i:end])
+            i = end
+            last = char
+        elif char == '`' or (char == '}' and templates and templates[-1] == depth):
+            # The rest of a template literal, up to its end or the next ${
+            if char == '}':
+                templates.pop()
+            start = i
+            i += 1
+            while i < len(source):
+                if source[i] == '\\':
+                    i += 2
+                elif source[i] == '`':
+                    i += 1
+                    break
+                elif source.startswith('${', i):
+                    i += 2
+                    templates.append(depth)
+                    break
+                else:
+                    i += 1
+            out.append(source[start:i])
+            last = '`'
+        elif source.startswith('//', i):
+            end = source.find('\n', i)
+            i = len(source) if end < 0 else end
+        elif source.startswith('/*', i):
+            end = source.find('*/', i + 2)
+            i = len(source) if end < 0 else end + 2
+        elif char == '/' and (not last or last in _REGEX_AFTER or _after_keyword(out)):
+            end = _skip_regex(source, i)
+            out.append(source[i:end])
+            i = end
+            last = '/'
+        elif char.isspace():
+            newline = False
+            while i < len(source) and source[i].isspace():
+                newline = newline or source[i] == '\n'
+                i += 1
+            if out and out[-1] not in ('\n', ' '):
+                out.append('\n' if newline else ' ')
+            elif newline and out and out[-1] == ' ':
+                out[-1] = '\n'
+        else:
+            if char == '{':
+                depth += 1
+            elif char == '}':
+                depth -= 1
+            out.append(char)
+            last = char
+            i += 1
+    return ''.join(out).strip()
+
+
+def minify_html(source):
+    # Indentation only: the page's markup is small once the CSS and JS are out
+    return '\n'.join(line.strip() for line in source.splitlines() if line.strip())
+
+
+# --- Images ---
+
+def _resized(data, name, width):
+    # The image scaled down to width (never up) and re-encoded, None unless
+    # that made it smaller
+    image = Image.open(io.BytesIO(data))
+    if image.width > width:
+        image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+    out = io.BytesIO()
+    if name.lower().endswith(('.jpg', '.jpeg')):
+        image.convert('RGB').save(out, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    else:
+        image.save(out, 'PNG', optimize=True)
+    resized = out.getvalue()
+    return resized if len(resized) < len(data) else None
+
+
+def _variant(name, data, width):
+    body = _resized(data, name, width) if Image is not None and width else None
+    if body is None:
+        return None
+    stem, ext = os.path.splitext(name)
+    return f'{stem}-{width}w{ext}', body
+
+
+def image_variants(name, data):
+    # (main, phone or None) variants as (name, bytes); without Pillow the
+    # main one is the original
+    main_width, mobile_width = IMAGES[name]
+    main = _variant(name, data, main_width) or (name, data)
+    mobile = _variant(name, data, mobile_width)
+    if mobile is not None and mobile[1] == main[1]:
+        # Already no wider than the phone size
+        mobile = None
+    return main, mobile
+
+
+def _mobile_rules(css, mobile_urls):
+    # A max-width media query that swaps in the phone backgrounds, for the
+    # top level rules whose declarations use one
+    rules = []
+    for selector, body in re.findall(r'(?:^|(?<=}))\s*([^{}@]+)\{([^{}]*)\}', css):
+        for url, mobile_url in mobile_urls.items():
+            if url in body:
+                rules.append(f'{selector.strip()}{{background-image:url("{mobile_url}")}}')
+    if not rules:
+        return ''
+    return f'@media (max-width:{MOBILE_MAX_WIDTH}px){{{"".join(rules)}}}'
+
+
+# --- Build ---
+
+def _write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _precompress(path, data):
+    written = []
+    _write(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+    written.append(path + '.gz')
+    if brotli is not None:
+        _write(path + '.br', brotli.compress(data, quality=11))
+        written.append(path + '.br')
+    return written
+
+
+def _replace_blocks(pattern, page, replacement):
+    # The first block becomes replacement, the others are removed
+    blocks = iter(pattern.finditer(page))
+    first = next(blocks, None)
+    if first is None:
+        return page
+    parts = [page[:first.start()], replacement]
+    end = first.end()
+    for block in blocks:
+        parts.append(page[end:block.start()])
+        end = block.end()
+    parts.append(page[end:])
+    return ''.join(parts)
+
+
+def build(template=TEMPLATE, static_dir=STATIC_DIR, build_dir=BUILD_DIR, build_url=BUILD_URL):
+    # Builds everything into build_dir (replacing what was there) and returns the manifest
+    with open(template, encoding='utf-8') as f:
+        page = f.read()
+    if os.path.isdir(build_dir):
+        shutil.rmtree(build_dir)
+    os.makedirs(build_dir)
+    assets = {}
+
+    def emit(name, data):
+        filename = hashed_name(name, data)
+        path = os.path.join(build_dir, filename)
+        _write(path, data)
+        if filename.endswith(TEXT_TYPES):
+            _precompress(path, data)
+        assets[name] = filename
+        return build_url + filename
+
+    # Images first, so the CSS and JS can point at them
+    urls = {}
+    mobile_urls = {}
+    for name in IMAGES:
+        source = os.path.join(static_dir, name)
+        if not os.path.exists(source):
+            continue
+        with open(source, 'rb') as f:
+            data = f.read()
+        main, mobile = image_variants(name, data)
+        url = urls[f'/static/{name}'] = emit(main[0], main[1])
+        if mobile is not None:
+            mobile_urls[url] = emit(mobile[0], mobile[1])
+
+    def rewrite(text):
+        for original, url in urls.items():
+            text = text.replace(original, url)
+        return text
+
+    styles = _STYLE.findall(page)
+    scripts = _SCRIPT.findall(page)
+    css = minify_css(rewrite('\n'.join(styles)))
+    css += _mobile_rules(css, mobile_urls)
+    css_url = emit('app.css', css.encode('utf-8'))
+    js_url = emit('app.js', minify_js(rewrite('\n'.join(scripts))).encode('utf-8'))
+
+    # The stylesheet takes the first <style>'s place, the script the first
+    # inline <script>'s (at the end of <body>, after #root)
+    page = _replace_blocks(_STYLE, page, f'<link rel="stylesheet" href="{css_url}">')
+    page = _replace_blocks(_SCRIPT, page, f'<script src="{js_url}"></script>')
+    index = minify_html(rewrite(page)).encode('utf-8')
+    _write(os.path.join(build_dir, 'index.html'), index)
+    _precompress(os.path.join(build_dir, 'index.html'), index)
+
+    manifest = {'index': 'index.html', 'index_hash': content_hash(index), 'assets': assets}
+    _write(os.path.join(build_dir, 'manifest.json'), json.dumps(manifest, indent=2).encode('utf-8'))
+    return manifest
+
+
+# --- Serving ---
+
+class BuiltAssets:
+    # The build's index page, held in memory with its compressed forms, and
+    # the precompressed variants of the hashed files
+    def __init__(self, build_dir=BUILD_DIR):
+        self.build_dir = build_dir
+        with open(os.path.join(build_dir, 'manifest.json'), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self.etag = f'"{self.manifest["index_hash"]}"'
+        self._index = {}
+        for encoding, suffix in (None, ''), ('gzip', '.gz'), ('br', '.br'):
+            path = os.path.join(build_dir, self.manifest['index'] + suffix)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    self._index[encoding] = f.read()
+        self._lock = threading.Lock()
+        # filename -> {encoding: precompressed file exists}
+        self._variants = {}
+
+    def index(self, if_none_match=None, accept_encoding=None):
+        # (body, status, headers) for the page
+        encoding = accepted_encoding(accept_encoding)
+        if encoding not in self._index:
+            encoding = None
+        etag = self.etag if encoding is None else self.etag[:-1] + '-' + encoding + '"'
+        headers = [('ETag', etag), ('Cache-Control', 'no-cache'), ('Vary', 'Accept-Encoding')]
+        if etag_matches(if_none_match, etag) or etag_matches(if_none_match, self.etag):
+            return b'', 304, headers
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        return self._index[encoding], 200, headers
+
+    def asset(self, filename, accept_encoding=None):
+        # (file name in build_dir, content encoding or None, mimetype) for a
+        # hashed asset, the precompressed file when the client takes it
+        encoding = accepted_encoding(accept_encoding)
+        suffix = {'gzip': '.gz', 'br': '.br'}.get(encoding)
+        if suffix:
+            with self._lock:
+                variants = self._variants.setdefault(filename, {})
+                if encoding not in variants:
+                    variants[encoding] = os.path.isfile(os.path.join(self.build_dir, filename + suffix))
+                found = variants[encoding]
+            if found:
+                return filename + suffix, encoding, mimetypes.guess_type(filename)[0]
+        return filename, None, mimetypes.guess_type(filename)[0]
+
+
+def create_built_assets():
+    # ASSETS_MODE=built serves the build in ASSETS_BUILD_DIR (default static/build)
+    if os.environ.get('ASSETS_MODE', '').lower() != 'built':
+        return None
+    build_dir = os.environ.get('ASSETS_BUILD_DIR', BUILD_DIR)
+    if not os.path.exists(os.path.join(build_dir, 'manifest.json')):
+        raise RuntimeError(f"ASSETS_MODE=built but {build_dir} has no build, run python build_assets.py first")
+    return BuiltAssets(build_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build the fingerprinted, precompressed UI assets.')
+    parser.add_argument('-o', '--output', default=BUILD_DIR, help='build directory (replaced)')
+    args = parser.parse_args(argv)
+    manifest = build(build_dir=args.output)
+    for name, filename in sorted(manifest['assets'].items()):
+        size = os.path.getsize(os.path.join(args.output, filename))
+        print(f'{name:24} -> {filename} ({size:,} bytes)')
+    if Image is None:
+        print('Pillow is not installed: images were copied at full size', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,191 @@
+# Compact card representation shared by the evaluator, the deck code and the routes.
+#
+# A card is a plain int in 0..51: rank index * 4 + suit index, so the rank is
+# card >> 2 (0 = '2' ... 12 = 'A') and the suit is card & 3. The JSON dicts the
+# front end sends ({'rank': '10', 'suit': '♥'}) are converted once at the route
+# boundary with encode_cards() and turned back into dicts with decode_cards()
+# when a response is built.
+#
+# On the wire a card can be sent in one of three formats (CARD_FORMATS):
+#   'dict' {'rank': '10', 'suit': '♥'}  the default the front end uses
+#   'str'  "Th"                          rank char + suit letter (h, d, c, s)
+#   'int'  34                            the int card itself
+# encode_card() accepts any of them; decode_cards() produces the one asked for.
+#
+# Deck holds the cards left to deal as a 52-bit set and deals them in an order
+# fixed by its seed, so a whole game can be rebuilt from the seed alone.
+
+import random
+
+SUITS = ['♥', '♦', '♣', '♠']
+RANKS = ['2', '3', '4', '5', '6', '7', '8', '9', '10', 'J', 'Q', 'K', 'A']
+NUM_CARDS = len(SUITS) * len(RANKS)
+
+CARD_FORMATS = ('dict', 'str', 'int')
+RANK_CHARS = '23456789TJQKA'
+SUIT_CHARS = 'hdcs'
+
+
+def make_card(rank_index, suit_index):
+    return (rank_index << 2) | suit_index
+
+
+def card_rank(card):
+    return card >> 2
+
+
+def card_suit(card):
+    return card & 3
+
+
+_CARD_DICTS = [{'rank': RANKS[card >> 2], 'suit': SUITS[card & 3]} for card in range(NUM_CARDS)]
+_CARD_INTS = {(entry['rank'], entry['suit']): card for card, entry in enumerate(_CARD_DICTS)}
+_CARD_STRS = [RANK_CHARS[card >> 2] + SUIT_CHARS[card & 3] for card in range(NUM_CARDS)]
+
+
+def _string_forms():
+    # "Th", "th", "10h", "TH", "T♥", "10♥", ... all map to the same card
+    forms = {}
+    for card in range(NUM_CARDS):
+        ranks = {RANK_CHARS[card >> 2], RANK_CHARS[card >> 2].lower(), RANKS[card >> 2]}
+        suits = {SUIT_CHARS[card & 3], SUIT_CHARS[card & 3].upper(), SUITS[card & 3]}
+        for rank in ranks:
+            for suit in suits:
+                forms[rank + suit] = card
+    return forms
+
+
+_STR_INTS = _string_forms()
+
+
+def encode_card(card):
+    # Ints pass straight through so already-encoded hands can be handed around freely
+    if isinstance(card, int) and not isinstance(card, bool):
+        if 0 <= card < NUM_CARDS:
+            return card
+        raise ValueError(f"Invalid card: {card!r}")
+    if isinstance(card, str):
+        try:
+            return _STR_INTS[card.strip()]
+        except KeyError:
+            raise ValueError(f"Invalid card: {card!r}")
+    try:
+        return _CARD_INTS[(card['rank'], card['suit'])]
+    except (KeyError, TypeError):
+        raise ValueError(f"Invalid card: {card!r}")
+
+
+def encode_cards(cards):
+    return [encode_card(card) for card in cards]
+
+
+def decode_card(card, fmt='dict'):
+    if fmt == 'str':
+        return _CARD_STRS[card]
+    if fmt == 'int':
+        return card
+    # Hand out a fresh dict so callers can't mutate the shared table
+    return dict(_CARD_DICTS[card])
+
+
+def decode_cards(cards, fmt='dict'):
+    if fmt == 'str':
+        return [_CARD_STRS[card] for card in cards]
+    if fmt == 'int':
+        return list(cards)
+    return [dict(_CARD_DICTS[card]) for card in cards]
+
+
+def format_cards(cards):
+    # Short human readable form for logs, e.g. "A♠ 10♥ 2♣"
+    return ' '.join(RANKS[card >> 2] + SUITS[card & 3] for card in cards)
+
+
+def new_deck():
+    return list(range(NUM_CARDS))
+
+
+FULL_DECK_MASK = (1 << NUM_CARDS) - 1
+_MASK64 = (1 << 64) - 1
+
+
+class Deck:
+    # The cards not dealt yet, one bit per card. Every deal picks one of them
+    # with the deck's own seeded PRNG (splitmix64: its state is a single int,
+    # so a deck is cheap to copy), and Deck(seed) always deals the same cards
+    # in the same order.
+    __slots__ = ('seed', 'mask', 'left', '_state', '_buffer', '_bits')
+
+    def __init__(self, seed=None, mask=FULL_DECK_MASK):
+        self.seed = random.getrandbits(64) if seed is None else seed
+        self.mask = mask
+        self.left = bin(mask).count('1')
+        self._state = self.seed & _MASK64
+        # Unused random bits of the last output
+        self._buffer = 0
+        self._bits = 0
+
+    def __len__(self):
+        return self.left
+
+    def __contains__(self, card):
+        return bool(self.mask >> card & 1)
+
+    def __iter__(self):
+        # The remaining cards in the order they would be dealt; the deck itself is untouched
+        copy = Deck(self.seed, self.mask)
+        copy._state, copy._buffer, copy._bits = self._state, self._buffer, self._bits
+        while copy.mask:
+            yield copy.deal()
+
+    def _next64(self):
+        self._state = state = (self._state + 0x9E3779B97F4A7C15) & _MASK64
+        state = ((state ^ (state >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+        state = ((state ^ (state >> 27)) * 0x94D049BB133111EB) & _MASK64
+        return state ^ (state >> 31)
+
+    def deal(self):
+        mask = self.mask
+        if not mask:
+            raise ValueError("The deck is empty")
+        # Random bits are used 6 (or 4) at a time, one 64-bit output lasts
+        # for several draws
+        buffer, bits = self._buffer, self._bits
+        if self.left > 16:
+            # Draw 6 bits until they name a card still in the deck: uniform
+            # over the remaining cards, and only a few draws
+            while True:
+                if bits < 6:
+                    buffer, bits = self._next64(), 64
+                card = buffer & 63
+                buffer >>= 6
+                bits -= 6
+                if mask >> card & 1:
+                    break
+        else:
+            # Nearly empty: draw an index among the remaining cards the same
+            # way, then skip to that card, lowest bit first
+            while True:
+                if bits < 4:
+                    buffer, bits = self._next64(), 64
+                index = buffer & 15
+                buffer >>= 4
+                bits -= 4
+                if index < self.left:
+                    break
+            for _ in range(index):
+                mask &= mask - 1
+            card = (mask & -mask).bit_length() - 1
+        self._buffer, self._bits = buffer, bits
+        self.mask ^= 1 << card
+        self.left -= 1
+        return card
+
+    def deal_many(self, count):
+        return [self.deal() for _ in range(count)]
+
+    def remove(self, cards):
+        # Take known cards out, e.g. the ones already on the table
+        for card in cards:
+            self.mask &= ~(1 << card)
+        self.left = bin(self.mask).count('1')
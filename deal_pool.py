@@ -0,0 +1,214 @@
+# Background pool of pre-dealt, pre-scored games.
+#
+# /start_game used to shuffle and deal on demand, and the table was only
+# evaluated later, at reveal time, while the player waited. A producer thread
+# here keeps a bounded pool of ready games for each (num_players, num_flops,
+# difficulty) combination. Every game is dealt like deal_game() and already
+# scored on every board a player can be shown: the full board in easy mode;
+# the flop, either turn card (any face-down card may be revealed first) and
+# the river in difficult mode. Serving a game is a deque pop and each reveal
+# a dict lookup.
+#
+#   DEAL_POOL_SIZE      games kept per combination (the high watermark), 0 (the default)
+#                       turns the pool off; 32 suits a single server process
+#   DEAL_POOL_LOW       refilling starts when a combination drops below this many
+#   DEAL_POOL_MAX_KEYS  combinations kept, the least recently asked for is dropped
+#
+# The pool is opt-in: every process that imports the app would otherwise
+# get a producer thread. Even when on, a combination is only pooled once it
+# has been asked for, and the thread starts on the first request, so an idle
+# server (or a spawned evaluation worker importing the app) does no work.
+
+import os
+import random
+import threading
+from collections import OrderedDict, deque
+
+from hand_evaluator import PreparedBoard, best_hand, card_mask, extend_best_hand
+from metrics import metrics
+
+MAX_PLAYERS = 10
+DIFFICULTIES = ('easy', 'difficult')
+
+
+def exposures(board, difficulty):
+    # The card sets of a board a player can see, in the order they are scored
+    if difficulty == 'easy':
+        return [board]
+    return [board[:3], board[:4], board[:3] + [board[4]], board]
+
+
+class PooledGame:
+    __slots__ = ('hands', 'boards', 'deck', 'difficulty', 'scores')
+
+    def __init__(self, hands, boards, deck, difficulty, scores):
+        self.hands = hands
+        self.boards = boards
+        self.deck = deck
+        self.difficulty = difficulty
+        # Per board: {board card mask: ([(strength, five)] per player, (winner, hand_type, best))}
+        self.scores = scores
+
+    def prefill(self, cache):
+        # Hand the precomputed best hands to a BestHandCache, so the stateless
+        # /reveal_winner calls for this game are all hits
+        for board, scores in zip(self.boards, self.scores):
+            for cards in exposures(board, self.difficulty):
+                results = scores[card_mask(cards)][0]
+                for hand, result in zip(self.hands, results):
+                    cache.store(hand, cards, result)
+
+
+def score_board(hands, board, difficulty, pick):
+    # Each player's best hand on every exposure of the board, each street
+    # extending the one before it, plus the winner picked from them
+    scores = {}
+
+    def add(cards, results):
+        scores[card_mask(cards)] = (results, pick(results))
+        return results
+
+    if difficulty == 'easy':
+        prepared = PreparedBoard(board)
+        add(board, [best_hand(hand, prepared) for hand in hands])
+        return scores
+
+    flop = PreparedBoard(board[:3])
+    flop_results = add(board[:3], [best_hand(hand, flop) for hand in hands])
+    turns = []
+    for turn in board[3], board[4]:
+        cards = board[:3] + [turn]
+        prepared = PreparedBoard(cards)
+        turns.append(add(cards, [
+            extend_best_hand(hand, prepared, turn, previous) for hand, previous in zip(hands, flop_results)
+        ]))
+    river = PreparedBoard(board)
+    add(board, [extend_best_hand(hand, river, board[4], previous) for hand, previous in zip(hands, turns[0])])
+    return scores
+
+
+class DealPool:
+    def __init__(self, deal, pick, size=32, low=8, max_keys=16, seed=None):
+        # deal(num_players, num_flops, rng) -> (hands, boards, deck) and
+        # pick([(strength, five)]) -> (winner, hand_type, best) are
+        # app.deal_game and app.pick_winners
+        self._deal = deal
+        self._pick = pick
+        self.size = size
+        self.low = min(low, size)
+        self.max_keys = max_keys
+        self._rng = random.Random(seed)
+        self._cond = threading.Condition()
+        # key -> deque of PooledGame; least recently asked for first
+        self._pools = OrderedDict()
+        # Keys below the low watermark, filled back up to size
+        self._refilling = set()
+        self._thread = None
+        self._stopped = False
+        self.hits = 0
+        self.misses = 0
+        self.produced = 0
+        self.dropped = 0
+
+    @property
+    def enabled(self):
+        return self.size > 0
+
+    def produce(self, num_players, num_flops, difficulty):
+        hands, boards, deck = self._deal(num_players, num_flops, self._rng)
+        scores = [score_board(hands, board, difficulty, self._pick) for board in boards]
+        # The rest of the deck listed here, off the request path
+        return PooledGame(hands, boards, list(deck), difficulty, scores)
+
+    def take(self, num_players, num_flops, difficulty):
+        # A ready PooledGame, or None when the pool is off, the combination
+        # isn't pooled or its pool has run dry (the caller deals inline)
+        if not self.enabled or difficulty not in DIFFICULTIES:
+            return None
+        if not isinstance(num_players, int) or not 2 <= num_players <= MAX_PLAYERS:
+            return None
+        key = (num_players, 2 if num_flops == 2 else 1, difficulty)
+        with self._cond:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = deque()
+                while len(self._pools) > self.max_keys:
+                    dropped, _ = self._pools.popitem(last=False)
+                    self._refilling.discard(dropped)
+                    self.dropped += 1
+            else:
+                self._pools.move_to_end(key)
+            game = pool.popleft() if pool else None
+            if game is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            if len(pool) < self.low and key not in self._refilling:
+                self._refilling.add(key)
+                self._cond.notify()
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(target=self._run, name='deal-pool', daemon=True)
+                self._thread.start()
+        metrics.inc('deal_pool_requests_total', result='miss' if game is None else 'hit')
+        return game
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped and not self._refilling:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                # Emptiest pool first, so one busy combination can't starve the rest
+                key = min(self._refilling, key=lambda k: len(self._pools[k]))
+            game = self.produce(*key)
+            with self._cond:
+                pool = self._pools.get(key)
+                if pool is None:
+                    # Dropped while this game was being dealt
+                    continue
+                pool.append(game)
+                self.produced += 1
+                if len(pool) >= self.size:
+                    self._refilling.discard(key)
+
+    def stop(self):
+        # Stop the producer thread; the next take() starts a new one
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+        with self._cond:
+            self._stopped = False
+            self._thread = None
+
+    def ready(self, num_players, num_flops, difficulty):
+        # Games waiting in one combination's pool
+        with self._cond:
+            pool = self._pools.get((num_players, 2 if num_flops == 2 else 1, difficulty))
+            return len(pool) if pool is not None else 0
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'low_watermark': self.low,
+                'combinations': len(self._pools),
+                'refilling': len(self._refilling),
+                'ready': sum(len(pool) for pool in self._pools.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'produced': self.produced,
+                'dropped': self.dropped,
+            }
+
+
+def create_deal_pool(deal, pick):
+    return DealPool(
+        deal, pick,
+        size=int(os.environ.get('DEAL_POOL_SIZE', 0)),
+        low=int(os.environ.get('DEAL_POOL_LOW', 8)),
+        max_keys=int(os.environ.get('DEAL_POOL_MAX_KEYS', 16)),
+    )
@@ -0,0 +1,132 @@
+# Bulk drill generator: pre-scored deals streamed as newline delimited JSON.
+#
+#   python drills.py --count 5000 --players 6 --boards 2 --difficulty difficult > drills.ndjson
+#   GET /drills?count=5000&players=6&boards=2&difficulty=difficult
+#
+# Every line is one deal, dealt exactly like /start_game and scored with the
+# same winner logic as /reveal_winner, with the winner, hand type and best
+# hand already filled in for each board. Difficult drills also carry the
+# winners after the flop and the turn (the streets a player predicts on).
+# Deals are generated one at a time, so memory stays flat however many are
+# asked for.
+
+import argparse
+import json
+import random
+import sys
+
+from cards import CARD_FORMATS, decode_cards
+
+MAX_DRILLS = 100000
+MAX_PLAYERS = 10
+DIFFICULTIES = ('easy', 'difficult')
+BOARD_KEYS = ['first_flop', 'second_flop']
+STREETS = (('flop', 3), ('turn', 4))
+
+
+def parse_drill_options(args):
+    # Validated generate_drills() options from query args (any mapping of strings)
+    try:
+        count = int(args.get('count', 100))
+        num_players = int(args.get('players', 4))
+        num_boards = int(args.get('boards', 2))
+        seed = args.get('seed')
+        seed = int(seed) if seed not in (None, '') else None
+    except (TypeError, ValueError):
+        raise ValueError("count, players, boards and seed must be integers")
+    difficulty = args.get('difficulty', 'easy')
+    fmt = args.get('cards', 'dict')
+    if not 1 <= count <= MAX_DRILLS:
+        raise ValueError(f"count must be between 1 and {MAX_DRILLS}")
+    if not 2 <= num_players <= MAX_PLAYERS:
+        raise ValueError(f"players must be between 2 and {MAX_PLAYERS}")
+    if num_boards not in (1, 2):
+        raise ValueError("boards must be 1 or 2")
+    if difficulty not in DIFFICULTIES:
+        raise ValueError(f"difficulty must be one of {', '.join(DIFFICULTIES)}")
+    if fmt not in CARD_FORMATS:
+        raise ValueError(f"cards must be one of {', '.join(CARD_FORMATS)}")
+    return {
+        'count': count,
+        'num_players': num_players,
+        'num_boards': num_boards,
+        'difficulty': difficulty,
+        'seed': seed,
+        'fmt': fmt,
+    }
+
+
+def _scored(result, fmt):
+    winner, hand_type, best = result
+    return {'winner': winner, 'hand_type': hand_type, 'best_hand': decode_cards(best, fmt)}
+
+
+def generate_drills(deal, score, count, num_players=4, num_boards=2, difficulty='easy', seed=None, fmt='dict'):
+    # deal(num_players, num_flops, rng) -> (hands, boards, deck) and
+    # score(hands, boards) -> [(winner, hand_type, best)] are app.deal_game and
+    # app.score_drill, passed in so this module doesn't import the app
+    rng = random.Random(seed)
+    for index in range(count):
+        hands, boards, deck = deal(num_players, num_boards, rng)
+        drill = {
+            'id': index + 1,
+            'difficulty': difficulty,
+            'players': [{'cards': decode_cards(hand, fmt)} for hand in hands],
+        }
+        final = score(hands, boards)
+        streets = {}
+        if difficulty == 'difficult':
+            for street, size in STREETS:
+                streets[street] = score(hands, [board[:size] for board in boards])
+        for board_index, key in enumerate(BOARD_KEYS):
+            if board_index >= len(boards):
+                drill[key] = None
+                continue
+            entry = {'cards': decode_cards(boards[board_index], fmt)}
+            entry.update(_scored(final[board_index], fmt))
+            if streets:
+                entry['streets'] = {
+                    street: _scored(results[board_index], fmt) for street, results in streets.items()
+                }
+            drill[key] = entry
+        yield drill
+
+
+def ndjson_lines(drills):
+    for drill in drills:
+        yield json.dumps(drill, ensure_ascii=False) + '\n'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stream pre-scored bombpot deals as NDJSON.')
+    parser.add_argument('--count', type=int, default=100)
+    parser.add_argument('--players', type=int, default=4)
+    parser.add_argument('--boards', type=int, default=2)
+    parser.add_argument('--difficulty', default='easy', choices=DIFFICULTIES)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--cards', default='dict', choices=CARD_FORMATS, help='card format in the output')
+    parser.add_argument('-o', '--output', default='-', help='file to write, - for stdout')
+    args = parser.parse_args(argv)
+    try:
+        options = parse_drill_options({
+            'count': args.count, 'players': args.players, 'boards': args.boards,
+            'difficulty': args.difficulty, 'seed': args.seed, 'cards': args.cards,
+        })
+    except ValueError as e:
+        parser.error(str(e))
+
+    # Imported here: app imports this module for its /drills route
+    from app import deal_game, score_drill
+
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        for line in ndjson_lines(generate_drills(deal_game, score_drill, **options)):
+            out.write(line)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
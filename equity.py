@@ -0,0 +1,185 @@
+# Monte Carlo win/tie equity for partially dealt bombpot boards.
+#
+# The unknown turn/river cards are sampled from the cards nobody holds until
+# every player's equity is known to within target_error (95% confidence
+# half-width) or the time budget runs out, whichever comes first. When the
+# number of possible runouts is small (e.g. only rivers to come) they are
+# enumerated instead and the result is exact.
+#
+# Runouts are played CHECK_EVERY at a time, and with NumPy installed each
+# batch is evaluated in one vector_eval call instead of a best_hand() per
+# player and runout.
+
+import math
+import random
+import time
+from itertools import combinations, islice
+
+import vector_eval
+from cards import NUM_CARDS
+from hand_evaluator import best_hand, prepare_board
+
+Z_95 = 1.96
+# Enumerate every runout instead of sampling when there are at most this many
+EXACT_RUNOUT_LIMIT = 2000
+# How many runouts to play between checks of the clock and the error bars
+CHECK_EVERY = 64
+
+
+def _count_runouts(remaining, missing):
+    total = 1
+    for count in missing:
+        total *= math.comb(remaining, count)
+        remaining -= count
+    return total
+
+
+def _all_runouts(remaining, missing):
+    # Every way to complete the boards, as one list of new cards per board
+    if not missing:
+        yield []
+        return
+    for cards in combinations(remaining, missing[0]):
+        rest = [card for card in remaining if card not in cards]
+        for others in _all_runouts(rest, missing[1:]):
+            yield [list(cards)] + others
+
+
+class _Tally:
+    # Running win/tie/equity sums for one board
+    __slots__ = ('wins', 'ties', 'equity', 'equity_sq')
+
+    def __init__(self, num_players):
+        self.wins = [0] * num_players
+        self.ties = [0] * num_players
+        self.equity = [0.0] * num_players
+        self.equity_sq = [0.0] * num_players
+
+    def add(self, strengths):
+        best = max(strengths)
+        winners = [index for index, strength in enumerate(strengths) if strength == best]
+        share = 1.0 / len(winners)
+        for index in winners:
+            if len(winners) == 1:
+                self.wins[index] += 1
+            else:
+                self.ties[index] += 1
+            self.equity[index] += share
+            self.equity_sq[index] += share * share
+
+    def half_width(self, samples):
+        # Largest 95% confidence half-width over the players
+        widest = 0.0
+        for total, total_sq in zip(self.equity, self.equity_sq):
+            mean = total / samples
+            variance = max(total_sq / samples - mean * mean, 0.0)
+            widest = max(widest, Z_95 * math.sqrt(variance / samples))
+        return widest
+
+    def results(self, samples, exact):
+        results = []
+        for index in range(len(self.wins)):
+            mean = self.equity[index] / samples
+            variance = max(self.equity_sq[index] / samples - mean * mean, 0.0)
+            results.append({
+                'player': f"Player {index + 1}",
+                'win': self.wins[index] / samples,
+                'tie': self.ties[index] / samples,
+                'equity': mean,
+                'error': 0.0 if exact else Z_95 * math.sqrt(variance / samples),
+            })
+        return results
+
+
+def estimate_equity(hands, boards, target_error=0.01, time_budget_ms=200, max_samples=100000, rng=None,
+                    vectorized=None):
+    # hands: int hole cards per player; boards: int cards already on each board (3-5 each).
+    # vectorized: evaluate with vector_eval (default: when NumPy is installed)
+    known = [card for hand in hands for card in hand] + [card for board in boards for card in board]
+    known_set = set(known)
+    if len(known_set) != len(known):
+        raise ValueError("Duplicate cards in players or boards.")
+    remaining = [card for card in range(NUM_CARDS) if card not in known_set]
+    missing = [5 - len(board) for board in boards]
+    if sum(missing) > len(remaining):
+        raise ValueError("Not enough cards left to complete the boards.")
+
+    rng = rng or random
+    if vectorized is None:
+        vectorized = vector_eval.AVAILABLE
+    if len({len(hand) for hand in hands}) != 1 or len(hands[0]) < 2:
+        # The vectorized evaluator takes one (players, hole cards) array
+        vectorized = False
+    tallies = [_Tally(len(hands)) for _ in boards]
+    # Boards that are already complete have the same result on every runout
+    fixed = [
+        [best_hand(hand, prepare_board(board))[0] for hand in hands] if not count else None
+        for board, count in zip(boards, missing)
+    ]
+    open_boards = [index for index, count in enumerate(missing) if count]
+    open_missing = [missing[index] for index in open_boards]
+
+    def play(runouts):
+        # runouts: [[new cards per open board]], tallied board by board
+        for index, board in enumerate(boards):
+            if fixed[index] is not None:
+                for _ in runouts:
+                    tallies[index].add(fixed[index])
+                continue
+            position = open_boards.index(index)
+            completed = [board + runout[position] for runout in runouts]
+            if vectorized:
+                strengths = vector_eval.best_hands_table(hands, completed)[0].tolist()
+            else:
+                strengths = []
+                for cards in completed:
+                    prepared = prepare_board(cards)
+                    strengths.append([best_hand(hand, prepared)[0] for hand in hands])
+            for row in strengths:
+                tallies[index].add(row)
+
+    start = time.perf_counter()
+    deadline = start + time_budget_ms / 1000.0
+    samples = 0
+    exact = _count_runouts(len(remaining), open_missing) <= EXACT_RUNOUT_LIMIT
+    if exact:
+        # Enumerated in a random order, so a run cut short by the time budget
+        # is a random sample (without replacement) rather than a
+        # lexicographic prefix, and its error bars hold
+        runouts = list(_all_runouts(remaining, open_missing))
+        rng.shuffle(runouts)
+        runouts = iter(runouts)
+        while True:
+            batch = list(islice(runouts, CHECK_EVERY))
+            if not batch:
+                break
+            play(batch)
+            samples += len(batch)
+            if len(batch) == CHECK_EVERY and time.perf_counter() > deadline:
+                # Ran out of time: report the shuffled runouts played so far as a sample
+                exact = False
+                break
+    else:
+        need = sum(open_missing)
+        while samples < max_samples:
+            batch = []
+            for _ in range(min(CHECK_EVERY, max_samples - samples)):
+                drawn = rng.sample(remaining, need)
+                runout = []
+                for count in open_missing:
+                    runout.append(drawn[:count])
+                    drawn = drawn[count:]
+                batch.append(runout)
+            play(batch)
+            samples += len(batch)
+            if time.perf_counter() > deadline:
+                break
+            if max(tally.half_width(samples) for tally in tallies) <= target_error:
+                break
+
+    return {
+        'samples': samples,
+        'exact': exact,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 2),
+        'boards': [tally.results(samples, exact) for tally in tallies],
+    }
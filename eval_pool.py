@@ -0,0 +1,199 @@
+# Optional process pool for hand evaluation.
+#
+# Winner determination runs best_hand() once per (player, board). On a big
+# table, a batch of deals or an equity run that is enough pure Python work to
+# hold the GIL and stall every other request in the process, so with
+# EVAL_POOL_WORKERS > 0 those evaluations are spread over worker processes:
+#
+#   EVAL_POOL_WORKERS    worker processes, 0 (the default) keeps everything inline
+#   EVAL_POOL_THRESHOLD  fewer (player, board) evaluations than this stay inline,
+#                        where the pickling round trip would cost more than it saves
+#   EVAL_POOL_TIMEOUT    seconds a request may wait for the pool before it fails
+#
+# The workers run the very same best_hand() on the same inputs, so results are
+# identical to the inline path. Workers are started with "spawn" (forking a
+# process that already runs request threads is unsafe) and warmed up front:
+# every one imports the evaluator and builds its tables before the first
+# request needs it.
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_EXCEPTION
+from concurrent.futures.process import BrokenProcessPool
+
+from hand_evaluator import PreparedBoard, best_hand, prepare_board
+from metrics import metrics
+
+
+class EvalPoolTimeout(TimeoutError):
+    pass
+
+
+def _warm_worker():
+    # Runs once in every worker: importing hand_evaluator built the tables,
+    # one evaluation touches them
+    best_hand([0, 5, 10, 15], [20, 25, 30, 35, 40])
+
+
+def _ping():
+    return os.getpid()
+
+
+def _best_hands_chunk(jobs):
+    # jobs: [(hole, board cards)]; boards repeat across players, prepare each once
+    boards = {}
+    results = []
+    for hole, board in jobs:
+        key = tuple(board)
+        prepared = boards.get(key)
+        if prepared is None:
+            prepared = boards[key] = prepare_board(board)
+        results.append(best_hand(hole, prepared))
+    return results
+
+
+class EvalPool:
+    def __init__(self, workers=0, threshold=32, timeout=5.0):
+        self.workers = workers
+        self.threshold = threshold
+        self.timeout = timeout
+        self._executor = None
+        self._lock = threading.Lock()
+        self.pooled_jobs = 0
+        self.inline_jobs = 0
+        self.timeouts = 0
+        self.restarts = 0
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    def start(self):
+        # Start the workers and wait until every one of them is warm
+        if not self.enabled:
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_warm_worker,
+                )
+                # One task per worker forces them all to start and run the initializer
+                futures = [self._executor.submit(_ping) for _ in range(self.workers * 2)]
+                wait(futures)
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _restart(self):
+        # A worker died (killed, out of memory): start over with a fresh pool
+        self.restarts += 1
+        self.shutdown()
+
+    def _run(self, fn, chunks, timeout):
+        # fn(chunk) for every chunk on the pool, results in chunk order
+        executor = self.start()
+        futures = [executor.submit(fn, chunk) for chunk in chunks]
+        done, pending = wait(futures, timeout=timeout, return_when=FIRST_EXCEPTION)
+        for future in pending:
+            future.cancel()
+        for future in done:
+            if future.exception() is not None:
+                raise future.exception()
+        if pending:
+            self.timeouts += 1
+            metrics.inc('eval_pool_timeouts_total')
+            raise EvalPoolTimeout(f"Evaluation did not finish within {timeout:g}s")
+        return [future.result() for future in futures]
+
+    def best_hands(self, jobs, cache=None):
+        # [(strength, five)] for [(hole, board)] jobs (board a card list or a
+        # PreparedBoard), in order. Cached results are served in process and
+        # only the misses go to the pool, chunked evenly over the workers.
+        if not self.enabled or len(jobs) < self.threshold:
+            self.inline_jobs += len(jobs)
+            if cache is not None:
+                return [cache.best_hand(hole, board) for hole, board in jobs]
+            return [best_hand(hole, board) for hole, board in jobs]
+
+        results = [None] * len(jobs)
+        missing = []
+        for index, (hole, board) in enumerate(jobs):
+            found = cache.lookup(hole, board) if cache is not None else None
+            if found is None:
+                missing.append(index)
+            else:
+                results[index] = found
+        if missing:
+            payload = [(list(jobs[index][0]), _board_cards(jobs[index][1])) for index in missing]
+            size = -(-len(payload) // self.workers)
+            chunks = [payload[start:start + size] for start in range(0, len(payload), size)]
+            start = time.perf_counter()
+            try:
+                computed = self._run(_best_hands_chunk, chunks, self.timeout)
+            except BrokenProcessPool:
+                # Finish this request inline; the next one gets a fresh pool
+                self._restart()
+                computed = [_best_hands_chunk(chunk) for chunk in chunks]
+            metrics.observe('eval_pool_duration_ms', (time.perf_counter() - start) * 1000)
+            self.pooled_jobs += len(payload)
+            position = 0
+            for chunk in computed:
+                for result in chunk:
+                    index = missing[position]
+                    results[index] = result
+                    if cache is not None:
+                        cache.store(jobs[index][0], jobs[index][1], result)
+                    position += 1
+        return results
+
+    def call(self, fn, *args, timeout=None, **kwargs):
+        # fn(*args, **kwargs) on a worker (inline when the pool is off), for
+        # single heavy jobs such as an equity estimate
+        if not self.enabled:
+            return fn(*args, **kwargs)
+        timeout = self.timeout if timeout is None else timeout
+        executor = self.start()
+        try:
+            future = executor.submit(fn, *args, **kwargs)
+            done, pending = wait([future], timeout=timeout)
+            if pending:
+                future.cancel()
+                self.timeouts += 1
+                metrics.inc('eval_pool_timeouts_total')
+                raise EvalPoolTimeout(f"Evaluation did not finish within {timeout:g}s")
+            return future.result()
+        except BrokenProcessPool:
+            self._restart()
+            return fn(*args, **kwargs)
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'running': self._executor is not None,
+            'threshold': self.threshold,
+            'pooled_jobs': self.pooled_jobs,
+            'inline_jobs': self.inline_jobs,
+            'timeouts': self.timeouts,
+            'restarts': self.restarts,
+        }
+
+
+def _board_cards(board):
+    # Workers get plain card lists, a PreparedBoard's triples aren't worth pickling
+    return list(board.cards) if isinstance(board, PreparedBoard) else list(board)
+
+
+def create_eval_pool():
+    return EvalPool(
+        workers=int(os.environ.get('EVAL_POOL_WORKERS', 0)),
+        threshold=int(os.environ.get('EVAL_POOL_THRESHOLD', 32)),
+        timeout=float(os.environ.get('EVAL_POOL_TIMEOUT', 5)),
+    )
@@ -0,0 +1,212 @@
+# Server-side game sessions.
+#
+# Instead of sending the deck and the face-down cards to the browser and
+# having it post them back on every reveal, /start_game can keep the game
+# here and hand out a game ID. A game is stored compactly as int cards packed
+# into bytes: four hole cards per player and all five cards of each board,
+# plus how many cards of each board have been revealed.
+#
+# The store is an LRU with a sliding TTL and caps on both the number of games
+# and their (approximate) memory use. A game grows as it is played (see
+# below), so its size is counted again after every change (resize()).
+#
+# Concurrent requests for one game are serialized on the game's own lock,
+# held by the caller for as long as it reads and changes the state.
+#
+# Once a board's winner has been asked for, each player's best hand on it is
+# kept (HandProgress) and updated with just the new card's combinations as the
+# turn and river are revealed. Games served from the deal pool come with
+# every street already scored, and those are looked up instead.
+
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from hand_evaluator import HandProgress, PreparedBoard, card_mask
+
+
+class GameState:
+    __slots__ = ('hands', 'boards', 'revealed', 'difficulty', 'progress', 'scores', 'lock')
+
+    def __init__(self, hands, boards, revealed, difficulty='easy', scores=None):
+        self.hands = [bytes(hand) for hand in hands]
+        self.boards = [bytes(board) for board in boards]
+        self.revealed = list(revealed)
+        self.difficulty = difficulty
+        # board index -> [HandProgress per player], built on first use
+        self.progress = {}
+        # Per board {board card mask: (best hands, winner)} from deal_pool, or None
+        self.scores = scores
+        self.lock = threading.Lock()
+
+    def exposed(self, board_index):
+        board = self.boards[board_index]
+        return list(board[:self.revealed[board_index]])
+
+    def hidden_count(self, board_index):
+        return len(self.boards[board_index]) - self.revealed[board_index]
+
+    def reveal(self, board_index, index=0):
+        # Turn over the index-th face-down card of a board (the next one by default)
+        position = self.revealed[board_index]
+        board = bytearray(self.boards[board_index])
+        if index < 0 or position + index >= len(board):
+            raise ValueError("Invalid flop or index.")
+        if index:
+            board[position], board[position + index] = board[position + index], board[position]
+        self.boards[board_index] = bytes(board)
+        self.revealed[board_index] = position + 1
+        card = board[position]
+        progress = self.progress.get(board_index)
+        if progress is not None:
+            # The new card's triples are shared by every player
+            prepared = PreparedBoard(self.exposed(board_index))
+            for player in progress:
+                player.add_card(card, prepared)
+        return card
+
+    def _scored(self, board_index):
+        if self.scores is None:
+            return None
+        return self.scores[board_index].get(card_mask(self.exposed(board_index)))
+
+    def winner(self, board_index):
+        # Precomputed (winner, hand_type, best) for the revealed part of a board, or None
+        scored = self._scored(board_index)
+        return scored[1] if scored is not None else None
+
+    def best_hands(self, board_index):
+        # (strength, best five) per player on the revealed part of a board
+        scored = self._scored(board_index)
+        if scored is not None:
+            return list(scored[0])
+        progress = self.progress.get(board_index)
+        if progress is None:
+            exposed = self.exposed(board_index)
+            progress = self.progress[board_index] = [HandProgress(hand, exposed) for hand in self.hands]
+        return [(player.strength, player.five) for player in progress]
+
+    def size(self):
+        # Rough memory footprint, used for the store's byte cap
+        return (
+            sys.getsizeof(self)
+            + sum(sys.getsizeof(hand) for hand in self.hands)
+            + sum(sys.getsizeof(board) for board in self.boards)
+            + sys.getsizeof(self.revealed)
+            + sum(_scores_size(scores) for scores in self.scores or ())
+            + sum(_progress_size(progress) for progress in self.progress.values())
+        )
+
+
+def _progress_size(progress):
+    size = sys.getsizeof(progress)
+    for player in progress:
+        size += sys.getsizeof(player) + sys.getsizeof(player.hole) + sys.getsizeof(player.board)
+        size += sys.getsizeof(player.five)
+    return size
+
+
+def _scores_size(scores):
+    size = sys.getsizeof(scores)
+    for results, (winner, hand_type, best) in scores.values():
+        size += sys.getsizeof(results) + sys.getsizeof(best) + sys.getsizeof(hand_type)
+        size += sum(sys.getsizeof(five) for strength, five in results)
+    return size
+
+
+class GameSessionStore:
+    def __init__(self, max_sessions=10000, ttl_seconds=3600, max_bytes=32 * 1024 * 1024):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # game_id -> (state, expires_at, size); least recently used first
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def create(self, state):
+        game_id = secrets.token_urlsafe(12)
+        size = state.size()
+        with self._lock:
+            self._sessions[game_id] = (state, time.monotonic() + self.ttl_seconds, size)
+            self._bytes += size
+            self._purge()
+        return game_id
+
+    def get(self, game_id):
+        with self._lock:
+            entry = self._sessions.get(game_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            state, expires_at, size = entry
+            if expires_at < time.monotonic():
+                self._remove(game_id)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            # Sliding TTL: every use keeps the game alive and makes it most recent
+            self._sessions[game_id] = (state, time.monotonic() + self.ttl_seconds, size)
+            self._sessions.move_to_end(game_id)
+            self.hits += 1
+            return state
+
+    def resize(self, game_id, state):
+        # Count a game's size again after it changed (revealed cards, best hands kept)
+        size = state.size()
+        with self._lock:
+            entry = self._sessions.get(game_id)
+            if entry is None or entry[0] is not state:
+                return
+            self._sessions[game_id] = (state, entry[1], size)
+            self._bytes += size - entry[2]
+            self._purge()
+
+    def discard(self, game_id):
+        with self._lock:
+            if game_id in self._sessions:
+                self._remove(game_id)
+
+    def _remove(self, game_id):
+        state, expires_at, size = self._sessions.pop(game_id)
+        self._bytes -= size
+
+    def _purge(self):
+        # The TTL slides on every use, so the oldest entries also expire first
+        now = time.monotonic()
+        while self._sessions:
+            game_id, (state, expires_at, size) = next(iter(self._sessions.items()))
+            if expires_at < now:
+                self._remove(game_id)
+                self.expirations += 1
+            elif len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes:
+                self._remove(game_id)
+                self.evictions += 1
+            else:
+                break
+
+    def stats(self):
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+def create_session_store():
+    return GameSessionStore(
+        max_sessions=int(os.environ.get('GAME_SESSION_MAX', 10000)),
+        ttl_seconds=float(os.environ.get('GAME_SESSION_TTL', 3600)),
+        max_bytes=int(os.environ.get('GAME_SESSION_MAX_BYTES', 32 * 1024 * 1024)),
+    )
@@ -0,0 +1,115 @@
+# Stateless signed game tokens.
+#
+# A token describes a whole game in a few bytes: a seed, the player count,
+# the number of flops, the difficulty and how far each board has been
+# revealed. The cards themselves are never sent: the hands and boards are
+# dealt again from the seed on every request, so any worker can serve any
+# request without shared session storage.
+#
+# Tokens are signed with HMAC-SHA256 (GAME_TOKEN_SECRET), so a client can't
+# change them, and the deck is seeded from an HMAC of the token's seed rather
+# than the seed itself, so the face-down cards can't be worked out from it
+# either. Without GAME_TOKEN_SECRET every process makes up its own secret and
+# tokens only work on the process that issued them.
+
+import base64
+import hashlib
+import hmac
+import os
+import random
+import secrets
+import struct
+
+from game_sessions import GameState
+
+TOKEN_VERSION = 1
+DIFFICULTIES = ('easy', 'difficult')
+MAX_PLAYERS = 10
+# version, seed, players, flops, difficulty, board state (3 bits per board)
+_PAYLOAD = struct.Struct('>BQBBBB')
+_SIGNATURE_SIZE = 16
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+class GameTokens:
+    def __init__(self, secret, deal):
+        # deal(num_players, num_flops, rng) -> (hands, boards, deck) is app.deal_game
+        self._secret = secret
+        self._deal = deal
+
+    def _sign(self, payload):
+        return hmac.new(self._secret, payload, hashlib.sha256).digest()[:_SIGNATURE_SIZE]
+
+    def _deal_from_seed(self, seed, num_players, num_flops):
+        # Same seed, same game; the rng is keyed so the seed alone reveals nothing
+        digest = hmac.new(self._secret, b'deal' + struct.pack('>Q', seed), hashlib.sha256).digest()
+        rng = random.Random(int.from_bytes(digest[:8], 'big'))
+        hands, boards, deck = self._deal(num_players, num_flops, rng)
+        return hands, boards
+
+    def new_game(self, num_players, num_flops, difficulty='easy'):
+        # (token, GameState) for a freshly dealt game
+        if not isinstance(num_players, int) or not 2 <= num_players <= MAX_PLAYERS:
+            raise ValueError(f"num_players must be between 2 and {MAX_PLAYERS}")
+        if difficulty not in DIFFICULTIES:
+            raise ValueError(f"difficulty must be one of {', '.join(DIFFICULTIES)}")
+        seed = secrets.randbits(64)
+        num_flops = 2 if num_flops == 2 else 1
+        hands, boards = self._deal_from_seed(seed, num_players, num_flops)
+        revealed = [5 if difficulty == 'easy' else 3] * len(boards)
+        state = GameState(hands, boards, revealed, difficulty)
+        return self.dump(seed, state), state
+
+    def load(self, token):
+        # (seed, GameState) for a token, InvalidToken if it is malformed or was altered
+        try:
+            raw = _b64decode(token)
+        except (TypeError, ValueError):
+            raise InvalidToken("Invalid game token.")
+        payload, signature = raw[:_PAYLOAD.size], raw[_PAYLOAD.size:]
+        if len(raw) != _PAYLOAD.size + _SIGNATURE_SIZE or not hmac.compare_digest(signature, self._sign(payload)):
+            raise InvalidToken("Invalid game token.")
+        version, seed, num_players, num_flops, difficulty, board_state = _PAYLOAD.unpack(payload)
+        if version != TOKEN_VERSION:
+            raise InvalidToken("Invalid game token.")
+
+        hands, boards = self._deal_from_seed(seed, num_players, num_flops)
+        revealed = []
+        for board_index, board in enumerate(boards):
+            bits = board_state >> (3 * board_index) & 7
+            if bits & 4:
+                # The 5th card was turned over before the 4th
+                board[3], board[4] = board[4], board[3]
+            revealed.append(3 + (bits & 3))
+        return seed, GameState(hands, boards, revealed, DIFFICULTIES[difficulty])
+
+    def dump(self, seed, state):
+        # The token for a game after its state has changed (cards revealed)
+        num_flops = len(state.boards)
+        hands, boards = self._deal_from_seed(seed, len(state.hands), num_flops)
+        board_state = 0
+        for board_index, dealt in enumerate(boards):
+            # GameState.reveal() swaps the face-down card it turns over into place
+            swapped = state.boards[board_index][3] != dealt[3]
+            bits = (state.revealed[board_index] - 3) | (4 if swapped else 0)
+            board_state |= bits << (3 * board_index)
+        payload = _PAYLOAD.pack(
+            TOKEN_VERSION, seed, len(state.hands), num_flops, DIFFICULTIES.index(state.difficulty), board_state
+        )
+        return _b64encode(payload + self._sign(payload))
+
+
+def create_game_tokens(deal):
+    secret = os.environ.get('GAME_TOKEN_SECRET')
+    return GameTokens(secret.encode('utf-8') if secret else secrets.token_bytes(32), deal)
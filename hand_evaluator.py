@@ -0,0 +1,454 @@
+# Lookup-table five card evaluator.
+#
+# Every five card hand maps to one of the 7,462 poker equivalence classes and
+# evaluate5() returns that class as a single int strength: 1 is the worst
+# high card (7-5-4-3-2), 7462 is a royal flush, and two hands tie exactly when
+# their strengths are equal. Three tables cover all 2,598,960 hands:
+#   FLUSH[rank_bits]      five cards of one suit (flushes and straight flushes)
+#   UNIQUE5[rank_bits]    five distinct ranks, not suited (straights and high cards)
+#   PAIRED[prime_product] everything with a repeated rank, keyed on the product
+#                         of one prime per rank so the key ignores card order
+# The class names/descriptions are only built when a response needs them.
+
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import combinations
+
+from cards import RANKS, NUM_CARDS
+from metrics import metrics
+
+PRIMES = [2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41]
+
+# Legacy category scores (the first element of the old evaluate_hand tuple)
+HIGH_CARD = 0
+ONE_PAIR = 1
+TWO_PAIR = 2
+THREE_OF_A_KIND = 3
+STRAIGHT = 4
+FLUSH = 5
+FULL_HOUSE = 6
+FOUR_OF_A_KIND = 7
+STRAIGHT_FLUSH = 8
+ROYAL_FLUSH = 9
+
+CATEGORY_NAMES = [
+    "High Card", "One Pair", "Two Pair", "Three of a Kind", "Straight",
+    "Flush", "Full House", "Four of a Kind", "Straight Flush", "Royal Flush",
+]
+
+NUM_CLASSES = 7462
+
+# Per-card lookups so the hot path never has to shift or index RANKS
+_BIT = [1 << (card >> 2) for card in range(NUM_CARDS)]
+_PRIME = [PRIMES[card >> 2] for card in range(NUM_CARDS)]
+
+FLUSH_TABLE = [0] * 8192
+UNIQUE5_TABLE = [0] * 8192
+PAIRED_TABLE = {}
+
+# _CLASSES[strength] = (category, ranks) where ranks are the rank indices that
+# describe the class (straight high card, quad/kicker ranks, ...)
+_CLASSES = [None] * (NUM_CLASSES + 1)
+# Lowest strength of each category, used by hand_category()
+_CATEGORY_FLOORS = []
+
+
+def _bits(ranks):
+    value = 0
+    for rank in ranks:
+        value |= 1 << rank
+    return value
+
+
+def _product(ranks):
+    value = 1
+    for rank in ranks:
+        value *= PRIMES[rank]
+    return value
+
+
+def _build_tables():
+    # Straights from A-high down to the wheel, as (high rank, rank bits)
+    straights = [(high, 0b11111 << (high - 4)) for high in range(12, 3, -1)]
+    straights.append((3, (1 << 12) | 0b1111))
+    straight_bits = {bits for _, bits in straights}
+
+    # Five distinct ranks that don't make a straight, best first
+    no_straight = [
+        ranks for ranks in combinations(range(12, -1, -1), 5)
+        if _bits(ranks) not in straight_bits
+    ]
+
+    # (category, table, key, ranks) from the best class down to the worst
+    classes = []
+    for high, bits in straights:
+        category = ROYAL_FLUSH if high == 12 else STRAIGHT_FLUSH
+        classes.append((category, FLUSH_TABLE, bits, (high,)))
+    for quad in range(12, -1, -1):
+        for kicker in range(12, -1, -1):
+            if kicker != quad:
+                classes.append((FOUR_OF_A_KIND, PAIRED_TABLE, _product((quad,) * 4 + (kicker,)), (quad, kicker)))
+    for trips in range(12, -1, -1):
+        for pair in range(12, -1, -1):
+            if pair != trips:
+                classes.append((FULL_HOUSE, PAIRED_TABLE, _product((trips,) * 3 + (pair,) * 2), (trips, pair)))
+    for ranks in no_straight:
+        classes.append((FLUSH, FLUSH_TABLE, _bits(ranks), ranks))
+    for high, bits in straights:
+        classes.append((STRAIGHT, UNIQUE5_TABLE, bits, (high,)))
+    for trips in range(12, -1, -1):
+        kickers = [rank for rank in range(12, -1, -1) if rank != trips]
+        for pair in combinations(kickers, 2):
+            classes.append((THREE_OF_A_KIND, PAIRED_TABLE, _product((trips,) * 3 + pair), (trips,) + pair))
+    for high, low in combinations(range(12, -1, -1), 2):
+        for kicker in range(12, -1, -1):
+            if kicker != high and kicker != low:
+                classes.append((TWO_PAIR, PAIRED_TABLE, _product((high, high, low, low, kicker)), (high, low, kicker)))
+    for pair in range(12, -1, -1):
+        kickers = [rank for rank in range(12, -1, -1) if rank != pair]
+        for three in combinations(kickers, 3):
+            classes.append((ONE_PAIR, PAIRED_TABLE, _product((pair, pair) + three), (pair,) + three))
+    for ranks in no_straight:
+        classes.append((HIGH_CARD, UNIQUE5_TABLE, _bits(ranks), ranks))
+
+    assert len(classes) == NUM_CLASSES
+    floors = {}
+    for position, (category, table, key, ranks) in enumerate(classes):
+        strength = NUM_CLASSES - position
+        table[key] = strength
+        _CLASSES[strength] = (category, ranks)
+        floors[category] = strength
+    _CATEGORY_FLOORS.extend(floors[category] for category in range(len(CATEGORY_NAMES)))
+
+
+_build_tables()
+
+
+def evaluate5(c1, c2, c3, c4, c5):
+    # Strength of five int cards, higher is better
+    bits = _BIT[c1] | _BIT[c2] | _BIT[c3] | _BIT[c4] | _BIT[c5]
+    if (c1 & 3) == (c2 & 3) == (c3 & 3) == (c4 & 3) == (c5 & 3):
+        return FLUSH_TABLE[bits]
+    return UNIQUE5_TABLE[bits] or PAIRED_TABLE[_PRIME[c1] * _PRIME[c2] * _PRIME[c3] * _PRIME[c4] * _PRIME[c5]]
+
+
+def evaluate_cards(cards):
+    return evaluate5(*cards)
+
+
+def hand_category(strength):
+    # Legacy 0-9 category score (0 = High Card ... 9 = Royal Flush)
+    if not 1 <= strength <= NUM_CLASSES:
+        raise ValueError(f"Invalid hand strength: {strength!r}")
+    category = ROYAL_FLUSH
+    while strength < _CATEGORY_FLOORS[category]:
+        category -= 1
+    return category
+
+
+def hand_name(strength):
+    return CATEGORY_NAMES[_CLASSES[strength][0]]
+
+
+@lru_cache(maxsize=None)
+def _description(strength):
+    category, ranks = _CLASSES[strength]
+    names = [RANKS[rank] for rank in ranks]
+    if category == STRAIGHT_FLUSH:
+        return f"Straight Flush, {names[0]} high"
+    if category == FLUSH:
+        readable = {'A': 'Ace', 'K': 'King', 'Q': 'Queen', 'J': 'Jack'}.get(names[0], names[0])
+        return f"{readable}-high Flush"
+    if category == STRAIGHT:
+        return f"Straight, {names[0]}"
+    if category in (TWO_PAIR, ONE_PAIR):
+        # Pairs are described by their ranks (pair(s) first, then kickers)
+        return tuple(names)
+    return CATEGORY_NAMES[category]
+
+
+def hand_description(strength):
+    # The hand_type value the API has always returned: a string for most
+    # categories, a list of rank names for one and two pair
+    description = _description(strength)
+    return list(description) if isinstance(description, tuple) else description
+
+
+def sort_hand(cards):
+    # Order cards for display: grouped ranks first (quads, trips, pairs), then by rank
+    counts = {}
+    for card in cards:
+        counts[card >> 2] = counts.get(card >> 2, 0) + 1
+    return sorted(cards, key=lambda card: (counts[card >> 2], card), reverse=True)
+
+
+# --- Best hand from exactly 2 hole cards + 3 board cards (bombpot / Omaha rules) ---
+#
+# The board is prepared once and shared by every player at the table: its
+# 3-card subsets are precomputed as rank bits and prime products, deduplicated
+# by rank (the non-flush strength only depends on ranks), and the suited
+# subsets are kept separately for the flush pass.
+
+def card_mask(cards):
+    mask = 0
+    for card in cards:
+        mask |= 1 << card
+    return mask
+
+
+class PreparedBoard:
+    __slots__ = ('cards', 'mask', 'new_card', 'rank_bits', 'paired', 'triples', 'flush_triples', '_streets')
+
+    def __init__(self, board, new_card=None):
+        self.cards = list(board)
+        # One bit per card: an order-independent key for the board
+        self.mask = card_mask(self.cards)
+        # With new_card set, only the triples that use that card are built: the
+        # rest were already evaluated on the previous street
+        self.new_card = new_card
+        # The triples are built on first use, a fully cached table never needs them
+        self.triples = None
+        self._streets = None
+
+    def new_street(self, card):
+        # The triples that the given card (already on this board) added, shared
+        # by every player whose previous street result is known
+        if self._streets is None:
+            self._streets = {}
+        if card not in self._streets:
+            self._streets[card] = PreparedBoard(self.cards, new_card=card)
+        return self._streets[card]
+
+    def prepare(self):
+        self.rank_bits = 0
+        for card in self.cards:
+            self.rank_bits |= _BIT[card]
+        self.paired = bin(self.rank_bits).count('1') < len(self.cards)
+
+        # (rank_bits, prime_product, cards) for each distinct rank triple
+        triples = {}
+        # suit -> [(rank_bits, cards)] for triples that are all one suit
+        flush_triples = {}
+        if self.new_card is None:
+            subsets = combinations(self.cards, 3)
+        else:
+            others = [card for card in self.cards if card != self.new_card]
+            subsets = ((a, b, self.new_card) for a, b in combinations(others, 2))
+        for triple in subsets:
+            c, d, e = triple
+            key = _PRIME[c] * _PRIME[d] * _PRIME[e]
+            if key not in triples:
+                triples[key] = (_BIT[c] | _BIT[d] | _BIT[e], key, triple)
+            if (c & 3) == (d & 3) == (e & 3):
+                flush_triples.setdefault(c & 3, []).append((_BIT[c] | _BIT[d] | _BIT[e], triple))
+        # Empty unless the board has three cards of one suit: no flush checks at all
+        self.flush_triples = flush_triples
+        self.triples = list(triples.values())
+
+
+def prepare_board(board):
+    return board if isinstance(board, PreparedBoard) else PreparedBoard(board)
+
+
+# [best_hand calls, 2+3 combinations looked up], read by the metrics registry.
+# Combinations are the table lookups best_hand actually does: a hole pair
+# repeating the ranks of an earlier one is skipped, and a suited one also
+# looks up its flushes.
+# Plain ints without a lock: cheap enough for the hot path, and an update lost
+# to a thread switch only makes the counts slightly low.
+_eval_counts = [0, 0]
+
+
+def _evaluator_counters():
+    return {
+        'evaluator_calls_total': _eval_counts[0],
+        'evaluator_combinations_total': _eval_counts[1],
+    }
+
+
+metrics.register_collector(_evaluator_counters)
+
+
+def best_hand(hole, board):
+    # Best (strength, five_cards) using exactly 2 of the hole cards and 3 of the board.
+    # board may be a card list or a PreparedBoard shared across players.
+    board = prepare_board(board)
+    if board.triples is None:
+        board.prepare()
+    triples = board.triples
+    board_bits = board.rank_bits
+    board_paired = board.paired
+    flush_triples = board.flush_triples
+    unique5 = UNIQUE5_TABLE
+    paired = PAIRED_TABLE
+
+    best = 0
+    best_pair = best_triple = None
+    seen_pairs = set()
+    flush_lookups = 0
+    for i in range(len(hole) - 1):
+        a = hole[i]
+        for b in hole[i + 1:]:
+            pair_bits = _BIT[a] | _BIT[b]
+            pair_product = _PRIME[a] * _PRIME[b]
+
+            # Flushes need a suited hole pair matching a suited board triple
+            if flush_triples and (a & 3) == (b & 3) and (a & 3) in flush_triples:
+                flush_lookups += len(flush_triples[a & 3])
+                for triple_bits, triple in flush_triples[a & 3]:
+                    strength = FLUSH_TABLE[triple_bits | pair_bits]
+                    if strength > best:
+                        best, best_pair, best_triple = strength, (a, b), triple
+
+            # Off-suit strength only depends on the ranks, skip repeated rank pairs
+            if pair_product in seen_pairs:
+                continue
+            seen_pairs.add(pair_product)
+
+            if board_paired or pair_bits & board_bits or not pair_bits & (pair_bits - 1):
+                # A paired board, a pocket pair or a rank shared with the board can
+                # make pairs and better: fall back to the prime product table
+                for triple_bits, triple_product, triple in triples:
+                    strength = unique5[triple_bits | pair_bits] or paired[triple_product * pair_product]
+                    if strength > best:
+                        best, best_pair, best_triple = strength, (a, b), triple
+            else:
+                # Five distinct ranks in every combination: only straights and high
+                # cards are possible, no trips, boats or quads to look up
+                for triple_bits, triple_product, triple in triples:
+                    strength = unique5[triple_bits | pair_bits]
+                    if strength > best:
+                        best, best_pair, best_triple = strength, (a, b), triple
+
+    # Counted once per call, the loops above stay untouched
+    _eval_counts[0] += 1
+    _eval_counts[1] += len(seen_pairs) * len(triples) + flush_lookups
+    if not best:
+        return 0, None
+    return best, list(best_pair) + list(best_triple)
+
+
+def extend_best_hand(hole, board, new_card, previous):
+    # Best hand on board (which ends with / contains new_card) given the
+    # (strength, five) result for the same hole cards on the board without it
+    board = prepare_board(board)
+    strength, five = best_hand(hole, board.new_street(new_card))
+    if strength > previous[0]:
+        return strength, five
+    return previous[0], list(previous[1])
+
+
+class HandProgress:
+    # Best hand for one player on one board, kept up to date street by street.
+    # The flop is evaluated natively (no padding); each turn/river card only
+    # adds the combinations that use it.
+    __slots__ = ('hole', 'board', 'strength', 'five')
+
+    def __init__(self, hole, board):
+        self.hole = list(hole)
+        self.board = list(board)
+        self.strength, self.five = best_hand(self.hole, self.board)
+
+    def add_card(self, card, board=None):
+        # board: the new board as a PreparedBoard to share its new triples across players
+        self.board.append(card)
+        board = board or PreparedBoard(self.board)
+        self.strength, self.five = extend_best_hand(self.hole, board, card, (self.strength, self.five))
+        return self.strength, self.five
+
+
+# --- Memoized best hands ---
+#
+# The front end asks for the winner of the same table again and again as cards
+# are revealed, and drills repeat identical deals. Best hands are cached in a
+# bounded LRU keyed on (hole card mask, board mask), which ignores card order.
+
+class BestHandCache:
+    def __init__(self, max_size=50000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.extended = 0
+
+    def best_hand(self, hole, board):
+        # Same result as best_hand(hole, board), served from the cache when possible
+        board = prepare_board(board)
+        if self.max_size <= 0:
+            return best_hand(hole, board)
+        key = (card_mask(hole), board.mask)
+        with self._lock:
+            found = self._entries.get(key)
+            if found is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return found[0], list(found[1])
+            self.misses += 1
+            # Known result for the previous street? Then only the new card's triples are needed
+            previous = None
+            if len(board.cards) > 3:
+                for card in board.cards:
+                    previous = self._entries.get((key[0], board.mask & ~(1 << card)))
+                    if previous is not None:
+                        self.extended += 1
+                        break
+
+        if previous is not None:
+            strength, five = extend_best_hand(hole, board, card, previous)
+        else:
+            strength, five = best_hand(hole, board)
+        with self._lock:
+            self._entries[key] = (strength, tuple(five) if five else ())
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return strength, five
+
+    def lookup(self, hole, board):
+        # The cached (strength, five) or None. For callers that compute misses
+        # elsewhere (the process pool) and hand the results to store()
+        if self.max_size <= 0:
+            return None
+        key = (card_mask(hole), prepare_board(board).mask)
+        with self._lock:
+            found = self._entries.get(key)
+            if found is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return found[0], list(found[1])
+
+    def store(self, hole, board, result):
+        if self.max_size <= 0:
+            return
+        key = (card_mask(hole), prepare_board(board).mask)
+        strength, five = result
+        with self._lock:
+            self._entries[key] = (strength, tuple(five) if five else ())
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'extended': self.extended,
+            }
+
+
+# Shared by the winner routes; BEST_HAND_CACHE_SIZE=0 turns caching off
+best_hand_cache = BestHandCache(int(os.environ.get('BEST_HAND_CACHE_SIZE', 50000)))
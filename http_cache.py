@@ -0,0 +1,139 @@
+# Conditional GETs and response compression.
+#
+# JSON bodies of at least COMPRESS_MIN_SIZE bytes are compressed for clients
+# that accept it: brotli when the brotli package is installed and asked for,
+# else gzip. Responses that are polled and rarely change (the leaderboard)
+# are rendered once per version of their data and kept in a VersionedCache
+# together with their compressed forms, so a poll costs neither a storage
+# read nor a compression; the version also makes the ETag, and a poll
+# carrying the current one gets an empty 304. The ETag is the version alone,
+# so a version shared by every worker (the SQLite store's) gives the same
+# ETag whichever worker answers.
+#
+#   COMPRESS_MIN_SIZE  smallest body compressed, in bytes (default 1024, 0 turns compression off)
+
+import gzip
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def accepted_encoding(accept_encoding):
+    # 'br', 'gzip' or None for an Accept-Encoding header value
+    accepted = {}
+    for item in (accept_encoding or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = quality
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', accepted.get('*', 0)) > 0:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def encode_body(body, accept_encoding, min_size=None):
+    # (body, content encoding or None): compressed when it is big enough and
+    # the client takes it
+    min_size = COMPRESS_MIN_SIZE if min_size is None else min_size
+    if not min_size or len(body) < min_size:
+        return body, None
+    encoding = accepted_encoding(accept_encoding)
+    if encoding is None:
+        return body, None
+    return compress(body, encoding), encoding
+
+
+def etag_matches(if_none_match, etag):
+    # If-None-Match uses the weak comparison: W/ prefixes don't matter
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    etag = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class CachedBody:
+    # One rendered body and its compressed forms, made on first use
+    __slots__ = ('body', 'etag', '_encoded', '_lock')
+
+    def __init__(self, body, etag):
+        self.body = body
+        self.etag = etag
+        self._encoded = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, accept_encoding, min_size=None):
+        # (body, content encoding or None, ETag of that representation)
+        min_size = COMPRESS_MIN_SIZE if min_size is None else min_size
+        encoding = accepted_encoding(accept_encoding) if min_size and len(self.body) >= min_size else None
+        if encoding is None:
+            return self.body, None, self.etag
+        with self._lock:
+            body = self._encoded.get(encoding)
+            if body is None:
+                body = self._encoded[encoding] = compress(self.body, encoding)
+        # A strong ETag differs per content coding
+        return body, encoding, self.etag[:-1] + '-' + encoding + '"'
+
+
+class VersionedCache:
+    # key -> (version, CachedBody), the least recently used dropped past max_entries
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, version, body):
+        cached = CachedBody(body, f'"{version}"')
+        with self._lock:
+            self._entries[key] = (version, cached)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return cached
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,446 @@
+# Leaderboard storage backends.
+#
+# SqliteLeaderboardStore keeps one row per submitted run in a WAL-mode SQLite
+# database with indexes for the top-N and stats queries, so neither has to
+# read every entry. JsonLeaderboardStore keeps the original leaderboard.json
+# file (rewritten on every write, read through an mtime-keyed cache) and can
+# still be selected with LEADERBOARD_BACKEND=json.
+#
+# Both stores hand out entries as the same dicts the routes have always used:
+# {"name": ..., "correct": ..., "total": ..., "difficulty": ...}
+#
+# changes(cursor) lets an in-memory index (player_index.py) follow the store:
+# it returns only the entries added since the cursor, or everything when the
+# store was cleared or replaced in the meantime, also by another process.
+# version() is a string that changes whenever the entries may have, cheap
+# enough to check on every poll. It is the /leaderboard ETag as is, so it
+# must also differ between any two states that workers could be serving:
+# SQLite's is read from the database and the same in every process, the JSON
+# store's counts per process and carries a token of the process that made it.
+
+import json
+import os
+import secrets
+import sqlite3
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_JSON_PATH = os.path.join(BASE_DIR, "leaderboard.json")
+DEFAULT_DB_PATH = os.path.join(BASE_DIR, "leaderboard.db")
+
+# Runs need at least this many flops to show up on the leaderboard
+MIN_TOTAL = 20
+
+
+def accuracy(entry):
+    total = entry.get("total", 0)
+    return entry.get("correct", 0) / total if total > 0 else 0
+
+
+def _normalize(entry):
+    return {
+        "name": entry.get("name", ""),
+        "correct": int(entry.get("correct", 0)),
+        "total": int(entry.get("total", 0)),
+        "difficulty": entry.get("difficulty", "easy"),
+    }
+
+
+def _tally(counts, entry):
+    # Count one entry into {difficulty: {"entries": n, "qualified": n}}
+    difficulty_counts = counts.setdefault(entry.get("difficulty", "easy"), {"entries": 0, "qualified": 0})
+    difficulty_counts["entries"] += 1
+    if entry.get("total", 0) >= MIN_TOTAL:
+        difficulty_counts["qualified"] += 1
+
+
+def _count(entries):
+    counts = {}
+    for entry in entries:
+        _tally(counts, entry)
+    return counts
+
+
+def _rank_key(entry):
+    # Sort by accuracy (correct/total), then by total (descending)
+    return (accuracy(entry), entry.get("total", 0))
+
+
+class JsonLeaderboardStore:
+    # The parsed file is cached in memory together with a precomputed top 10
+    # per difficulty. The cache is keyed on the file's mtime and size, so a
+    # write from another worker is picked up on the next read, and our own
+    # writes update it in place. Most reads only cost an os.stat(). The stats
+    # counts are kept the same way, recounted only when the file is reloaded.
+    TOP_SIZE = 10
+
+    def __init__(self, path=DEFAULT_JSON_PATH):
+        self.path = path
+        self._lock = threading.RLock()
+        self._stamp = None
+        self._cache = None
+        self._top = {}
+        self._counts = {}
+        self._version = 0
+        self._version_stamp = None
+        # Moves on whenever the entries are replaced rather than appended to,
+        # so a changes() cursor from before knows to start over
+        self._generation = 0
+        # Counts restart with the process and every worker keeps its own
+        self._instance = secrets.token_hex(4)
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            # If file does not exist, create an empty file
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump([], f)
+            return []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            # If file is corrupted, reset to empty list
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump([], f)
+            return []
+
+    def _entries(self):
+        # The cached entry list (don't mutate it), reloaded if the file changed
+        with self._lock:
+            stamp = self._file_stamp()
+            if self._cache is None or stamp is None or stamp != self._stamp:
+                previous = self._cache
+                self._cache = self._read()
+                # Another worker's add_entry only appends; anything else (a
+                # clear, a hand edit) replaced the list
+                if previous is None or self._cache[:len(previous)] != previous:
+                    self._generation += 1
+                self._stamp = self._file_stamp()
+                self._top = {}
+                self._counts = _count(self._cache)
+            return self._cache
+
+    def _write(self, leaderboard):
+        try:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(leaderboard, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            print("Error saving leaderboard:", e)
+            self._cache = None
+            return False
+        self._stamp = self._file_stamp()
+        return True
+
+    def load(self):
+        return list(self._entries())
+
+    def save(self, leaderboard):
+        with self._lock:
+            if self._write(leaderboard):
+                self._generation += 1
+                self._cache = list(leaderboard)
+                self._top = {}
+                self._counts = _count(leaderboard)
+
+    def add_entry(self, entry):
+        entry = _normalize(entry)
+        with self._lock:
+            leaderboard = self._entries()
+            # Always allow multiple entries for the same name (append new entry)
+            leaderboard.append(entry)
+            if not self._write(leaderboard):
+                return
+            _tally(self._counts, entry)
+            # Keep the precomputed top 10 current instead of re-sorting everything
+            top = self._top.get(entry["difficulty"])
+            if top is not None and entry["total"] >= MIN_TOTAL:
+                key = _rank_key(entry)
+                position = len(top)
+                while position > 0 and _rank_key(top[position - 1]) < key:
+                    position -= 1
+                top.insert(position, entry)
+                del top[self.TOP_SIZE:]
+
+    def top(self, difficulty, limit=10):
+        with self._lock:
+            entries = self._entries()
+            if limit > self.TOP_SIZE:
+                return self._sorted(entries, difficulty)[:limit]
+            top = self._top.get(difficulty)
+            if top is None:
+                top = self._top[difficulty] = self._sorted(entries, difficulty)[:self.TOP_SIZE]
+            return list(top[:limit])
+
+    def _sorted(self, entries, difficulty):
+        # Filter by difficulty and minimum 20 flops
+        leaderboard = [
+            entry for entry in entries
+            if entry.get("total", 0) >= MIN_TOTAL and entry.get("difficulty", "easy") == difficulty
+        ]
+        leaderboard.sort(key=_rank_key, reverse=True)
+        return leaderboard
+
+    def clear(self, difficulty=None):
+        with self._lock:
+            if difficulty:
+                # Clear only specific difficulty
+                leaderboard = [
+                    entry for entry in self._entries()
+                    if entry.get("difficulty", "easy") != difficulty
+                ]
+            else:
+                # Clear all
+                leaderboard = []
+            self.save(leaderboard)
+
+    def changes(self, cursor=None):
+        # (cursor, entries, reset). The cursor is (generation, entry count):
+        # while the list has only been appended to, just the entries past it
+        # come back; after a clear or save, everything (reset is True)
+        with self._lock:
+            entries = self._entries()
+            new_cursor = (self._generation, len(entries))
+            if cursor is not None and cursor[0] == self._generation and cursor[1] <= len(entries):
+                return new_cursor, entries[cursor[1]:], False
+            return new_cursor, list(entries), True
+
+    def version(self):
+        # Moves on whenever the file changes, written here or by another
+        # worker: an os.stat(), the file isn't read
+        with self._lock:
+            stamp = self._file_stamp()
+            if stamp != self._version_stamp:
+                self._version_stamp = stamp
+                self._version += 1
+            return f"{self._instance}-{self._version}"
+
+    def stats(self):
+        # {difficulty: {"entries": n, "qualified": n}}
+        with self._lock:
+            self._entries()
+            return {difficulty: dict(counts) for difficulty, counts in self._counts.items()}
+
+
+class SqliteLeaderboardStore:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS leaderboard (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            correct INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            difficulty TEXT NOT NULL,
+            accuracy REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_leaderboard_rank
+            ON leaderboard (difficulty, accuracy DESC, total DESC);
+        CREATE INDEX IF NOT EXISTS idx_leaderboard_total
+            ON leaderboard (difficulty, total);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS leaderboard_counts (
+            difficulty TEXT PRIMARY KEY,
+            entries INTEGER NOT NULL,
+            qualified INTEGER NOT NULL
+        );
+    """
+    # Triggers keep leaderboard_counts in step with every insert and delete,
+    # from any process, so stats() reads a row per difficulty instead of the
+    # table. Run on startup: the triggers are recreated (in case MIN_TOTAL
+    # changed) and the counts rebuilt, the only time they are counted in full.
+    REBUILD_COUNTS = """
+        BEGIN IMMEDIATE;
+        DROP TRIGGER IF EXISTS leaderboard_count_insert;
+        DROP TRIGGER IF EXISTS leaderboard_count_delete;
+        CREATE TRIGGER leaderboard_count_insert AFTER INSERT ON leaderboard BEGIN
+            INSERT INTO leaderboard_counts (difficulty, entries, qualified)
+                VALUES (NEW.difficulty, 1, NEW.total >= {min_total})
+                ON CONFLICT (difficulty) DO UPDATE SET
+                    entries = entries + 1, qualified = qualified + excluded.qualified;
+        END;
+        CREATE TRIGGER leaderboard_count_delete AFTER DELETE ON leaderboard BEGIN
+            UPDATE leaderboard_counts
+                SET entries = entries - 1, qualified = qualified - (OLD.total >= {min_total})
+                WHERE difficulty = OLD.difficulty;
+            DELETE FROM leaderboard_counts WHERE difficulty = OLD.difficulty AND entries <= 0;
+        END;
+        DELETE FROM leaderboard_counts;
+        INSERT INTO leaderboard_counts (difficulty, entries, qualified)
+            SELECT difficulty, COUNT(*), SUM(total >= {min_total}) FROM leaderboard GROUP BY difficulty;
+        COMMIT;
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH, json_path=DEFAULT_JSON_PATH):
+        self.path = path
+        # One connection per thread (Flask serves requests on several threads)
+        self._local = threading.local()
+        conn = self._connect()
+        conn.executescript(self.SCHEMA)
+        try:
+            conn.executescript(self.REBUILD_COUNTS.format(min_total=int(MIN_TOTAL)))
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        self._migrate_json(json_path)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _migrate_json(self, json_path):
+        # One-time import of the old leaderboard.json, recorded in the meta table
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            done = conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+            if not done:
+                entries = []
+                if json_path and os.path.exists(json_path):
+                    entries = JsonLeaderboardStore(json_path).load()
+                self._insert(conn, entries)
+                conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (str(len(entries)),))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _insert(self, conn, entries):
+        rows = []
+        for entry in entries:
+            entry = _normalize(entry)
+            rows.append((entry["name"], entry["correct"], entry["total"], entry["difficulty"], accuracy(entry)))
+        conn.executemany(
+            "INSERT INTO leaderboard (name, correct, total, difficulty, accuracy) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+
+    def _bump_generation(self, conn):
+        # Entries were deleted or replaced: followers of changes() start over
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('generation', '1')"
+            " ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+
+    def _entries(self, rows):
+        return [
+            {"name": name, "correct": correct, "total": total, "difficulty": difficulty}
+            for name, correct, total, difficulty in rows
+        ]
+
+    def load(self):
+        rows = self._connect().execute(
+            "SELECT name, correct, total, difficulty FROM leaderboard ORDER BY id"
+        ).fetchall()
+        return self._entries(rows)
+
+    def save(self, leaderboard):
+        # Replace everything (kept for callers that still work on the whole list)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM leaderboard")
+            self._insert(conn, leaderboard)
+            self._bump_generation(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._local.data_version = None
+
+    def add_entry(self, entry):
+        self._insert(self._connect(), [entry])
+        # This connection's own commits don't move its data_version
+        self._local.data_version = None
+
+    def top(self, difficulty, limit=10):
+        rows = self._connect().execute(
+            "SELECT name, correct, total, difficulty FROM leaderboard"
+            " WHERE difficulty = ? AND total >= ?"
+            " ORDER BY accuracy DESC, total DESC, id LIMIT ?",
+            (difficulty, MIN_TOTAL, limit),
+        ).fetchall()
+        return self._entries(rows)
+
+    def clear(self, difficulty=None):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if difficulty:
+                conn.execute("DELETE FROM leaderboard WHERE difficulty = ?", (difficulty,))
+            else:
+                conn.execute("DELETE FROM leaderboard")
+            self._bump_generation(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._local.data_version = None
+
+    def changes(self, cursor=None):
+        # (cursor, entries, reset): the rows added since cursor, found through
+        # the id primary key, or all of them (reset is True) on the first call
+        # and after a clear/save. One read transaction, so both are consistent
+        conn = self._connect()
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+            generation = int(row[0]) if row else 0
+            reset = cursor is None or cursor[0] != generation
+            last_id = 0 if reset else cursor[1]
+            rows = conn.execute(
+                "SELECT id, name, correct, total, difficulty FROM leaderboard WHERE id > ? ORDER BY id",
+                (last_id,),
+            ).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        if rows:
+            last_id = rows[-1][0]
+        return (generation, last_id), self._entries([row[1:] for row in rows]), reset
+
+    def version(self):
+        # "generation.last id", which every write changes whatever process
+        # made it. Only looked up again when PRAGMA data_version (which reads
+        # no table) shows another connection committed, or after a write on
+        # this thread's own connection
+        local = self._local
+        conn = self._connect()
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != getattr(local, "data_version", None):
+            generation, last_id = conn.execute(
+                "SELECT (SELECT value FROM meta WHERE key = 'generation'), (SELECT MAX(id) FROM leaderboard)"
+            ).fetchone()
+            local.version = f"{generation or 0}.{last_id or 0}"
+            local.data_version = data_version
+        return local.version
+
+    def stats(self):
+        # {difficulty: {"entries": n, "qualified": n}} from the trigger-maintained counts
+        rows = self._connect().execute("SELECT difficulty, entries, qualified FROM leaderboard_counts").fetchall()
+        return {difficulty: {"entries": entries, "qualified": qualified} for difficulty, entries, qualified in rows}
+
+
+def create_store(backend=None):
+    # LEADERBOARD_BACKEND=sqlite (default) or json; LEADERBOARD_DB overrides the database path
+    backend = (backend or os.environ.get("LEADERBOARD_BACKEND", "sqlite")).lower()
+    if backend == "json":
+        return JsonLeaderboardStore(os.environ.get("LEADERBOARD_FILE", DEFAULT_JSON_PATH))
+    if backend == "sqlite":
+        return SqliteLeaderboardStore(
+            os.environ.get("LEADERBOARD_DB", DEFAULT_DB_PATH),
+            os.environ.get("LEADERBOARD_FILE", DEFAULT_JSON_PATH),
+        )
+    raise ValueError(f"Unknown leaderboard backend: {backend}")
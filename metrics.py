@@ -0,0 +1,198 @@
+# Lightweight in-process metrics: counters and latency histograms.
+#
+# Everything lives in two dicts behind one lock, so recording a value is a
+# dict lookup and a few additions: cheap enough to leave on in production.
+# install(app) times every Flask request per route; snapshot() and
+# prometheus_text() render what has been collected for /admin/metrics.
+#
+# Metric names follow the Prometheus conventions, labels are keyword
+# arguments: metrics.inc('http_requests_total', route='/equity', status='200')
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds, in milliseconds
+LATENCY_BUCKETS_MS = (0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'count', 'total', 'max')
+
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        # One count per bucket plus a final +Inf bucket
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation (the max for +Inf)
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def cumulative(self):
+        # [(bound, observations <= bound)], ending with ('+Inf', count)
+        buckets = []
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            buckets.append((bound, seen))
+        buckets.append(('+Inf', self.count))
+        return buckets
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': round(self.total, 3),
+            'mean': round(self.total / self.count, 3) if self.count else 0.0,
+            'max': round(self.max, 3),
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': {str(bound): seen for bound, seen in self.cumulative()},
+        }
+
+
+def _series(name, labels):
+    # 'name{a="1",b="2"}', the Prometheus form, also used as the JSON key
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (name, ((label, value), ...)) -> int / Histogram
+        self._counters = {}
+        self._histograms = {}
+        # Callables returning {name: value} for counters kept elsewhere
+        self._collectors = []
+        self.started = time.time()
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        # Records the block's wall time in milliseconds into a histogram
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - start) * 1000, **labels)
+
+    def register_collector(self, collector):
+        # For hot paths that can't afford even the lock: they keep plain
+        # counters and the collector reads them when metrics are rendered
+        self._collectors.append(collector)
+
+    def _collected(self):
+        counters = dict(self._counters)
+        for collector in self._collectors:
+            for name, value in collector().items():
+                counters[(name, ())] = value
+        return counters
+
+    def counter(self, name, **labels):
+        with self._lock:
+            return self._collected().get((name, tuple(sorted(labels.items()))), 0)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.started = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'uptime_seconds': round(time.time() - self.started, 1),
+                'counters': {
+                    _series(name, labels): value
+                    for (name, labels), value in sorted(self._collected().items())
+                },
+                'histograms': {
+                    _series(name, labels): histogram.to_dict()
+                    for (name, labels), histogram in sorted(self._histograms.items())
+                },
+            }
+
+    def prometheus_text(self, gauges=None):
+        # Text exposition format; gauges is {name: number} for extra point-in-time values
+        lines = []
+        with self._lock:
+            counters = sorted(self._collected().items())
+            histograms = sorted(
+                (key, histogram.cumulative(), histogram.total, histogram.count)
+                for key, histogram in self._histograms.items()
+            )
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} counter')
+            lines.append(f'{_series(name, labels)} {value}')
+        for (name, labels), buckets, total, count in histograms:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} histogram')
+            for bound, seen in buckets:
+                lines.append(f'{_series(name + "_bucket", labels + (("le", bound),))} {seen}')
+            lines.append(f'{_series(name + "_sum", labels)} {round(total, 3)}')
+            lines.append(f'{_series(name + "_count", labels)} {count}')
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+# The process-wide registry
+metrics = Metrics()
+
+
+def install(app, registry=metrics):
+    # Time every request and count responses per route (the URL rule, so
+    # /static/<path:filename> is one series however many files are served)
+    from flask import g, request
+
+    @app.before_request
+    def _start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            elapsed = (time.perf_counter() - start) * 1000
+            registry.observe('http_request_duration_ms', elapsed, route=route, method=request.method)
+            registry.inc('http_requests_total', route=route, method=request.method, status=str(response.status_code))
+        return response
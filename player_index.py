@@ -0,0 +1,145 @@
+# Per-player leaderboard index.
+#
+# The leaderboard store keeps one entry per submitted run, so the same name
+# shows up once for every run and nobody can tell where they stand. This
+# index rolls the runs up per player and difficulty: the best run, lifetime
+# correct/total and the number of runs. Players with a qualifying run (at
+# least MIN_TOTAL flops) are kept in a sorted list, ordered like /leaderboard
+# orders runs (best accuracy, then most flops, then the earliest run), so a
+# player's rank is a bisect and a page or the players around someone is a
+# bisect plus a slice.
+#
+# The index follows the store through store.changes(): after a sync only the
+# entries added since the last one are folded in, and the whole index is
+# rebuilt when the store was cleared or replaced.
+
+import threading
+from bisect import bisect_left, insort
+
+from leaderboard_store import MIN_TOTAL
+
+MAX_PER_PAGE = 100
+MAX_RADIUS = 50
+
+
+class PlayerRollup:
+    __slots__ = ('name', 'runs', 'correct', 'total', 'best_correct', 'best_total', 'key')
+
+    def __init__(self, name):
+        self.name = name
+        self.runs = 0
+        # Lifetime sums over every run
+        self.correct = 0
+        self.total = 0
+        # Best qualifying run, and its sort key in the ranking (None: unranked)
+        self.best_correct = 0
+        self.best_total = 0
+        self.key = None
+
+    def to_dict(self, rank):
+        return {
+            "rank": rank,
+            "name": self.name,
+            "correct": self.best_correct,
+            "total": self.best_total,
+            "accuracy": self.best_correct / self.best_total if self.best_total else 0,
+            "runs": self.runs,
+            "lifetime_correct": self.correct,
+            "lifetime_total": self.total,
+        }
+
+
+class PlayerIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cursor = None
+        self._reset()
+
+    def _reset(self):
+        # difficulty -> {name: PlayerRollup}
+        self._players = {}
+        # difficulty -> sorted [(-accuracy, -total, seq, name)], rank 1 first
+        self._ranked = {}
+        # Order of the runs added, the last tie break
+        self._seq = 0
+
+    def sync(self, store):
+        # Fold in what was added to the store since the last sync
+        with self._lock:
+            cursor, entries, reset = store.changes(self._cursor)
+            if reset:
+                self._reset()
+            for entry in entries:
+                self._add(entry)
+            self._cursor = cursor
+
+    def add(self, entry):
+        with self._lock:
+            self._add(entry)
+
+    def _add(self, entry):
+        name = entry.get("name", "")
+        difficulty = entry.get("difficulty", "easy")
+        correct = int(entry.get("correct", 0))
+        total = int(entry.get("total", 0))
+        self._seq += 1
+
+        players = self._players.setdefault(difficulty, {})
+        player = players.get(name)
+        if player is None:
+            player = players[name] = PlayerRollup(name)
+        player.runs += 1
+        player.correct += correct
+        player.total += total
+        if total < MIN_TOTAL:
+            return
+
+        key = (-(correct / total), -total, self._seq, name)
+        if player.key is not None and player.key <= key:
+            return
+        ranked = self._ranked.setdefault(difficulty, [])
+        if player.key is not None:
+            del ranked[bisect_left(ranked, player.key)]
+        insort(ranked, key)
+        player.key = key
+        player.best_correct = correct
+        player.best_total = total
+
+    def player(self, name, difficulty):
+        # The player's rollup as a dict, rank None if they have no qualifying
+        # run; None for a name with no runs at all
+        with self._lock:
+            player = self._players.get(difficulty, {}).get(name)
+            if player is None:
+                return None
+            if player.key is None:
+                return player.to_dict(None)
+            return player.to_dict(bisect_left(self._ranked[difficulty], player.key) + 1)
+
+    def rank(self, name, difficulty):
+        player = self.player(name, difficulty)
+        return player["rank"] if player else None
+
+    def _slice(self, difficulty, start, stop):
+        ranked = self._ranked.get(difficulty, [])
+        players = self._players.get(difficulty, {})
+        start = max(start, 0)
+        return [players[key[3]].to_dict(rank) for rank, key in enumerate(ranked[start:stop], start + 1)]
+
+    def page(self, difficulty, page=1, per_page=20):
+        # (players on 1-based page, ranked player count)
+        per_page = min(max(per_page, 1), MAX_PER_PAGE)
+        start = (max(page, 1) - 1) * per_page
+        with self._lock:
+            return self._slice(difficulty, start, start + per_page), len(self._ranked.get(difficulty, ()))
+
+    def around(self, name, difficulty, radius=5):
+        # Up to radius ranked players either side of name, and name's own entry;
+        # ([], None) if name isn't ranked
+        radius = min(max(radius, 0), MAX_RADIUS)
+        with self._lock:
+            player = self._players.get(difficulty, {}).get(name)
+            if player is None or player.key is None:
+                return [], None
+            position = bisect_left(self._ranked[difficulty], player.key)
+            return self._slice(difficulty, position - radius, position + radius + 1), player.to_dict(position + 1)
@@ -0,0 +1,177 @@
+# Per-client token-bucket rate limiting for the expensive routes.
+#
+# Every (route, client) pair gets a bucket holding up to `burst` tokens that
+# refills at `rate` tokens a second; a request takes one token, and without
+# one it is answered 429 with a Retry-After of when the next token arrives.
+# Buckets are created on first use and kept in an LRU table capped at
+# RATE_LIMIT_MAX_BUCKETS, and a bucket left alone for RATE_LIMIT_IDLE_SECONDS
+# (by then it has refilled anyway) is dropped, so a flood of different
+# clients can't grow the table without bound.
+#
+#   RATE_LIMITS             off unless set. "on" turns on DEFAULT_LIMITS; routes
+#                           add to or override them: "on,/update_leaderboard=10/60,/equity=off"
+#                           (10 requests per 60 seconds, also the burst), or on their own
+#                           limit just those routes: "/equity=30/60"
+#   RATE_LIMIT_MAX_BUCKETS  buckets kept at most (default 10000)
+#   RATE_LIMIT_IDLE_SECONDS idle buckets dropped after this long (default 600)
+#   RATE_LIMIT_TRUST_PROXY  1 to key clients on the last X-Forwarded-For address
+#                           instead of the connection's, 0 not to. Only for a
+#                           deployment behind a proxy that appends it: anyone
+#                           else can send the header and pick their own key
+#
+# Behind a reverse proxy every connection comes from the proxy, so without
+# RATE_LIMIT_TRUST_PROXY all clients would share one bucket per route. On
+# Azure App Service (WEBSITE_SITE_NAME is set) requests always come through
+# its front end, and the proxy is trusted unless RATE_LIMIT_TRUST_PROXY=0.
+#
+# The limits are per process: with several workers a client gets up to that
+# many times the rate.
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# route -> (requests, per seconds) for RATE_LIMITS=on: the routes that write
+# to the leaderboard or evaluate hands; everything else is unlimited
+DEFAULT_LIMITS = {
+    '/update_leaderboard': (10, 60),
+    '/admin/clear_leaderboard': (10, 60),
+    '/start_game': (60, 60),
+    '/reveal_winner': (120, 60),
+    '/determine_winner': (120, 60),
+    '/game_action': (240, 60),
+    '/reveal_winner_batch': (20, 60),
+    '/equity': (30, 60),
+    '/drills': (10, 60),
+}
+
+
+def parse_limits(spec, defaults=DEFAULT_LIMITS):
+    # The limits a RATE_LIMITS string asks for: none when it is empty or
+    # "off", `defaults` for "on", and route=count/seconds items on top
+    limits = {}
+    spec = (spec or '').strip()
+    if spec.lower() == 'off':
+        return {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        if item.lower() == 'on':
+            limits.update(defaults)
+            continue
+        route, _, value = item.partition('=')
+        route, value = route.strip(), value.strip()
+        if value.lower() == 'off':
+            limits.pop(route, None)
+            continue
+        try:
+            count, _, seconds = value.partition('/')
+            count, seconds = int(count), float(seconds or 1)
+        except ValueError:
+            raise ValueError(f"Invalid rate limit {item!r}, expected route=count/seconds")
+        if count <= 0 or seconds <= 0:
+            raise ValueError(f"Invalid rate limit {item!r}, count and seconds must be positive")
+        limits[route] = (count, seconds)
+    return limits
+
+
+def client_key(remote_addr, forwarded_for=None, trust_proxy=False):
+    # The address a request is counted against. Behind a proxy every request
+    # comes from the proxy, which appends the real client to X-Forwarded-For
+    if trust_proxy and forwarded_for:
+        return _strip_port(forwarded_for.rsplit(',', 1)[-1].strip())
+    return remote_addr or ''
+
+
+def _strip_port(address):
+    # Some proxies (App Service among them) forward "ip:port"; the port
+    # changes with every connection, so it can't be part of the key
+    if address.startswith('['):
+        return address[1:].partition(']')[0]
+    if address.count(':') == 1:
+        return address.partition(':')[0]
+    return address
+
+
+class RateLimiter:
+    def __init__(self, limits, max_buckets=10000, idle_seconds=600, trust_proxy=False, clock=time.monotonic):
+        # limits: route -> (requests, per seconds)
+        self.limits = {route: (count / seconds, count) for route, (count, seconds) in limits.items()}
+        self.max_buckets = max_buckets
+        self.idle_seconds = idle_seconds
+        self.trust_proxy = trust_proxy
+        self._clock = clock
+        self._lock = threading.Lock()
+        # (route, client) -> [tokens, last refill]; least recently used first
+        self._buckets = OrderedDict()
+        self.allowed = 0
+        self.limited = 0
+        self.evicted = 0
+
+    @property
+    def enabled(self):
+        return bool(self.limits)
+
+    def client(self, remote_addr, forwarded_for=None):
+        return client_key(remote_addr, forwarded_for, self.trust_proxy)
+
+    def check(self, route, client):
+        # 0 if the request may go ahead, else the seconds until it would
+        limit = self.limits.get(route)
+        if limit is None:
+            return 0
+        rate, burst = limit
+        key = (route, client)
+        with self._lock:
+            now = self._clock()
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [burst, now]
+                self._evict(now)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                self.allowed += 1
+                return 0
+            self.limited += 1
+            return (1 - bucket[0]) / rate
+
+    def _evict(self, now):
+        # Idle buckets from the front (least recently used), then the oldest
+        # ones past the size cap
+        buckets = self._buckets
+        while buckets:
+            key, bucket = next(iter(buckets.items()))
+            if now - bucket[1] < self.idle_seconds and len(buckets) <= self.max_buckets:
+                break
+            del buckets[key]
+            self.evicted += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'routes': len(self.limits),
+                'buckets': len(self._buckets),
+                'allowed': self.allowed,
+                'limited': self.limited,
+                'evicted': self.evicted,
+            }
+
+
+def retry_after_header(seconds):
+    # Retry-After takes whole seconds; round up so a retry doesn't come too early
+    return str(max(1, math.ceil(seconds)))
+
+
+def create_rate_limiter():
+    return RateLimiter(
+        parse_limits(os.environ.get('RATE_LIMITS')),
+        max_buckets=int(os.environ.get('RATE_LIMIT_MAX_BUCKETS', 10000)),
+        idle_seconds=float(os.environ.get('RATE_LIMIT_IDLE_SECONDS', 600)),
+        trust_proxy=os.environ.get(
+            'RATE_LIMIT_TRUST_PROXY', '1' if os.environ.get('WEBSITE_SITE_NAME') else ''
+        ).lower() in ('1', 'true', 'yes'),
+    )
@@ -0,0 +1,98 @@
+# Tests for the ASGI serving mode in asgi.py.
+# Run with: python -m pytest test_asgi.py
+
+import asyncio
+import json
+
+from asgi import application
+
+
+def send_request(method, path, payload=None, query=b'', headers=()):
+    # One request through the ASGI app, returns the messages it sent
+    body = json.dumps(payload).encode() if payload is not None else b''
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'query_string': query,
+        'headers': [(b'content-type', b'application/json')] + list(headers),
+        'http_version': '1.1', 'scheme': 'http', 'root_path': '',
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 1234),
+    }
+    messages = []
+    delivered = []
+
+    async def receive():
+        if not delivered:
+            delivered.append(True)
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    return messages
+
+
+def call(method, path, payload=None, query=b'', headers=()):
+    # One request through the ASGI app, returns (status, headers, body)
+    messages = send_request(method, path, payload, query, headers)
+    start = messages[0]
+    content = b''.join(message.get('body', b'') for message in messages[1:])
+    return start['status'], dict(start['headers']), content
+
+
+def test_game_flow_matches_flask_routes():
+    status, headers, body = call('POST', '/start_game', {'num_players': 3, 'num_flops': 2}, query=b'cards=str')
+    assert status == 200 and headers[b'content-type'] == b'application/json'
+    game = json.loads(body)
+    assert len(game['players']) == 3 and isinstance(game['players'][0]['cards'][0], str)
+
+    status, headers, body = call('POST', '/reveal_winner', {
+        'players': game['players'],
+        'first_flop': game['first_flop']['exposed'] + game['first_flop']['flipped'],
+        'second_flop': game['second_flop']['exposed'],
+        'prediction_first': 'Player 1',
+        'prediction_second': 'Player 2',
+    }, headers=[(b'x-card-format', b'int')])
+    result = json.loads(body)
+    assert status == 200
+    assert result['winner_first'] and all(isinstance(card, int) for card in result['best_hand_first'])
+
+    status, headers, body = call('POST', '/reveal_winner', {'players': []})
+    assert status == 400
+
+
+def test_errors_stay_json():
+    status, headers, body = call('POST', '/reveal_turn', {'first_flop': []})
+    assert status == 500 and 'error' in json.loads(body)
+
+
+def test_post_needs_a_json_object():
+    for payload in (None, [1, 2], 'name'):
+        status, headers, body = call('POST', '/update_leaderboard', payload)
+        assert status == 400 and 'error' in json.loads(body)
+    status, headers, body = call('POST', '/game_action')
+    assert status == 400
+
+
+def test_other_paths_fall_back_to_flask():
+    status, headers, body = call('GET', '/')
+    assert status == 200 and b'<html' in body.lower()
+    status, headers, body = call('GET', '/favicon.ico')
+    assert status == 204
+    status, headers, body = call('GET', '/admin/metrics', query=b'format=prometheus')
+    assert status == 200 and headers[b'content-type'].startswith(b'text/plain')
+
+
+def test_drills_stream_in_chunks():
+    status, headers, body = call('GET', '/drills', query=b'count=70&seed=4')
+    assert status == 200 and headers[b'content-type'] == b'application/x-ndjson'
+    assert b'content-length' not in headers
+    lines = body.decode().splitlines()
+    assert len(lines) == 70 and json.loads(lines[-1])['id'] == 70
+    streamed = body
+    status, headers, body = call('GET', '/drills', query=b'players=1')
+    assert status == 400 and 'error' in json.loads(body)
+
+    # 64 drills per batch, each sent as soon as it is made
+    chunks = [message['body'] for message in send_request('GET', '/drills', query=b'count=70&seed=4')[1:] if message['body']]
+    assert len(chunks) == 2 and b''.join(chunks) == streamed
@@ -0,0 +1,28 @@
+# Tests for the benchmark runner in benchmarks.py (the runner, not the numbers).
+# Run with: python -m pytest test_benchmarks.py
+
+import json
+
+from benchmarks import compare, main
+
+
+def test_compare_flags_only_slowdowns_past_tolerance():
+    baseline = {'a': 10.0, 'b': 10.0, 'c': 10.0}
+    results = {'a': 12.0, 'b': 13.0, 'c': 5.0, 'new': 99.0}
+    assert compare(results, baseline, 0.25) == [('b', 10.0, 13.0)]
+
+
+def test_baseline_round_trip(tmp_path):
+    output = tmp_path / 'results.json'
+    baseline = tmp_path / 'baseline.json'
+    args = ['--quick', '--levels', 'eval', '--repeat', '1', '--output', str(output), '--baseline', str(baseline)]
+    assert main(args + ['--save-baseline']) == 0
+    saved = json.loads(baseline.read_text())
+    expected = {'eval/evaluate5', 'eval/evaluate_hand', 'eval/compare_hands', 'eval/best_hand'}
+    # Plus the batch cases when NumPy is installed
+    assert expected <= set(saved['results']) <= expected | {'eval/evaluate5_batch', 'eval/best_hands_batch'}
+
+    # A baseline that is impossibly fast makes the run fail
+    saved['results'] = {name: 1e-9 for name in saved['results']}
+    baseline.write_text(json.dumps(saved))
+    assert main(args) == 1
@@ -0,0 +1,95 @@
+# Tests for the static asset build and the built serving mode (build_assets.py).
+# Run with: python -m pytest test_build_assets.py
+
+import gzip
+import os
+import shutil
+import subprocess
+import tempfile
+
+import pytest
+
+import app as app_module
+import build_assets
+from app import app
+from build_assets import BuiltAssets, build, minify_css, minify_js
+
+
+def test_minify_js_keeps_literals():
+    source = '''
+        // line comment
+        const url = "http://example.com/*not a comment*/";   /* block */
+        const re = text.replace(/[^a-z/]+/g, "");
+        const half = total / 2 / count;
+        const label = `Player ${idx + 1} ${flag ? `on ${ {a: 1}.a }` : "off"} // kept`;
+        function f() {
+            return /x\\/y/i.test(label)
+        }
+    '''
+    minified = minify_js(source)
+    assert 'line comment' not in minified and 'block' not in minified
+    assert '"http://example.com/*not a comment*/"' in minified
+    assert '/[^a-z/]+/g' in minified and 'total / 2 / count' in minified
+    assert '`Player ${idx + 1} ${flag ? `on ${ {a: 1}.a }` : "off"} // kept`' in minified
+    assert 'return /x\\/y/i.test(label)\n}' in minified
+
+
+def test_minify_css():
+    css = minify_css('''
+        /* comment */
+        .a :hover, .b > .c {
+            content: " ; } ";
+            margin: 0 auto;
+        }
+        @media (max-width: 768px) { .a { width: 1px; } }
+    ''')
+    assert css == '.a :hover,.b>.c{content:" ; } ";margin:0 auto}@media (max-width:768px){.a{width:1px}}'
+
+
+@pytest.fixture
+def built(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        build_dir = os.path.join(tmp, 'build')
+        manifest = build(build_dir=build_dir)
+        assets = BuiltAssets(build_dir)
+        monkeypatch.setattr(app_module, 'built_assets', assets)
+        yield build_dir, manifest
+
+
+def test_build_output(built):
+    build_dir, manifest = built
+    with open(os.path.join(build_dir, 'index.html'), encoding='utf-8') as f:
+        index = f.read()
+    js, css = manifest['assets']['app.js'], manifest['assets']['app.css']
+    assert f'<script src="/static/build/{js}"></script>' in index
+    assert f'<link rel="stylesheet" href="/static/build/{css}">' in index
+    assert '<style>' not in index and 'renderPokerGame' not in index
+
+    with open(os.path.join(build_dir, js), 'rb') as f:
+        script = f.read()
+    with open(os.path.join(build_dir, js + '.gz'), 'rb') as f:
+        assert gzip.decompress(f.read()) == script
+    assert b'/static/logo.png' not in script
+    if shutil.which('node'):
+        subprocess.run(['node', '--check', os.path.join(build_dir, js)], check=True)
+    for filename in manifest['assets'].values():
+        assert os.path.exists(os.path.join(build_dir, filename))
+
+
+def test_built_serving(built):
+    build_dir, manifest = built
+    client = app.test_client()
+    response = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200 and response.headers['Content-Encoding'] == 'gzip'
+    assert b'/static/build/' in gzip.decompress(response.data)
+    etag = response.headers['ETag']
+    assert client.get('/game-options', headers={'If-None-Match': etag, 'Accept-Encoding': 'gzip'}).status_code == 304
+
+    js = manifest['assets']['app.js']
+    response = client.get(f'/static/build/{js}', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Cache-Control'] == build_assets.IMMUTABLE
+    assert response.headers['Content-Encoding'] == 'gzip' and response.mimetype == 'text/javascript'
+    plain = client.get(f'/static/build/{js}')
+    assert 'Content-Encoding' not in plain.headers and gzip.decompress(response.data) == plain.data
+    response.close()
+    plain.close()
@@ -0,0 +1,67 @@
+# Tests for the card codec in cards.py and the compact wire formats.
+# Run with: python -m pytest test_cards.py
+
+import pytest
+
+from cards import NUM_CARDS, Deck, encode_card, encode_cards, decode_cards
+
+
+def test_round_trips():
+    cards = list(range(NUM_CARDS))
+    for fmt in ('dict', 'str', 'int'):
+        assert encode_cards(decode_cards(cards, fmt)) == cards
+
+
+def test_string_forms():
+    ten_of_hearts = encode_card({'rank': '10', 'suit': '♥'})
+    for text in ("Th", "th", "TH", "10h", "T♥", "10♥"):
+        assert encode_card(text) == ten_of_hearts
+    assert decode_cards([ten_of_hearts], 'str') == ["Th"]
+    with pytest.raises(ValueError):
+        encode_card("1h")
+    with pytest.raises(ValueError):
+        encode_card(52)
+
+
+def test_routes_honour_card_format():
+    from app import app
+
+    client = app.test_client()
+    game = client.post('/start_game?cards=str', json={'num_players': 4}).get_json()
+    assert all(isinstance(card, str) and len(card) == 2 for card in game['deck'])
+
+    game = client.post('/start_game', json={'num_players': 4}, headers={'X-Card-Format': 'int'}).get_json()
+    assert all(isinstance(card, int) for card in game['players'][0]['cards'])
+
+    # Compact cards in, compact cards out
+    flops = {'first_flop': game['first_flop'], 'second_flop': game['second_flop']}
+    response = client.post('/reveal_card?cards=str', json={
+        'flop': 'first_flop', 'index': 0, 'flops': flops,
+        'prediction_first': 'Player 1', 'prediction_second': 'Player 2',
+    }).get_json()
+    assert len(response['flops']['first_flop']['exposed']) == 4
+    assert all(isinstance(card, str) for card in response['flops']['first_flop']['exposed'])
+
+    board = game['first_flop']['exposed'] + game['first_flop']['flipped']
+    result = client.post('/reveal_winner?cards=str', json={
+        'players': game['players'], 'first_flop': decode_cards(board, 'str'),
+        'second_flop': game['second_flop']['exposed'],
+        'prediction_first': 'Player 1', 'prediction_second': 'Player 2',
+    }).get_json()
+    assert all(isinstance(card, str) for card in result['best_hand_first'])
+
+
+def test_seeded_deck():
+    deck = Deck(42)
+    upcoming = list(deck)
+    # Iterating doesn't deal, and shows the order the cards will come out in
+    assert len(deck) == NUM_CARDS and sorted(upcoming) == list(range(NUM_CARDS))
+    hand = deck.deal_many(4)
+    assert hand == upcoming[:4] and list(deck) == upcoming[4:]
+    assert len(deck) == NUM_CARDS - 4 and hand[0] not in deck and upcoming[4] in deck
+    assert Deck(42).deal_many(10) == upcoming[:10] and Deck(43).deal_many(10) != upcoming[:10]
+
+    deck.remove(upcoming[4:50])
+    assert sorted(deck.deal_many(2)) == sorted(upcoming[50:])
+    with pytest.raises(ValueError):
+        deck.deal()
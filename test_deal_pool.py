@@ -0,0 +1,118 @@
+# Tests for the pre-dealt game pool in deal_pool.py.
+# Run with: python -m pytest test_deal_pool.py
+
+import time
+
+import pytest
+
+import app as app_module
+from app import app, deal_game, pick_winners, determine_winner_boards
+from deal_pool import DealPool, create_deal_pool, exposures
+from hand_evaluator import BestHandCache, card_mask, evaluate_cards
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, 'timed out waiting for the producer'
+        time.sleep(0.01)
+
+
+@pytest.mark.parametrize('difficulty', ['easy', 'difficult'])
+def test_every_street_is_scored_like_reveal_winner(difficulty):
+    pool = DealPool(deal_game, pick_winners, seed=11)
+    for _ in range(20):
+        game = pool.produce(5, 2, difficulty)
+        assert len(game.boards) == 2 and len(game.deck) == 52 - 5 * 4 - 2 * 5
+        for board, scores in zip(game.boards, game.scores):
+            shown = exposures(board, difficulty)
+            assert len(scores) == len(shown)
+            for cards in shown:
+                results, winner = scores[card_mask(cards)]
+                assert winner == pick_winners(results)
+                # Streets extend the one before, so an equally strong five may differ
+                expected = determine_winner_boards(game.hands, [cards])[0]
+                assert winner[:2] == expected[:2]
+                assert evaluate_cards(winner[2]) == evaluate_cards(expected[2])
+
+
+def test_pool_refills_between_watermarks():
+    pool = DealPool(deal_game, pick_winners, size=6, low=3)
+    try:
+        # Nothing is pooled until asked for
+        assert pool.take(3, 1, 'difficult') is None
+        wait_for(lambda: pool.ready(3, 1, 'difficult') == 6)
+        for _ in range(3):
+            game = pool.take(3, 1, 'difficult')
+            assert len(game.hands) == 3 and len(game.boards) == 1
+        # At the low watermark, not below it: no refill yet
+        time.sleep(0.05)
+        assert pool.ready(3, 1, 'difficult') == 3
+        pool.take(3, 1, 'difficult')
+        wait_for(lambda: pool.ready(3, 1, 'difficult') == 6)
+        stats = pool.stats()
+        assert stats['hits'] == 4 and stats['misses'] == 1 and stats['produced'] == 10
+        assert stats['combinations'] == 1 and stats['refilling'] == 0
+    finally:
+        pool.stop()
+
+
+def test_pool_bounds():
+    pool = DealPool(deal_game, pick_winners, size=2, low=1, max_keys=2)
+    try:
+        for players in (2, 3, 4):
+            pool.take(players, 2, 'easy')
+        assert pool.stats()['combinations'] == 2 and pool.stats()['dropped'] == 1
+        # Not pooled: served inline by the caller
+        assert pool.take(11, 2, 'easy') is None and pool.take(4, 2, 'expert') is None
+        assert pool.stats()['combinations'] == 2
+    finally:
+        pool.stop()
+    assert DealPool(deal_game, pick_winners, size=0).take(4, 2, 'easy') is None
+
+
+def test_pool_is_off_by_default(monkeypatch):
+    monkeypatch.delenv('DEAL_POOL_SIZE', raising=False)
+    pool = create_deal_pool(deal_game, pick_winners)
+    assert not pool.enabled and pool.take(4, 2, 'easy') is None
+    assert pool.stats()['combinations'] == 0 and pool._thread is None
+    monkeypatch.setenv('DEAL_POOL_SIZE', '4')
+    assert create_deal_pool(deal_game, pick_winners).enabled
+
+
+def test_prefill_makes_reveals_cache_hits():
+    game = DealPool(deal_game, pick_winners).produce(4, 2, 'difficult')
+    cache = BestHandCache()
+    game.prefill(cache)
+    for board in game.boards:
+        for cards in exposures(board, 'difficult'):
+            for hand in game.hands:
+                assert cache.lookup(hand, cards) is not None
+    assert cache.stats()['misses'] == 0
+
+
+def test_pooled_session_games_play_out(monkeypatch):
+    pool = DealPool(deal_game, pick_winners, size=4, low=2)
+    monkeypatch.setattr(app_module, 'deal_pool', pool)
+    client = app.test_client()
+    try:
+        client.post('/start_game', json={'num_players': 4, 'difficulty': 'difficult', 'session': True})
+        wait_for(lambda: pool.ready(4, 2, 'difficult') == 4)
+        game = client.post('/start_game', json={'num_players': 4, 'difficulty': 'difficult', 'session': True}).get_json()
+        assert pool.stats()['hits'] == 1
+        state = app_module.game_sessions.get(game['game_id'])
+        assert state.scores is not None
+
+        predictions = {'prediction_first': 'Player 1', 'prediction_second': 'Player 2'}
+        for action in ('reveal_winner', 'reveal_card', 'reveal_winner'):
+            body = dict(predictions, game_id=game['game_id'], action=action, flop='second_flop', index=1)
+            result = client.post('/game_action?cards=int', json=body).get_json()
+            if action == 'reveal_winner':
+                boards = [result['first_flop']['exposed'], result['second_flop']['exposed']]
+                hands = [player['cards'] for player in result['players']]
+                expected = determine_winner_boards(hands, boards)
+                for suffix, (winner, hand_type, best) in zip(('first', 'second'), expected):
+                    assert (result[f'winner_{suffix}'], result[f'hand_type_{suffix}']) == (winner, hand_type)
+                    assert evaluate_cards(result[f'best_hand_{suffix}']) == evaluate_cards(best)
+    finally:
+        pool.stop()
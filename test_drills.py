@@ -0,0 +1,75 @@
+# Tests for the bulk drill generator in drills.py and the /drills route.
+# Run with: python -m pytest test_drills.py
+
+import json
+
+import pytest
+
+from app import app, best_hand_cache, deal_game, determine_winner_boards
+from drills import generate_drills, main, parse_drill_options
+
+
+def drills(**options):
+    return list(generate_drills(deal_game, determine_winner_boards, **options))
+
+
+def test_seeded_drills_are_reproducible():
+    first = drills(count=5, num_players=6, seed=7)
+    assert first == drills(count=5, num_players=6, seed=7)
+    assert first != drills(count=5, num_players=6, seed=8)
+    assert [drill['id'] for drill in first] == [1, 2, 3, 4, 5]
+
+
+def test_drills_are_scored_like_reveal_winner():
+    for drill in drills(count=10, num_players=4, num_boards=2, seed=1, fmt='int'):
+        hands = [player['cards'] for player in drill['players']]
+        boards = [drill['first_flop']['cards'], drill['second_flop']['cards']]
+        expected = determine_winner_boards(hands, boards)
+        for key, (winner, hand_type, best) in zip(['first_flop', 'second_flop'], expected):
+            assert (drill[key]['winner'], drill[key]['hand_type'], drill[key]['best_hand']) == (winner, hand_type, best)
+            assert 'streets' not in drill[key]
+        # Every card is dealt once
+        cards = sum(hands, []) + sum(boards, [])
+        assert len(set(cards)) == len(cards) == 4 * 4 + 2 * 5
+
+
+def test_difficult_drills_carry_street_winners():
+    drill = drills(count=1, num_boards=1, difficulty='difficult', seed=3, fmt='int')[0]
+    assert drill['second_flop'] is None
+    hands = [player['cards'] for player in drill['players']]
+    board = drill['first_flop']['cards']
+    streets = drill['first_flop']['streets']
+    assert set(streets) == {'flop', 'turn'}
+    winner, hand_type, best = determine_winner_boards(hands, [board[:4]])[0]
+    assert streets['turn'] == {'winner': winner, 'hand_type': hand_type, 'best_hand': best}
+
+
+def test_options_are_validated():
+    assert parse_drill_options({'count': '3', 'seed': '9'})['seed'] == 9
+    for bad in ({'count': '0'}, {'count': 'x'}, {'players': '11'}, {'boards': '3'},
+                {'difficulty': 'hard'}, {'cards': 'png'}):
+        with pytest.raises(ValueError):
+            parse_drill_options(bad)
+
+
+def test_drills_route_streams_ndjson():
+    client = app.test_client()
+    best_hand_cache.clear()
+    response = client.get('/drills?count=4&players=3&difficulty=difficult&seed=5&cards=str')
+    assert response.status_code == 200 and response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    # One-off deals, kept out of the cache the live games use
+    assert best_hand_cache.stats()['size'] == 0
+    assert len(lines) == 4 and len(lines[0]['players']) == 3
+    assert isinstance(lines[0]['first_flop']['cards'][0], str) and 'streets' in lines[0]['first_flop']
+    assert lines == drills(count=4, num_players=3, difficulty='difficult', seed=5, fmt='str')
+
+    response = client.get('/drills?count=1000000')
+    assert response.status_code == 400 and 'error' in response.get_json()
+
+
+def test_cli_writes_a_file(tmp_path):
+    output = tmp_path / 'drills.ndjson'
+    assert main(['--count', '3', '--seed', '2', '--cards', 'int', '-o', str(output)]) == 0
+    lines = [json.loads(line) for line in output.read_text().splitlines()]
+    assert lines == drills(count=3, seed=2, fmt='int')
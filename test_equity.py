@@ -0,0 +1,78 @@
+# Tests for the Monte Carlo equity estimator in equity.py.
+# Run with: python -m pytest test_equity.py
+
+import random
+
+from cards import encode_cards
+from equity import estimate_equity
+
+
+def cards(text):
+    return encode_cards([{'rank': card[:-1], 'suit': card[-1]} for card in text.split()])
+
+
+def test_complete_board_is_exact():
+    hands = [cards("A♠ A♥ 2♣ 3♣"), cards("K♠ K♥ 7♣ 8♣")]
+    result = estimate_equity(hands, [cards("A♦ K♦ 5♠ 9♥ J♣")])
+    assert result['exact'] and result['samples'] == 1
+    assert [p['equity'] for p in result['boards'][0]] == [1.0, 0.0]
+
+
+def test_river_enumeration_sums_to_one():
+    hands = [cards("A♠ A♥ 2♣ 3♣"), cards("K♠ K♥ 7♣ 8♣"), cards("Q♠ J♠ 10♦ 9♦")]
+    result = estimate_equity(hands, [cards("A♦ K♦ 5♠ 9♥")])
+    # 52 - 12 - 4 = 36 possible rivers, all enumerated
+    assert result['exact'] and result['samples'] == 36
+    board = result['boards'][0]
+    assert abs(sum(p['equity'] for p in board) - 1.0) < 1e-9
+    assert all(p['error'] == 0.0 for p in board)
+
+
+def test_sampling_reports_error_bars():
+    hands = [cards("A♠ A♥ 2♣ 3♣"), cards("K♠ K♥ 7♣ 8♣")]
+    boards = [cards("4♦ 9♠ J♥"), cards("5♦ 6♠ Q♥")]
+    result = estimate_equity(hands, boards, target_error=0.05, time_budget_ms=2000, rng=random.Random(3))
+    assert not result['exact']
+    for board in result['boards']:
+        assert abs(sum(p['equity'] for p in board) - 1.0) < 1e-9
+        assert max(p['error'] for p in board) <= 0.05
+
+
+def test_enumeration_cut_short_is_a_random_sample():
+    # 5 players and two boards at the turn: 22 * 22 runouts, more than one
+    # batch. With no time at all only the first batch is played, which must
+    # be a random sample of the runouts and not the first ones in order
+    rng = random.Random(5)
+    deck = rng.sample(range(52), 5 * 4 + 8)
+    hands = [deck[i * 4:i * 4 + 4] for i in range(5)]
+    boards = [deck[20:24], deck[24:28]]
+    full = estimate_equity(hands, boards, time_budget_ms=60000, vectorized=False)
+    assert full['exact']
+    misses = 0
+    for seed in range(20):
+        cut = estimate_equity(hands, boards, time_budget_ms=0, rng=random.Random(seed), vectorized=False)
+        assert not cut['exact'] and cut['samples'] < full['samples']
+        for exact_board, cut_board in zip(full['boards'], cut['boards']):
+            for exact_player, cut_player in zip(exact_board, cut_board):
+                if abs(exact_player['equity'] - cut_player['equity']) > cut_player['error'] + 1e-9:
+                    misses += 1
+    # 95% intervals: about 5 of the 200 miss, a lexicographic prefix misses far more
+    assert misses <= 30
+
+
+def test_ragged_hands():
+    from app import app
+
+    hands = [cards("A♠ A♥ K♦ K♣"), cards("2♠ 7♥ 9♦")]
+    # Falls back to the scalar evaluator instead of failing on the array shape
+    result = estimate_equity(hands, [cards("Q♠ J♠ 3♦ 4♣")], vectorized=True)
+    assert result['exact'] and abs(sum(p['equity'] for p in result['boards'][0]) - 1.0) < 1e-9
+
+    client = app.test_client()
+    for short_hand in (['2♠', '7♥', '9♦'], []):
+        response = client.post('/equity', json={
+            'players': [{'cards': ['A♠', 'A♥', 'K♦', 'K♣']}, {'cards': short_hand}],
+            'first_flop': ['Q♠', 'J♠', '3♦'],
+        })
+        assert response.status_code == 400
+        assert 'hole cards' in response.get_json()['error']
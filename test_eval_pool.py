@@ -0,0 +1,82 @@
+# Tests for the evaluation process pool in eval_pool.py.
+# Run with: python -m pytest test_eval_pool.py
+
+import random
+
+import pytest
+
+from eval_pool import EvalPool, EvalPoolTimeout
+from hand_evaluator import BestHandCache, best_hand
+
+
+@pytest.fixture(scope='module')
+def pool():
+    pool = EvalPool(workers=2, threshold=0, timeout=30)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+def deals(count, seed=3):
+    rng = random.Random(seed)
+    jobs = []
+    for _ in range(count):
+        cards = rng.sample(range(52), 4 * 10 + 5)
+        board = cards[40:40 + rng.choice([3, 4, 5])]
+        jobs.extend((cards[i * 4:i * 4 + 4], board) for i in range(10))
+    return jobs
+
+
+def test_pool_results_match_inline(pool):
+    jobs = deals(30)
+    assert pool.best_hands(jobs) == [best_hand(hole, board) for hole, board in jobs]
+    assert pool.stats()['pooled_jobs'] >= len(jobs)
+
+
+def test_pool_uses_and_fills_cache(pool):
+    jobs = deals(5, seed=8)
+    cache = BestHandCache()
+    cache.best_hand(*jobs[0])
+    assert pool.best_hands(jobs, cache) == [best_hand(hole, board) for hole, board in jobs]
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['size'] == len(jobs)
+
+
+def test_small_work_stays_inline():
+    pool = EvalPool(workers=2, threshold=100)
+    jobs = deals(1)
+    assert pool.best_hands(jobs) == [best_hand(hole, board) for hole, board in jobs]
+    assert pool.stats()['running'] is False and pool.stats()['inline_jobs'] == len(jobs)
+
+
+def test_call_and_timeout(pool):
+    assert pool.call(sum, [1, 2, 3]) == 6
+    with pytest.raises(EvalPoolTimeout):
+        pool.call(__import__('time').sleep, 2, timeout=0.05)
+
+
+def test_app_batch_and_winners_match_inline(pool, monkeypatch):
+    import app
+    from cards import decode_cards
+
+    rng = random.Random(21)
+    batch = []
+    for _ in range(20):
+        cards = rng.sample(range(52), 8 * 4 + 10)
+        batch.append({
+            'players': [{'cards': decode_cards(cards[i * 4:i * 4 + 4])} for i in range(8)],
+            'boards': [decode_cards(cards[32:37]), decode_cards(cards[37:40])],
+        })
+    batch.append({'players': []})
+
+    app.best_hand_cache.clear()
+    inline = app.determine_winners_batch(batch)
+    app.best_hand_cache.clear()
+    monkeypatch.setattr(app, 'eval_pool', pool)
+    assert app.determine_winners_batch(batch) == inline
+    assert inline[-1] == {'error': 'Invalid or missing players data'}
+
+    deal = batch[0]
+    assert app.determine_winner_boards(deal['players'], deal['boards']) == [
+        (result['winner'], result['hand_type'], result['best_hand']) for result in inline[0]['boards']
+    ]
@@ -0,0 +1,100 @@
+# Tests for the server-side game sessions (game_sessions.py and /game_action).
+# Run with: python -m pytest test_game_sessions.py
+
+import time
+
+from game_sessions import GameSessionStore, GameState
+
+
+def small_state():
+    return GameState([[0, 1, 2, 3]], [[4, 5, 6, 7, 8]], [3])
+
+
+def test_lru_eviction_and_ttl():
+    store = GameSessionStore(max_sessions=2, ttl_seconds=60)
+    first = store.create(small_state())
+    second = store.create(small_state())
+    assert store.get(first) is not None  # first is now the most recent
+    store.create(small_state())
+    assert store.get(second) is None
+    assert store.get(first) is not None
+    assert store.stats()['evictions'] == 1
+
+    store = GameSessionStore(ttl_seconds=0.01)
+    game_id = store.create(small_state())
+    time.sleep(0.02)
+    assert store.get(game_id) is None
+    assert store.stats()['expirations'] == 1
+
+
+def test_byte_cap():
+    state = small_state()
+    store = GameSessionStore(max_bytes=state.size() * 3)
+    for _ in range(10):
+        store.create(small_state())
+    assert store.stats()['sessions'] == 3
+
+
+def test_size_follows_kept_best_hands():
+    state = small_state()
+    store = GameSessionStore()
+    game_id = store.create(state)
+    before = store.stats()['bytes']
+    state.best_hands(0)
+    store.resize(game_id, state)
+    assert store.stats()['bytes'] == state.size() > before
+    # A game no longer in the store isn't counted again
+    store.discard(game_id)
+    store.resize(game_id, state)
+    assert store.stats()['bytes'] == 0
+
+
+def test_concurrent_actions_on_one_game():
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app import app
+
+    client = app.test_client()
+    game = client.post('/start_game', json={'num_players': 6, 'difficulty': 'difficult', 'session': True}).get_json()
+    play = {'game_id': game['game_id'], 'prediction_first': 'Player 1', 'prediction_second': 'Player 2'}
+
+    def reveal_turn(_):
+        return client.post('/game_action', json={**play, 'action': 'reveal_turn'}).status_code
+
+    # Only one of them finds both boards still on the flop
+    with ThreadPoolExecutor(8) as executor:
+        statuses = sorted(executor.map(reveal_turn, range(8)))
+    assert statuses == [200] + [400] * 7
+    result = client.post('/game_action', json={**play, 'action': 'reveal_winner'}).get_json()
+    assert len(result['first_flop']['exposed']) == 4 and len(result['second_flop']['exposed']) == 4
+
+
+def test_reveal_swaps_face_down_cards():
+    state = small_state()
+    assert state.reveal(0, 1) == 8
+    assert state.exposed(0) == [4, 5, 6, 8]
+    assert state.hidden_count(0) == 1
+
+
+def test_session_game_flow():
+    from app import app
+
+    client = app.test_client()
+    game = client.post('/start_game', json={'num_players': 4, 'difficulty': 'difficult', 'session': True}).get_json()
+    assert 'deck' not in game
+    assert game['first_flop']['hidden'] == 2 and len(game['first_flop']['exposed']) == 3
+
+    play = {'game_id': game['game_id'], 'prediction_first': 'Player 1', 'prediction_second': 'Player 2'}
+    # The 5th card needs both 4th cards first
+    client.post('/game_action', json={**play, 'action': 'reveal_card', 'flop': 'first_flop'})
+    response = client.post('/game_action', json={**play, 'action': 'reveal_card', 'flop': 'first_flop'})
+    assert response.status_code == 403
+    client.post('/game_action', json={**play, 'action': 'reveal_card', 'flop': 'second_flop'})
+    response = client.post('/game_action', json={**play, 'action': 'reveal_river'})
+    assert response.status_code == 200
+
+    result = client.post('/game_action', json={**play, 'action': 'reveal_winner'}).get_json()
+    assert result['first_flop']['hidden'] == 0 and len(result['second_flop']['exposed']) == 5
+    assert result['winner_first'] and result['winner_second']
+
+    assert client.post('/game_action', json={**play, 'game_id': 'missing', 'action': 'reveal_winner'}).status_code == 404
@@ -0,0 +1,69 @@
+# Tests for the stateless signed game tokens in game_tokens.py.
+# Run with: python -m pytest test_game_tokens.py
+
+import pytest
+
+from app import app, deal_game, determine_winner_boards
+from game_tokens import GameTokens, InvalidToken, _b64decode, _b64encode
+
+
+def test_tokens_rebuild_the_game():
+    tokens = GameTokens(b'secret', deal_game)
+    token, state = tokens.new_game(6, 2, 'difficult')
+    assert len(token) < 50
+    seed, loaded = tokens.load(token)
+    assert loaded.hands == state.hands and loaded.boards == state.boards and loaded.revealed == [3, 3]
+
+    # Turn over the 5th card of the second board first
+    state.reveal(1, 1)
+    seed, loaded = tokens.load(tokens.dump(seed, state))
+    assert loaded.boards == state.boards and loaded.revealed == [3, 4]
+    assert loaded.exposed(1) == state.exposed(1)
+
+    # Another worker with the same secret serves the same game
+    assert GameTokens(b'secret', deal_game).load(token)[1].hands == state.hands
+
+
+def test_tokens_are_tamper_proof():
+    tokens = GameTokens(b'secret', deal_game)
+    token, state = tokens.new_game(4, 2, 'difficult')
+    raw = bytearray(_b64decode(token))
+    raw[10] ^= 1
+    for bad in (_b64encode(bytes(raw)), token[:-2], 'not a token', 12):
+        with pytest.raises(InvalidToken):
+            tokens.load(bad)
+    with pytest.raises(InvalidToken):
+        GameTokens(b'other secret', deal_game).load(token)
+    with pytest.raises(ValueError):
+        tokens.new_game(11, 2, 'easy')
+
+
+def test_token_game_flow():
+    client = app.test_client()
+    game = client.post('/start_game?cards=int', json={'num_players': 4, 'difficulty': 'difficult', 'token': True}).get_json()
+    assert 'deck' not in game and 'game_id' not in game
+    assert len(game['first_flop']['exposed']) == 3 and game['first_flop']['hidden'] == 2
+    predictions = {'prediction_first': 'Player 1', 'prediction_second': 'Player 2'}
+
+    game = client.post('/game_action?cards=int', json=dict(
+        predictions, token=game['token'], action='reveal_card', flop='first_flop', index=1
+    )).get_json()
+    assert len(game['first_flop']['exposed']) == 4
+    response = client.post('/reveal_turn?cards=int', json={'token': game['token']})
+    assert response.status_code == 400
+    game = client.post('/game_action?cards=int', json=dict(
+        predictions, token=game['token'], action='reveal_card', flop='second_flop', index=0
+    )).get_json()
+    game = client.post('/reveal_river?cards=int', json={'token': game['token']}).get_json()
+    assert game['first_flop']['hidden'] == game['second_flop']['hidden'] == 0
+
+    result = client.post('/game_action?cards=int', json=dict(predictions, token=game['token'], action='reveal_winner')).get_json()
+    hands = [player['cards'] for player in result['players']]
+    expected = determine_winner_boards(hands, [result['first_flop']['exposed'], result['second_flop']['exposed']])
+    assert (result['winner_first'], result['hand_type_first']) == expected[0][:2]
+    assert (result['winner_second'], result['hand_type_second']) == expected[1][:2]
+
+    token = game['token']
+    tampered = ('B' if token[0] == 'A' else 'A') + token[1:]
+    response = client.post('/game_action', json={'token': tampered, 'action': 'reveal_winner'})
+    assert response.status_code == 400
@@ -0,0 +1,136 @@
+# Tests for the lookup-table evaluator in hand_evaluator.py.
+# Run with: python -m pytest test_hand_evaluator.py
+
+import pytest
+
+from cards import encode_cards
+from hand_evaluator import (
+    NUM_CLASSES, evaluate_cards, hand_category, hand_description, hand_name,
+    ROYAL_FLUSH, STRAIGHT, TWO_PAIR, HIGH_CARD,
+)
+
+
+def hand(text):
+    # "A♠ K♠ Q♠ J♠ 10♠" -> int cards
+    return encode_cards([{'rank': card[:-1], 'suit': card[-1]} for card in text.split()])
+
+
+def test_strength_range():
+    assert evaluate_cards(hand("10♠ J♠ Q♠ K♠ A♠")) == NUM_CLASSES
+    assert evaluate_cards(hand("7♠ 5♥ 4♦ 3♣ 2♠")) == 1
+    assert hand_category(NUM_CLASSES) == ROYAL_FLUSH
+    assert hand_category(1) == HIGH_CARD
+    for strength in (0, -1, NUM_CLASSES + 1):
+        with pytest.raises(ValueError):
+            hand_category(strength)
+
+
+def test_ordering():
+    # Each hand beats the next one
+    ordered = [
+        "A♠ A♥ A♦ K♣ K♠",   # full house
+        "K♠ K♥ K♦ A♣ A♠",
+        "A♥ Q♥ 9♥ 5♥ 3♥",   # flush
+        "6♠ 5♥ 4♦ 3♣ 2♠",   # six-high straight
+        "A♠ 2♥ 3♦ 4♣ 5♠",   # wheel
+        "A♠ A♥ K♦ K♣ Q♠",   # two pair, Q kicker
+        "A♠ A♥ K♦ K♣ J♠",
+        "A♠ A♥ 7♦ 6♣ 2♠",   # one pair, 7 kicker
+        "A♠ A♥ 6♦ 5♣ 4♠",
+        "A♠ K♥ Q♦ J♣ 9♠",   # high card
+    ]
+    strengths = [evaluate_cards(hand(text)) for text in ordered]
+    assert strengths == sorted(strengths, reverse=True)
+    assert len(set(strengths)) == len(strengths)
+
+
+def test_ties_ignore_suits_and_order():
+    assert evaluate_cards(hand("A♠ A♥ K♦ K♣ Q♠")) == evaluate_cards(hand("Q♥ K♠ A♦ K♥ A♣"))
+    assert evaluate_cards(hand("A♥ Q♥ 9♥ 5♥ 3♥")) == evaluate_cards(hand("3♠ 5♠ 9♠ Q♠ A♠"))
+
+
+def test_descriptions():
+    assert hand_description(evaluate_cards(hand("10♠ J♠ Q♠ K♠ A♠"))) == "Royal Flush"
+    assert hand_description(evaluate_cards(hand("9♠ 10♠ J♠ Q♠ K♠"))) == "Straight Flush, K high"
+    assert hand_description(evaluate_cards(hand("A♠ 2♥ 3♦ 4♣ 5♠"))) == "Straight, 5"
+    assert hand_description(evaluate_cards(hand("K♥ Q♥ 9♥ 5♥ 3♥"))) == "King-high Flush"
+    assert hand_description(evaluate_cards(hand("A♠ A♥ K♦ K♣ Q♠"))) == ['A', 'K', 'Q']
+    assert hand_description(evaluate_cards(hand("7♠ 7♥ A♦ K♣ 2♠"))) == ['7', 'A', 'K', '2']
+    assert hand_name(evaluate_cards(hand("A♠ 2♥ 3♦ 4♣ 5♠"))) == "Straight"
+    assert hand_category(evaluate_cards(hand("A♠ A♥ K♦ K♣ Q♠"))) == TWO_PAIR
+    assert hand_category(evaluate_cards(hand("A♠ 2♥ 3♦ 4♣ 5♠"))) == STRAIGHT
+
+
+def test_best_hand_matches_brute_force():
+    import random
+    from itertools import combinations
+    from hand_evaluator import best_hand, prepare_board, evaluate5
+
+    rng = random.Random(7)
+    for _ in range(2000):
+        board_size = rng.choice([3, 4, 5])
+        cards = rng.sample(range(52), 8 + board_size)
+        board = prepare_board(cards[8:])
+        for hole in (cards[:4], cards[4:8]):
+            expected = max(
+                evaluate5(a, b, c, d, e)
+                for a, b in combinations(hole, 2)
+                for c, d, e in combinations(cards[8:], 3)
+            )
+            strength, five = best_hand(hole, board)
+            assert strength == expected
+            assert evaluate_cards(five) == strength
+            assert len(set(five) & set(hole)) == 2
+
+
+def test_combination_counter_counts_lookups():
+    import hand_evaluator
+    from hand_evaluator import best_hand
+
+    before = hand_evaluator._eval_counts[1]
+    # A♠K♠ looks up one spade flush; A♥K♠ repeats A♠K♠'s ranks and A♥Q♦ A♠Q♦'s,
+    # leaving 4 rank pairs times 10 board triples
+    best_hand(hand("A♠ K♠ A♥ Q♦"), hand("10♠ 9♠ 2♠ 3♥ 4♦"))
+    assert hand_evaluator._eval_counts[1] - before == 4 * 10 + 1
+
+
+def test_best_hand_cache():
+    from hand_evaluator import BestHandCache, best_hand
+
+    cache = BestHandCache(max_size=2)
+    hole, board = [0, 5, 10, 15], [20, 25, 30, 35, 40]
+    assert cache.best_hand(hole, board) == best_hand(hole, board)
+    # Card order doesn't matter for the key
+    assert cache.best_hand(hole[::-1], board[::-1])[0] == best_hand(hole, board)[0]
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+    cache.best_hand([1, 6, 11, 16], board)
+    cache.best_hand([2, 7, 12, 17], board)
+    assert cache.stats()['size'] == 2 and cache.stats()['evictions'] == 1
+
+
+def test_hand_progress_matches_full_evaluation():
+    import random
+    from hand_evaluator import HandProgress, PreparedBoard, best_hand
+
+    rng = random.Random(11)
+    for _ in range(300):
+        cards = rng.sample(range(52), 13)
+        hands, board = [cards[:4], cards[4:8]], cards[8:]
+        progress = [HandProgress(hole, board[:3]) for hole in hands]
+        for size in (4, 5):
+            prepared = PreparedBoard(board[:size])
+            for hole, player in zip(hands, progress):
+                player.add_card(board[size - 1], prepared)
+                assert player.strength == best_hand(hole, board[:size])[0]
+                assert evaluate_cards(player.five) == player.strength
+
+
+def test_best_hand_cache_extends_previous_street():
+    from hand_evaluator import BestHandCache, best_hand
+
+    cache = BestHandCache()
+    hole, board = [0, 5, 10, 15], [20, 25, 30, 35, 40]
+    for size in (3, 4, 5):
+        assert cache.best_hand(hole, board[:size]) == best_hand(hole, board[:size])
+    assert cache.stats()['extended'] == 2
@@ -0,0 +1,123 @@
+# Tests for conditional GETs and compression (http_cache.py and its use in the app).
+# Run with: python -m pytest test_http_cache.py
+
+import gzip
+import json
+import os
+import tempfile
+
+import pytest
+
+import app as app_module
+import http_cache
+from app import app
+from http_cache import VersionedCache, accepted_encoding, encode_body, etag_matches
+from leaderboard_store import JsonLeaderboardStore, SqliteLeaderboardStore
+from test_asgi import call
+
+
+def test_negotiation_and_etags():
+    assert accepted_encoding('gzip, deflate') == 'gzip'
+    assert accepted_encoding('gzip;q=0, identity') is None
+    assert accepted_encoding('*') == 'gzip'
+    assert accepted_encoding(None) is None
+
+    body = b'{"x": "' + b'a' * 2000 + b'"}'
+    compressed, encoding = encode_body(body, 'gzip', min_size=1024)
+    assert encoding == 'gzip' and gzip.decompress(compressed) == body
+    assert encode_body(body[:100], 'gzip', min_size=1024) == (body[:100], None)
+
+    assert etag_matches('"a", W/"b"', '"b"') and etag_matches('*', '"c"')
+    assert not etag_matches('"a"', '"b"') and not etag_matches(None, '"b"')
+
+    cache = VersionedCache(max_entries=2)
+    cached = cache.put('easy', 1, body)
+    assert cache.get('easy', 1) is cached and cache.get('easy', 2) is None
+    plain, _, etag = cached.encoded(None, min_size=1024)
+    zipped, encoding, zipped_etag = cached.encoded('gzip', min_size=1024)
+    assert plain == body and encoding == 'gzip' and zipped_etag != etag
+    assert cached.encoded('gzip', min_size=1024)[0] is zipped
+
+
+@pytest.mark.parametrize('backend', ['sqlite', 'json'])
+def test_store_versions_follow_other_writers(backend):
+    with tempfile.TemporaryDirectory() as tmp:
+        if backend == 'sqlite':
+            make_store = lambda: SqliteLeaderboardStore(os.path.join(tmp, 'leaderboard.db'), json_path=None)
+        else:
+            make_store = lambda: JsonLeaderboardStore(os.path.join(tmp, 'leaderboard.json'))
+        store, writer = make_store(), make_store()
+        version = store.version()
+        assert store.version() == version
+        writer.add_entry({'name': 'a', 'correct': 10, 'total': 20, 'difficulty': 'easy'})
+        assert store.version() != version
+        version = store.version()
+        store.clear()
+        assert store.version() != version
+
+
+@pytest.mark.parametrize('backend', ['sqlite', 'json'])
+def test_etags_across_workers(monkeypatch, backend):
+    # Two workers on the same storage: SQLite's ETags agree, so a poll
+    # answered by the other one still gets its 304
+    with tempfile.TemporaryDirectory() as tmp:
+        if backend == 'sqlite':
+            make_store = lambda: SqliteLeaderboardStore(os.path.join(tmp, 'leaderboard.db'), json_path=None)
+        else:
+            make_store = lambda: JsonLeaderboardStore(os.path.join(tmp, 'leaderboard.json'))
+        make_store().add_entry({'name': 'ann', 'correct': 15, 'total': 20, 'difficulty': 'easy'})
+        etags = []
+        for _ in range(2):
+            monkeypatch.setattr(app_module, '_leaderboard_store', make_store())
+            monkeypatch.setattr(app_module, 'leaderboard_cache', VersionedCache())
+            etags.append(app_module.leaderboard_response('easy')[2][0][1])
+        if backend == 'sqlite':
+            assert etags[0] == etags[1]
+            assert app_module.leaderboard_response('easy', etags[0])[1] == 304
+        else:
+            # Per-process counters could repeat, so they are never shared
+            assert etags[0] != etags[1]
+
+
+def test_leaderboard_etag_and_cache(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SqliteLeaderboardStore(os.path.join(tmp, 'leaderboard.db'), json_path=None)
+        monkeypatch.setattr(app_module, '_leaderboard_store', store)
+        monkeypatch.setattr(app_module, 'leaderboard_cache', VersionedCache())
+        monkeypatch.setattr(http_cache, 'COMPRESS_MIN_SIZE', 1)
+        client = app.test_client()
+        store.add_entry({'name': 'ann', 'correct': 15, 'total': 20, 'difficulty': 'easy'})
+
+        response = client.get('/leaderboard?difficulty=easy')
+        etag = response.headers['ETag']
+        assert response.status_code == 200 and response.get_json()['leaderboard'][0]['name'] == 'ann'
+
+        # Unchanged: answered without reading the store again
+        monkeypatch.setattr(store, 'top', lambda *args, **kwargs: pytest.fail('store read'))
+        response = client.get('/leaderboard?difficulty=easy', headers={'If-None-Match': etag})
+        assert response.status_code == 304 and response.data == b''
+        response = client.get('/leaderboard?difficulty=easy', headers={'Accept-Encoding': 'gzip'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert json.loads(gzip.decompress(response.data))['leaderboard'][0]['name'] == 'ann'
+        status, headers, body = call('GET', '/leaderboard', query=b'difficulty=easy', headers=[(b'if-none-match', etag.encode())])
+        assert status == 304 and body == b'' and b'content-length' not in headers
+        monkeypatch.undo()
+
+        monkeypatch.setattr(app_module, '_leaderboard_store', store)
+        store.add_entry({'name': 'bob', 'correct': 19, 'total': 20, 'difficulty': 'easy'})
+        response = client.get('/leaderboard?difficulty=easy', headers={'If-None-Match': etag})
+        assert response.status_code == 200 and response.headers['ETag'] != etag
+        assert response.get_json()['leaderboard'][0]['name'] == 'bob'
+
+
+def test_json_responses_compressed(monkeypatch):
+    monkeypatch.setattr(http_cache, 'COMPRESS_MIN_SIZE', 256)
+    client = app.test_client()
+    response = client.post('/start_game', json={'num_players': 10}, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip' and 'Accept-Encoding' in response.headers['Vary']
+    assert len(json.loads(gzip.decompress(response.data))['players']) == 10
+    assert 'Content-Encoding' not in client.post('/start_game', json={'num_players': 10}).headers
+
+    status, headers, body = call('POST', '/start_game', {'num_players': 10}, headers=[(b'accept-encoding', b'gzip')])
+    assert status == 200 and headers[b'content-encoding'] == b'gzip'
+    assert len(json.loads(gzip.decompress(body))['players']) == 10
@@ -0,0 +1,171 @@
+# Tests for the leaderboard storage backends in leaderboard_store.py.
+# Run with: python -m pytest test_leaderboard_store.py
+
+import json
+import os
+import random
+import tempfile
+
+from leaderboard_store import JsonLeaderboardStore, SqliteLeaderboardStore
+
+
+def random_entries(count, seed=1):
+    rng = random.Random(seed)
+    entries = []
+    for i in range(count):
+        total = rng.randint(10, 60)
+        entries.append({
+            "name": f"player{i % 17}",
+            "correct": rng.randint(0, total),
+            "total": total,
+            "difficulty": rng.choice(["easy", "difficult"]),
+        })
+    return entries
+
+
+def test_sqlite_matches_json():
+    with tempfile.TemporaryDirectory() as tmp:
+        json_store = JsonLeaderboardStore(os.path.join(tmp, "leaderboard.json"))
+        sqlite_store = SqliteLeaderboardStore(os.path.join(tmp, "leaderboard.db"), json_path=None)
+        for entry in random_entries(300):
+            json_store.add_entry(entry)
+            sqlite_store.add_entry(entry)
+
+        for difficulty in ("easy", "difficult", "unknown"):
+            assert sqlite_store.top(difficulty) == json_store.top(difficulty)
+        assert sqlite_store.stats() == json_store.stats()
+        assert sqlite_store.load() == json_store.load()
+
+        json_store.clear("easy")
+        sqlite_store.clear("easy")
+        assert sqlite_store.load() == json_store.load()
+        assert "easy" not in sqlite_store.stats()
+
+
+def test_migrates_json_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "leaderboard.json")
+        db_path = os.path.join(tmp, "leaderboard.db")
+        entries = random_entries(25, seed=2)
+        # Old files may have entries without a difficulty
+        del entries[0]["difficulty"]
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+
+        store = SqliteLeaderboardStore(db_path, json_path)
+        assert len(store.load()) == 25
+        assert store.load()[0]["difficulty"] == "easy"
+
+        # Reopening must not import the file a second time
+        store = SqliteLeaderboardStore(db_path, json_path)
+        assert len(store.load()) == 25
+
+
+def test_json_cache_tracks_writes():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "leaderboard.json")
+        store = JsonLeaderboardStore(path)
+        entries = random_entries(200, seed=3)
+        for entry in entries[:100]:
+            store.add_entry(entry)
+        # Prime the cached top 10, then keep adding: it is updated in place
+        store.top("easy")
+        for entry in entries[100:]:
+            store.add_entry(entry)
+        assert store.top("easy") == JsonLeaderboardStore(path).top("easy")
+
+        # A write from another process (another store on the same file) is picked up
+        other = JsonLeaderboardStore(path)
+        other.add_entry({"name": "late", "correct": 100, "total": 100, "difficulty": "easy"})
+        assert store.top("easy")[0]["name"] == "late"
+        assert len(store.load()) == 201
+
+
+def test_json_changes_are_incremental():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "leaderboard.json")
+        store, writer = JsonLeaderboardStore(path), JsonLeaderboardStore(path)
+        entries = random_entries(6, seed=2)
+        store.add_entry(entries[0])
+        cursor, changed, reset = store.changes()
+        assert reset and changed == entries[:1]
+
+        # Appends, here or by another worker, come back on their own
+        store.add_entry(entries[1])
+        cursor, changed, reset = store.changes(cursor)
+        assert not reset and changed == entries[1:2]
+        writer.add_entry(entries[2])
+        writer.add_entry(entries[3])
+        cursor, changed, reset = store.changes(cursor)
+        assert not reset and changed == entries[2:4]
+        assert store.changes(cursor) == (cursor, [], False)
+
+        # Rewritten with the same entries: still nothing new
+        writer.clear("expert")
+        assert store.changes(cursor) == (cursor, [], False)
+
+        # A clear that drops entries: start over
+        difficulty = entries[0]["difficulty"]
+        writer.clear(difficulty)
+        cursor, changed, reset = store.changes(cursor)
+        assert reset and changed == [entry for entry in entries[:4] if entry["difficulty"] != difficulty]
+        store.clear()
+        assert store.changes(cursor)[1:] == ([], True)
+
+
+def test_stats_counters_follow_writes():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "leaderboard.db")
+        json_store = JsonLeaderboardStore(os.path.join(tmp, "leaderboard.json"))
+        sqlite_store = SqliteLeaderboardStore(db_path, json_path=None)
+        entries = random_entries(200, seed=5)
+        for entry in entries[:50]:
+            entry["difficulty"] = "expert"
+        for entry in entries:
+            json_store.add_entry(entry)
+            sqlite_store.add_entry(entry)
+
+        def recount(store):
+            counts = {}
+            for entry in store.load():
+                difficulty_counts = counts.setdefault(entry["difficulty"], {"entries": 0, "qualified": 0})
+                difficulty_counts["entries"] += 1
+                difficulty_counts["qualified"] += entry["total"] >= 20
+            return counts
+
+        for store in json_store, sqlite_store:
+            assert store.stats() == recount(store)
+            assert store.stats()["expert"]["entries"] == 50
+            store.clear("expert")
+            assert "expert" not in store.stats()
+            assert store.stats() == recount(store)
+
+        # Rebuilt when the database is opened again, then kept current by
+        # the triggers for writers in any process
+        other = SqliteLeaderboardStore(db_path, json_path=None)
+        assert other.stats() == sqlite_store.stats()
+        other.add_entry({"name": "x", "correct": 30, "total": 40, "difficulty": "easy"})
+        assert sqlite_store.stats() == recount(sqlite_store)
+        other.clear()
+        assert sqlite_store.stats() == {}
+
+
+def test_admin_stats_ignore_client_difficulties(monkeypatch):
+    import app as app_module
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SqliteLeaderboardStore(os.path.join(tmp, "leaderboard.db"), json_path=None)
+        monkeypatch.setattr(app_module, "_leaderboard_store", store)
+        client = app_module.app.test_client()
+        for difficulty in ("total", "x" * 40):
+            response = client.post("/update_leaderboard", json={"name": "eve", "correct": 20, "total": 20, "difficulty": difficulty})
+            assert response.status_code == 400
+        client.post("/update_leaderboard", json={"name": "ann", "correct": 15, "total": 20, "difficulty": "easy"})
+        # A difficulty written before the check doesn't get keys of its own
+        store.add_entry({"name": "old", "correct": 5, "total": 20, "difficulty": "total"})
+
+        stats = client.get("/admin/get_stats").get_json()
+        assert stats["total_entries"] == 2 and stats["easy_entries"] == 1
+        assert set(stats) == {"total_entries", "easy_entries", "easy_qualified",
+                              "difficult_entries", "difficult_qualified", "difficulties"}
+        assert stats["difficulties"]["total"]["entries"] == 1
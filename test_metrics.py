@@ -0,0 +1,56 @@
+# Tests for the in-process metrics in metrics.py and /admin/metrics.
+# Run with: python -m pytest test_metrics.py
+
+from metrics import Histogram, Metrics
+
+
+def test_histogram_quantiles():
+    histogram = Histogram(bounds=(1, 10, 100))
+    for value in [0.5] * 50 + [5] * 40 + [50] * 9 + [500]:
+        histogram.observe(value)
+    assert histogram.count == 100
+    assert histogram.quantile(0.5) == 1
+    assert histogram.quantile(0.9) == 10
+    assert histogram.quantile(0.99) == 100
+    assert histogram.quantile(1.0) == 500
+    assert histogram.cumulative()[-1] == ('+Inf', 100)
+
+
+def test_counters_and_prometheus_text():
+    registry = Metrics()
+    registry.inc('requests_total', route='/a')
+    registry.inc('requests_total', 2, route='/a')
+    registry.observe('latency_ms', 3, route='/a')
+    assert registry.counter('requests_total', route='/a') == 3
+    snapshot = registry.snapshot()
+    assert snapshot['counters'] == {'requests_total{route="/a"}': 3}
+    assert snapshot['histograms']['latency_ms{route="/a"}']['count'] == 1
+
+    text = registry.prometheus_text({'cache_size': 7})
+    assert '# TYPE requests_total counter' in text
+    assert 'latency_ms_bucket{route="/a",le="5"} 1' in text
+    assert 'latency_ms_count{route="/a"} 1' in text
+    assert 'cache_size 7' in text
+
+
+def test_admin_metrics_route():
+    from app import app
+    from metrics import metrics
+
+    client = app.test_client()
+    before = metrics.counter('evaluator_calls_total')
+    client.post('/reveal_winner', json={
+        'players': [{'cards': ['Ah', 'Kh', '2c', '3d']}, {'cards': ['Qs', 'Qd', '7c', '8c']}],
+        'first_flop': ['Th', 'Jh', '4s'],
+        'second_flop': ['9c', '9d', '5h', '6h'],
+    })
+    assert metrics.counter('evaluator_calls_total') > before
+
+    data = client.get('/admin/metrics').get_json()
+    assert data['counters']['http_requests_total{method="POST",route="/reveal_winner",status="200"}'] >= 1
+    assert 'http_request_duration_ms{method="POST",route="/reveal_winner"}' in data['histograms']
+    assert 'hits' in data['best_hand_cache']
+
+    text = client.get('/admin/metrics?format=prometheus').get_data(as_text=True)
+    assert 'http_request_duration_ms_bucket' in text
+    assert 'best_hand_cache_hits' in text
@@ -0,0 +1,106 @@
+# Tests for the per-player leaderboard index in player_index.py.
+# Run with: python -m pytest test_player_index.py
+
+import os
+import tempfile
+
+import app as app_module
+from app import app
+from leaderboard_store import MIN_TOTAL, JsonLeaderboardStore, SqliteLeaderboardStore
+from player_index import PlayerIndex
+from test_leaderboard_store import random_entries
+
+
+def brute_force(entries, difficulty):
+    # Best qualifying run per name, ranked like the index: accuracy, total, first seen
+    best = {}
+    for seq, entry in enumerate(entries):
+        if entry["difficulty"] != difficulty or entry["total"] < MIN_TOTAL:
+            continue
+        key = (-entry["correct"] / entry["total"], -entry["total"], seq)
+        if entry["name"] not in best or key < best[entry["name"]]:
+            best[entry["name"]] = key
+    return sorted(best, key=best.get)
+
+
+def test_ranks_match_brute_force():
+    entries = random_entries(500, seed=3)
+    index = PlayerIndex()
+    for entry in entries:
+        index.add(entry)
+
+    for difficulty in ("easy", "difficult"):
+        expected = brute_force(entries, difficulty)
+        players, count = index.page(difficulty, 1, 100)
+        assert count == len(expected)
+        assert [player["name"] for player in players] == expected
+        for rank, name in enumerate(expected, 1):
+            assert index.rank(name, difficulty) == rank
+
+        runs = [entry for entry in entries if entry["name"] == expected[0] and entry["difficulty"] == difficulty]
+        top = index.player(expected[0], difficulty)
+        assert top["runs"] == len(runs)
+        assert top["lifetime_total"] == sum(entry["total"] for entry in runs)
+
+        page_two, _ = index.page(difficulty, 2, 5)
+        assert [player["name"] for player in page_two] == expected[5:10]
+        around, me = index.around(expected[7], difficulty, radius=2)
+        assert [player["name"] for player in around] == expected[5:10]
+        assert me["rank"] == 8
+        around, _ = index.around(expected[0], difficulty, radius=2)
+        assert [player["rank"] for player in around] == [1, 2, 3]
+
+
+def test_unqualified_players_are_not_ranked():
+    index = PlayerIndex()
+    index.add({"name": "short", "correct": 5, "total": MIN_TOTAL - 1, "difficulty": "easy"})
+    assert index.rank("short", "easy") is None
+    assert index.player("short", "easy")["runs"] == 1
+    assert index.around("short", "easy") == ([], None)
+    assert index.player("nobody", "easy") is None
+
+
+def test_sync_follows_other_writers():
+    with tempfile.TemporaryDirectory() as tmp:
+        for make_store in (
+            lambda: SqliteLeaderboardStore(os.path.join(tmp, "leaderboard.db"), json_path=None),
+            lambda: JsonLeaderboardStore(os.path.join(tmp, "leaderboard.json")),
+        ):
+            store, writer = make_store(), make_store()
+            entries = random_entries(200, seed=4)
+            index = PlayerIndex()
+            for entry in entries[:100]:
+                writer.add_entry(entry)
+            index.sync(store)
+            for entry in entries[100:]:
+                writer.add_entry(entry)
+            index.sync(store)
+            for difficulty in ("easy", "difficult"):
+                players, _ = index.page(difficulty, 1, 100)
+                assert [player["name"] for player in players] == brute_force(entries, difficulty)
+
+            writer.clear("easy")
+            index.sync(store)
+            assert index.page("easy")[1] == 0
+            assert index.page("difficult")[1] == len(brute_force(entries, "difficult"))
+
+
+def test_routes(monkeypatch):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SqliteLeaderboardStore(os.path.join(tmp, "leaderboard.db"), json_path=None)
+        monkeypatch.setattr(app_module, '_leaderboard_store', store)
+        monkeypatch.setattr(app_module, '_player_index', PlayerIndex())
+        client = app.test_client()
+        for name, correct in ("ann", 18), ("bob", 15), ("ann", 12), ("cat", 19):
+            client.post('/update_leaderboard', json={"name": name, "correct": correct, "total": 20, "difficulty": "easy"})
+
+        body = client.get('/leaderboard/players?difficulty=easy&per_page=2').get_json()
+        assert body["ranked_players"] == 3
+        assert [(player["name"], player["rank"]) for player in body["players"]] == [("cat", 1), ("ann", 2)]
+        assert body["players"][1]["runs"] == 2
+
+        body = client.get('/leaderboard/rank?name=bob&difficulty=easy&radius=1').get_json()
+        assert body["player"]["rank"] == 3
+        assert [player["name"] for player in body["around"]] == ["ann", "bob"]
+        assert client.get('/leaderboard/rank?name=nobody').status_code == 404
+        assert client.get('/leaderboard/players?page=x').status_code == 400
@@ -24,7 +24,7 @@ def test_determine_winner():
                 {'cards': [{'rank': 'A', 'suit': '♦'}, {'rank': 'K', 'suit': '♠'}]},
             ],
             [{'rank': 'Q', 'suit': '♥'}, {'rank': '2', 'suit': '♣'}, {'rank': '3', 'suit': '♠'}, {'rank': 'A', 'suit': '♥'}, {'rank': 'K', 'suit': '♦'}],
-            1,  # Player 2 wins (better kicker)
+            -1,  # Both make Aces & Kings with a Q kicker: split pot
             "Two pair, Aces & Kings, Q kicker"
         ),
         # Trips
@@ -129,6 +129,42 @@ def test_determine_winner():
         else:
             print(f"Passed: {desc}")
 
+def test_determine_winners_batch():
+    from app import best_hand_cache, determine_winners_batch
+
+    deals = [
+        # Player 2 has three Queens on the first board, Player 1 the wheel on the second
+        {
+            'players': [
+                {'cards': [{'rank': 'A', 'suit': '♠'}, {'rank': '2', 'suit': '♣'}]},
+                {'cards': [{'rank': 'Q', 'suit': '♣'}, {'rank': 'Q', 'suit': '♦'}]},
+            ],
+            'boards': [
+                [{'rank': 'Q', 'suit': '♥'}, {'rank': '9', 'suit': '♣'}, {'rank': '4', 'suit': '♠'}],
+                [{'rank': '3', 'suit': '♥'}, {'rank': '4', 'suit': '♦'}, {'rank': '5', 'suit': '♥'}, {'rank': 'K', 'suit': '♠'}],
+            ],
+        },
+        # Bad deal: reported in place, the rest of the batch still runs
+        {'players': [{'cards': [{'rank': 'Z', 'suit': '♠'}]}], 'boards': [[]]},
+        # Old-style first_flop / second_flop keys work too
+        {
+            'players': [
+                {'cards': [{'rank': 'K', 'suit': '♠'}, {'rank': 'K', 'suit': '♣'}]},
+                {'cards': [{'rank': '7', 'suit': '♠'}, {'rank': '2', 'suit': '♦'}]},
+            ],
+            'first_flop': [{'rank': 'K', 'suit': '♥'}, {'rank': '9', 'suit': '♣'}, {'rank': '4', 'suit': '♠'}],
+        },
+    ]
+    best_hand_cache.clear()
+    results = determine_winners_batch(deals)
+    assert best_hand_cache.stats()['size'] == 0
+    assert len(results) == 3
+    assert [board['winner'] for board in results[0]['boards']] == ["Player 2", "Player 1"]
+    assert results[0]['boards'][0]['hand_type'] == "Three of a Kind"
+    assert 'error' in results[1]
+    assert results[2]['boards'][0]['winner'] == "Player 1"
+
 if __name__ == "__main__":
     test_determine_winner()
+    test_determine_winners_batch()
     print("All tests completed.")
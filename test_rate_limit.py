@@ -0,0 +1,101 @@
+# Tests for the token-bucket rate limiter in rate_limit.py.
+# Run with: python -m pytest test_rate_limit.py
+
+import pytest
+
+import app as app_module
+import asgi
+from app import app
+from leaderboard_store import SqliteLeaderboardStore
+from rate_limit import RateLimiter, client_key, create_rate_limiter, parse_limits, retry_after_header
+from test_asgi import call
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_refills_at_rate():
+    clock = Clock()
+    limiter = RateLimiter({'/equity': (3, 6)}, clock=clock)
+    assert [limiter.check('/equity', 'a') for _ in range(3)] == [0, 0, 0]
+    # One token every 2 seconds
+    assert limiter.check('/equity', 'a') == pytest.approx(2)
+    assert limiter.check('/equity', 'b') == 0
+    assert limiter.check('/start_game', 'a') == 0
+    clock.now += 1
+    assert limiter.check('/equity', 'a') == pytest.approx(1)
+    clock.now += 1
+    assert limiter.check('/equity', 'a') == 0
+    # Never more than the burst, however long it was left alone
+    clock.now += 3600
+    assert [limiter.check('/equity', 'a') for _ in range(4)][-1] > 0
+    assert limiter.stats()['limited'] == 3
+
+
+def test_bucket_table_is_bounded():
+    clock = Clock()
+    limiter = RateLimiter({'/equity': (1, 60)}, max_buckets=100, idle_seconds=120, clock=clock)
+    for client in range(1000):
+        limiter.check('/equity', str(client))
+    assert limiter.stats()['buckets'] == 100
+    assert limiter.check('/equity', '999') > 0
+
+    # Idle buckets go as soon as new ones come in
+    clock.now += 121
+    limiter.check('/equity', 'new')
+    assert limiter.stats()['buckets'] == 1
+
+
+def test_parse_limits_and_clients():
+    limits = parse_limits('on, /equity=5/10, /drills=off, /custom=3')
+    assert limits['/equity'] == (5, 10) and limits['/custom'] == (3, 1)
+    assert '/drills' not in limits and '/update_leaderboard' in limits
+    assert parse_limits('/custom=3') == {'/custom': (3, 1)}
+    assert parse_limits(None) == {} and parse_limits('off') == {}
+    with pytest.raises(ValueError):
+        parse_limits('/equity=fast')
+    assert retry_after_header(0.2) == '1' and retry_after_header(2.5) == '3'
+    assert client_key('10.0.0.1', '1.2.3.4, 5.6.7.8') == '10.0.0.1'
+    assert client_key('10.0.0.1', '1.2.3.4, 5.6.7.8', trust_proxy=True) == '5.6.7.8'
+    assert client_key('10.0.0.1', '1.2.3.4:50123', trust_proxy=True) == '1.2.3.4'
+    assert client_key('10.0.0.1', '[2001:db8::1]:50123', trust_proxy=True) == '2001:db8::1'
+    assert client_key('10.0.0.1', '2001:db8::1', trust_proxy=True) == '2001:db8::1'
+
+
+def test_limits_opt_in_and_app_service_proxy(monkeypatch):
+    for name in ('RATE_LIMITS', 'RATE_LIMIT_TRUST_PROXY', 'WEBSITE_SITE_NAME'):
+        monkeypatch.delenv(name, raising=False)
+    limiter = create_rate_limiter()
+    assert not limiter.enabled and not limiter.trust_proxy
+    monkeypatch.setenv('RATE_LIMITS', 'on')
+    monkeypatch.setenv('WEBSITE_SITE_NAME', 'flop-trainer')
+    limiter = create_rate_limiter()
+    assert limiter.enabled and limiter.trust_proxy
+    monkeypatch.setenv('RATE_LIMIT_TRUST_PROXY', '0')
+    assert not create_rate_limiter().trust_proxy
+
+
+def test_routes_answer_429(monkeypatch, tmp_path):
+    # /leaderboard reads a throwaway store, not the one in the working tree
+    store = SqliteLeaderboardStore(str(tmp_path / 'leaderboard.db'), json_path=None)
+    monkeypatch.setattr(app_module, '_leaderboard_store', store)
+    limiter = RateLimiter({'/reveal_winner': (2, 60), '/equity': (2, 60)})
+    monkeypatch.setattr(app_module, 'rate_limiter', limiter)
+    monkeypatch.setattr(asgi, 'rate_limiter', limiter)
+
+    client = app.test_client()
+    statuses = [client.post('/reveal_winner', json={'players': []}).status_code for _ in range(3)]
+    assert statuses == [400, 400, 429]
+    response = client.post('/reveal_winner', json={'players': []})
+    assert response.status_code == 429 and int(response.headers['Retry-After']) >= 1
+    assert client.get('/leaderboard').status_code == 200
+
+    statuses = [call('POST', '/equity', {})[0] for _ in range(3)]
+    assert statuses[:2] != [429, 429] and statuses[2] == 429
+    status, headers, body = call('POST', '/equity', {})
+    assert status == 429 and int(headers[b'retry-after']) >= 1
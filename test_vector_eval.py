@@ -0,0 +1,69 @@
+# Tests for the NumPy batch evaluator in vector_eval.py.
+# Run with: python -m pytest test_vector_eval.py
+
+import random
+from itertools import combinations, combinations_with_replacement
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from cards import make_card
+from equity import estimate_equity
+from hand_evaluator import NUM_CLASSES, best_hand, evaluate5
+from vector_eval import best_hands_batch, best_hands_table, evaluate5_batch
+
+
+def test_every_class_matches_evaluate5():
+    hands = []
+    # Every rank multiset off-suit, every five distinct ranks suited: all 7,462 classes
+    for ranks in combinations_with_replacement(range(13), 5):
+        if len(set(ranks)) > 1:
+            hands.append([make_card(rank, index % 4) for index, rank in enumerate(ranks)])
+    for ranks in combinations(range(13), 5):
+        hands.append([make_card(rank, 2) for rank in ranks])
+    strengths = evaluate5_batch(np.array(hands)).tolist()
+    assert strengths == [evaluate5(*hand) for hand in hands]
+    assert len(set(strengths)) == NUM_CLASSES
+
+    rng = random.Random(7)
+    hands = [rng.sample(range(52), 5) for _ in range(20000)]
+    assert evaluate5_batch(np.array(hands)).tolist() == [evaluate5(*hand) for hand in hands]
+
+
+@pytest.mark.parametrize('board_size', [3, 4, 5])
+def test_best_hands_match_best_hand(board_size):
+    rng = random.Random(board_size)
+    rows = [rng.sample(range(52), 4 + board_size) for _ in range(3000)]
+    holes = [row[:4] for row in rows]
+    boards = [row[4:] for row in rows]
+    strengths, fives = best_hands_batch(np.array(holes), np.array(boards))
+    for hole, board, strength, five in zip(holes, boards, strengths.tolist(), fives.tolist()):
+        assert strength == best_hand(hole, board)[0]
+        # Exactly two hole cards and three board cards, and it is that strong
+        assert len(set(five[:2]) & set(hole)) == 2 and len(set(five[2:]) & set(board)) == 3
+        assert evaluate5(*five) == strength
+
+
+def test_table_covers_every_hand_and_board():
+    rng = random.Random(3)
+    cards = rng.sample(range(52), 6 * 4 + 2 * 5)
+    hands = [cards[i * 4:i * 4 + 4] for i in range(6)]
+    boards = [cards[24:29], cards[29:34]]
+    strengths, fives = best_hands_table(hands, boards)
+    assert strengths.shape == (2, 6) and fives.shape == (2, 6, 5)
+    assert strengths.tolist() == [[best_hand(hand, board)[0] for hand in hands] for board in boards]
+
+
+def test_vectorized_equity_matches_scalar():
+    rng = random.Random(11)
+    cards = rng.sample(range(52), 3 * 4 + 6)
+    hands = [cards[0:4], cards[4:8], cards[8:12]]
+    boards = [cards[12:15], cards[15:18]]
+    options = dict(target_error=0.01, time_budget_ms=60000, max_samples=2000)
+    vector = estimate_equity(hands, boards, rng=random.Random(1), vectorized=True, **options)
+    scalar = estimate_equity(hands, boards, rng=random.Random(1), vectorized=False, **options)
+    assert vector['samples'] == scalar['samples'] and vector['boards'] == scalar['boards']
+
+    river = [boards[0] + [card for card in range(52) if card not in cards][:1]]
+    assert estimate_equity(hands, river, vectorized=True)['boards'] == estimate_equity(hands, river, vectorized=False)['boards']
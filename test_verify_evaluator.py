@@ -0,0 +1,24 @@
+# Quick in-process run of the checks in verify_evaluator.py (the full
+# enumeration is left to the script itself).
+# Run with: python -m pytest test_verify_evaluator.py
+
+from verify_evaluator import IMPLEMENTATIONS, _compare_chunk, _count_chunk, check_edge_cases
+
+
+def test_edge_cases_agree():
+    assert check_edge_cases(list(IMPLEMENTATIONS))
+
+
+def test_random_pairs_agree():
+    total, known, disagreements, examples = _compare_chunk((list(IMPLEMENTATIONS), 'test', 3000, 5))
+    assert total > 2000
+    assert disagreements == 0, examples
+
+
+def test_enumeration_chunk_counts_match():
+    # Hands whose lowest card is K♦ (card 45): it plus four of K♣ K♠ and the aces
+    counts = {}
+    for name in IMPLEMENTATIONS:
+        counts[name] = _count_chunk((name, 45))[1]
+    assert counts['lookup'] == counts['legacy'] == counts['reference']
+    assert sum(counts['lookup'].values()) == 15
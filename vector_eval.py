@@ -0,0 +1,142 @@
+# Vectorized hand evaluation with NumPy, for bulk work (equity runouts, batch
+# scoring) where calling evaluate5() or best_hand() once per hand in Python
+# is the whole cost.
+#
+# Flushes use hand_evaluator's FLUSH[rank_bits] table as an array. Every
+# other hand only depends on its ranks, and each rank has a weight chosen so
+# that the five weights of any rank multiset add up to a different sum: that
+# sum indexes one flat table holding what UNIQUE5 and PAIRED would give. The
+# key is additive, so for best hands it is built from a hole pair's key plus
+# a board triple's key, broadcast over every pair and triple at once.
+#
+# evaluate5_batch() returns exactly evaluate5()'s strengths, N hands per
+# call; best_hands_batch() does the "2 hole + 3 board" search for many
+# (hand, board) rows together.
+#
+# NumPy is optional: without it AVAILABLE is False and callers stay on the
+# scalar evaluator.
+
+from itertools import combinations, combinations_with_replacement
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from cards import NUM_CARDS
+from hand_evaluator import FLUSH_TABLE, UNIQUE5_TABLE, PAIRED_TABLE, PRIMES
+
+AVAILABLE = np is not None
+
+# Found greedily, each the smallest weight that keeps every five card rank
+# multiset's sum distinct; the largest sum is 360,918
+RANK_WEIGHTS = (0, 1, 5, 22, 94, 312, 992, 2422, 5624, 12522, 19998, 43258, 79415)
+
+_tables = None
+# (hole size, board size) -> (hole pair indices, board triple indices)
+_combos = {}
+
+
+def _rank_sum_table():
+    # The largest sum is four aces and a king
+    table = np.zeros(RANK_WEIGHTS[12] * 4 + RANK_WEIGHTS[11] + 1, dtype=np.int16)
+    filled = np.zeros(len(table), dtype=bool)
+    for ranks in combinations_with_replacement(range(13), 5):
+        if len(set(ranks)) == 1:
+            continue
+        key = sum(RANK_WEIGHTS[rank] for rank in ranks)
+        if filled[key]:
+            raise RuntimeError("RANK_WEIGHTS don't give every rank multiset its own sum")
+        filled[key] = True
+        if len(set(ranks)) == 5:
+            table[key] = UNIQUE5_TABLE[sum(1 << rank for rank in ranks)]
+        else:
+            product = 1
+            for rank in ranks:
+                product *= PRIMES[rank]
+            table[key] = PAIRED_TABLE[product]
+    return table
+
+
+def _get_tables():
+    # Built on first use; a race only builds the same arrays twice
+    global _tables
+    if _tables is None:
+        _tables = (
+            np.array(FLUSH_TABLE, dtype=np.int16),
+            _rank_sum_table(),
+            np.array([RANK_WEIGHTS[card >> 2] for card in range(NUM_CARDS)], dtype=np.int32),
+            np.array([1 << (card >> 2) for card in range(NUM_CARDS)], dtype=np.int32),
+        )
+    return _tables
+
+
+def evaluate5_batch(cards):
+    # cards: (N, 5) int cards -> (N,) strengths, the same as evaluate5()
+    cards = np.asarray(cards, dtype=np.intp)
+    flush_table, rank_table, card_weights, card_bits = _get_tables()
+    c0, c1, c2, c3, c4 = cards.T
+    strengths = rank_table[card_weights[c0] + card_weights[c1] + card_weights[c2] + card_weights[c3] + card_weights[c4]]
+
+    suit = c0 & 3
+    flush = np.flatnonzero(((c1 & 3) == suit) & ((c2 & 3) == suit) & ((c3 & 3) == suit) & ((c4 & 3) == suit))
+    if len(flush):
+        rows = cards[flush]
+        strengths[flush] = flush_table[np.bitwise_or.reduce(card_bits[rows], axis=1)]
+    return strengths
+
+
+def _combinations(hole_size, board_size):
+    key = (hole_size, board_size)
+    if key not in _combos:
+        _combos[key] = (
+            np.array(list(combinations(range(hole_size), 2)), dtype=np.intp),
+            np.array(list(combinations(range(board_size), 3)), dtype=np.intp),
+        )
+    return _combos[key]
+
+
+def best_hands_batch(holes, boards):
+    # holes: (N, 4) hole cards, boards: (N, 3..5) board cards, one (hand, board)
+    # per row. Returns ((N,) best strengths, (N, 5) best five cards) using
+    # exactly 2 hole cards and 3 board cards, like best_hand() for every row.
+    # Where several fives are equally strong the one picked may differ from
+    # best_hand()'s, the strength never does.
+    holes = np.asarray(holes, dtype=np.intp)
+    boards = np.asarray(boards, dtype=np.intp)
+    flush_table, rank_table, card_weights, card_bits = _get_tables()
+    pairs, triples = _combinations(holes.shape[1], boards.shape[1])
+
+    # Per hole pair (N, pairs) and per board triple (N, triples): rank key,
+    # rank bits and the suit if all of its cards share one (else -1 / -2)
+    a, b = holes[:, pairs[:, 0]], holes[:, pairs[:, 1]]
+    pair_key = card_weights[a] + card_weights[b]
+    pair_suit = np.where((a & 3) == (b & 3), a & 3, -1)
+    c, d, e = boards[:, triples[:, 0]], boards[:, triples[:, 1]], boards[:, triples[:, 2]]
+    triple_key = card_weights[c] + card_weights[d] + card_weights[e]
+    triple_suit = np.where(((c & 3) == (d & 3)) & ((c & 3) == (e & 3)), c & 3, -2)
+
+    # (N, pairs, triples): every pair against every triple
+    strengths = rank_table[pair_key[:, :, None] + triple_key[:, None, :]]
+    flush = np.nonzero(pair_suit[:, :, None] == triple_suit[:, None, :])
+    if len(flush[0]):
+        rows, pair, triple = flush
+        bits = card_bits[a[rows, pair]] | card_bits[b[rows, pair]]
+        bits |= card_bits[c[rows, triple]] | card_bits[d[rows, triple]] | card_bits[e[rows, triple]]
+        strengths[flush] = flush_table[bits]
+
+    strengths = strengths.reshape(len(holes), -1)
+    best = strengths.argmax(axis=1)
+    index = np.arange(len(holes))
+    pair, triple = np.divmod(best, len(triples))
+    fives = np.concatenate([holes[index[:, None], pairs[pair]], boards[index[:, None], triples[triple]]], axis=1)
+    return strengths[index, best], fives
+
+
+def best_hands_table(hands, boards):
+    # Every hand on every board: hands (P, 4), boards (B, 3..5) ->
+    # ((B, P) strengths, (B, P, 5) best fives)
+    hands = np.asarray(hands, dtype=np.intp)
+    boards = np.asarray(boards, dtype=np.intp)
+    strengths, fives = best_hands_batch(np.tile(hands, (len(boards), 1)), np.repeat(boards, len(hands), axis=0))
+    return strengths.reshape(len(boards), len(hands)), fives.reshape(len(boards), len(hands), 5)
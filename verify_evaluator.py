@@ -0,0 +1,443 @@
+# Exhaustive differential check of the five card evaluators.
+#
+#   python verify_evaluator.py                        full run on every CPU
+#   python verify_evaluator.py --pairs 1000000 --processes 8
+#   python verify_evaluator.py --implementations lookup,reference --skip-frequencies
+#
+# Three implementations are compared:
+#   lookup     hand_evaluator.evaluate5, the table evaluator the app uses
+#   legacy     the original dict based evaluate_hand/compare_hands from app.py,
+#              ported to int cards (its suit tiebreak is left out: suits never
+#              decide a poker hand, so it would only report "differences" on
+#              hands that are really split pots). Its one real defect, 10-high
+#              straights and flushes losing to lower ones, is reported as a
+#              known defect rather than a failure.
+#   reference  a short rank-count implementation written to be obviously right
+#
+# Every implementation is run over all 2,598,960 hands and its category counts
+# are checked against the known distribution. Then the orderings are compared
+# pair by pair on randomized hands and on hand-picked edge cases (wheels, two
+# pair kickers, split pots, ...). The work is spread over a process pool and
+# each implementation's throughput is reported. Exits 1 on any mismatch.
+
+import argparse
+import os
+import random
+import sys
+import time
+from collections import Counter
+from itertools import combinations
+from multiprocessing import Pool
+
+from cards import NUM_CARDS, RANKS, decode_cards, encode_cards, format_cards
+from hand_evaluator import (
+    evaluate5, hand_category, NUM_CLASSES,
+    HIGH_CARD, ONE_PAIR, TWO_PAIR, THREE_OF_A_KIND, STRAIGHT, FLUSH,
+    FULL_HOUSE, FOUR_OF_A_KIND, STRAIGHT_FLUSH, ROYAL_FLUSH, CATEGORY_NAMES,
+)
+
+TOTAL_HANDS = 2598960
+
+# The number of distinct five card hands in each category
+EXPECTED_FREQUENCIES = {
+    ROYAL_FLUSH: 4,
+    STRAIGHT_FLUSH: 36,
+    FOUR_OF_A_KIND: 624,
+    FULL_HOUSE: 3744,
+    FLUSH: 5108,
+    STRAIGHT: 10200,
+    THREE_OF_A_KIND: 54912,
+    TWO_PAIR: 123552,
+    ONE_PAIR: 1098240,
+    HIGH_CARD: 1302540,
+}
+
+
+# --- lookup: the table evaluator ---
+
+def lookup_evaluate(cards):
+    return evaluate5(*cards)
+
+
+def lookup_category(value):
+    return hand_category(value)
+
+
+def lookup_compare(first, second):
+    return (first > second) - (first < second)
+
+
+# --- legacy: the original evaluator, ported to int cards ---
+
+_LEGACY_RANK_ORDER = RANKS
+
+
+def legacy_evaluate(cards):
+    # Returns (category, tiebreakers, sorted_cards) exactly like the original:
+    # tiebreakers is the hand_type string for most categories and a list of
+    # rank names for one pair and two pair
+    cards = decode_cards(cards)
+    suits = [card['suit'] for card in cards]
+    ranks = [card['rank'] for card in cards]
+    rank_order = _LEGACY_RANK_ORDER
+    rank_counts = {rank: ranks.count(rank) for rank in ranks}
+    unique_suits = set(suits)
+
+    def card_sort_key(card):
+        return rank_order.index(card['rank'])
+
+    rank_indices = sorted([rank_order.index(rank) for rank in ranks])
+    is_straight = False
+    straight_high = None
+    if len(set(rank_indices)) == 5 and rank_indices[-1] - rank_indices[0] == 4:
+        is_straight = True
+        straight_high = rank_order[rank_indices[-1]]
+    elif set(rank_indices) == {0, 1, 2, 3, 12}:
+        is_straight = True
+        straight_high = '5'
+
+    is_flush = len(unique_suits) == 1
+
+    if is_straight and is_flush:
+        if straight_high == 'A' and set(ranks) == {'10', 'J', 'Q', 'K', 'A'}:
+            return (9, "Royal Flush", sorted(cards, key=card_sort_key, reverse=True))
+        return (8, f"Straight Flush, {straight_high} high", sorted(cards, key=card_sort_key, reverse=True))
+
+    if 4 in rank_counts.values():
+        return (7, "Four of a Kind", sorted(cards, key=lambda card: (rank_counts[card['rank']], card_sort_key(card)), reverse=True))
+
+    if 3 in rank_counts.values() and 2 in rank_counts.values():
+        return (6, "Full House", sorted(cards, key=lambda card: (rank_counts[card['rank']], card_sort_key(card)), reverse=True))
+
+    if is_flush:
+        sorted_flush_cards = sorted(cards, key=card_sort_key, reverse=True)
+        high_card = sorted_flush_cards[0]['rank']
+        high_card_readable = {'A': 'Ace', 'K': 'King', 'Q': 'Queen', 'J': 'Jack'}.get(high_card, high_card)
+        return (5, f"{high_card_readable}-high Flush", sorted_flush_cards)
+
+    if is_straight:
+        return (4, f"Straight, {straight_high}", sorted(cards, key=card_sort_key, reverse=True))
+
+    if 3 in rank_counts.values():
+        return (3, "Three of a Kind", sorted(cards, key=lambda card: (rank_counts[card['rank']], card_sort_key(card)), reverse=True))
+
+    if list(rank_counts.values()).count(2) == 2:
+        pairs = sorted([rank for rank, count in rank_counts.items() if count == 2], key=rank_order.index, reverse=True)
+        kicker = sorted([rank for rank, count in rank_counts.items() if count == 1], key=rank_order.index, reverse=True)[0]
+        return (2, [pairs[0], pairs[1], kicker], sorted(cards, key=card_sort_key, reverse=True))
+
+    if 2 in rank_counts.values():
+        pair_rank = max([rank for rank, count in rank_counts.items() if count == 2], key=lambda r: rank_order.index(r))
+        kickers = sorted([rank for rank, count in rank_counts.items() if count == 1], key=rank_order.index, reverse=True)[:3]
+        sorted_cards = (
+            [card for card in cards if card['rank'] == pair_rank] +
+            sorted([card for card in cards if card['rank'] != pair_rank], key=card_sort_key, reverse=True)
+        )
+        return (1, [pair_rank] + kickers, sorted_cards)
+
+    return (0, "High Card", sorted(cards, key=card_sort_key, reverse=True))
+
+
+def legacy_known_defect(first, second):
+    # The original compared hand_type strings character by character and '1'
+    # isn't a rank, so "Straight, 10", "Straight Flush, 10 high" and
+    # "10-high Flush" rank below the same hands with a 5-9 high card. Pairs
+    # that hinge on that are reported separately instead of as failures.
+    return (
+        first[0] == second[0]
+        and first[0] in (4, 5, 8)
+        and ('10' in first[1]) != ('10' in second[1])
+    )
+
+
+def legacy_category(value):
+    return value[0]
+
+
+def legacy_compare(hand1, hand2):
+    # The original compare_hands without the suit comparisons
+    rank_order = _LEGACY_RANK_ORDER
+
+    def safe_index(val):
+        if val in rank_order:
+            return rank_order.index(val)
+        return -1
+
+    if hand1[0] > hand2[0]:
+        return 1
+    elif hand1[0] < hand2[0]:
+        return -1
+    # Tiebreakers: rank names for (two) pair, the hand_type string otherwise
+    for a, b in zip(hand1[1], hand2[1]):
+        if safe_index(a) > safe_index(b):
+            return 1
+        elif safe_index(a) < safe_index(b):
+            return -1
+    for card1, card2 in zip(hand1[2], hand2[2]):
+        if safe_index(card1['rank']) > safe_index(card2['rank']):
+            return 1
+        elif safe_index(card1['rank']) < safe_index(card2['rank']):
+            return -1
+    return 0
+
+
+# --- reference: rank counts, written for clarity rather than speed ---
+
+def reference_evaluate(cards):
+    # (category, ranks to compare in order)
+    ranks = sorted((card >> 2 for card in cards), reverse=True)
+    counts = Counter(ranks)
+    # Ranks grouped by how often they appear, most often (then highest) first
+    groups = sorted(counts.items(), key=lambda item: (item[1], item[0]), reverse=True)
+    shape = [count for rank, count in groups]
+    ordered = tuple(rank for rank, count in groups)
+    flush = len({card & 3 for card in cards}) == 1
+
+    straight_high = None
+    if len(counts) == 5 and ranks[0] - ranks[4] == 4:
+        straight_high = ranks[0]
+    elif ranks == [12, 3, 2, 1, 0]:
+        # A-2-3-4-5: the ace plays low
+        straight_high = 3
+
+    if straight_high is not None and flush:
+        return (ROYAL_FLUSH if straight_high == 12 else STRAIGHT_FLUSH, (straight_high,))
+    if shape[0] == 4:
+        return (FOUR_OF_A_KIND, ordered)
+    if shape == [3, 2]:
+        return (FULL_HOUSE, ordered)
+    if flush:
+        return (FLUSH, ordered)
+    if straight_high is not None:
+        return (STRAIGHT, (straight_high,))
+    if shape[0] == 3:
+        return (THREE_OF_A_KIND, ordered)
+    if shape[:2] == [2, 2]:
+        return (TWO_PAIR, ordered)
+    if shape[0] == 2:
+        return (ONE_PAIR, ordered)
+    return (HIGH_CARD, ordered)
+
+
+def reference_category(value):
+    return value[0]
+
+
+def reference_compare(first, second):
+    return (first > second) - (first < second)
+
+
+IMPLEMENTATIONS = {
+    'lookup': (lookup_evaluate, lookup_category, lookup_compare),
+    'legacy': (legacy_evaluate, legacy_category, legacy_compare),
+    'reference': (reference_evaluate, reference_category, reference_compare),
+}
+
+
+# --- edge cases ---
+
+def _hand(text):
+    # "A♠ K♠ Q♠ J♠ 10♠" -> int cards
+    return encode_cards([{'rank': card[:-1], 'suit': card[-1]} for card in text.split()])
+
+
+# (first, second, expected sign): 1 first wins, -1 second wins, 0 split pot
+EDGE_CASES = [
+    # Wheels
+    ("A♠ 2♥ 3♦ 4♣ 5♠", "2♠ 3♥ 4♦ 5♣ 6♠", -1),
+    ("A♠ 2♥ 3♦ 4♣ 5♠", "K♠ Q♥ J♦ 9♣ 8♠", 1),
+    ("A♥ 2♥ 3♥ 4♥ 5♥", "2♠ 3♠ 4♠ 5♠ 6♠", -1),
+    ("A♥ 2♥ 3♥ 4♥ 5♥", "A♠ A♦ A♣ A♥ K♠", 1),
+    ("A♠ 2♥ 3♦ 4♣ 5♠", "A♥ 2♠ 3♣ 4♦ 5♥", 0),
+    # Broadway and ten high straights
+    ("10♠ J♥ Q♦ K♣ A♠", "9♠ 10♥ J♦ Q♣ K♠", 1),
+    ("6♠ 7♥ 8♦ 9♣ 10♠", "5♠ 6♥ 7♦ 8♣ 9♠", 1),
+    ("10♥ J♥ Q♥ K♥ A♥", "9♠ 10♠ J♠ Q♠ K♠", 1),
+    # Two pair kickers
+    ("A♠ A♥ K♦ K♣ Q♠", "A♦ A♣ K♥ K♠ J♠", 1),
+    ("A♠ A♥ 3♦ 3♣ K♠", "K♦ K♣ Q♥ Q♠ J♠", 1),
+    ("J♠ J♥ 10♦ 10♣ 2♠", "J♦ J♣ 9♥ 9♠ A♠", 1),
+    ("A♠ A♥ K♦ K♣ Q♠", "A♦ A♣ K♥ K♠ Q♥", 0),
+    # One pair and high card kickers
+    ("9♠ 9♥ A♦ 7♣ 2♠", "9♦ 9♣ A♥ 6♠ 5♠", 1),
+    ("9♠ 9♥ A♦ 7♣ 3♠", "9♦ 9♣ A♥ 7♠ 2♦", 1),
+    ("A♠ K♥ Q♦ J♣ 9♠", "A♥ K♠ Q♣ J♦ 8♥", 1),
+    ("A♠ K♥ Q♦ J♣ 9♠", "A♥ K♠ Q♣ J♦ 9♥", 0),
+    # Full houses, quads and flushes
+    ("3♠ 3♥ 3♦ 2♣ 2♠", "2♦ 2♥ 2♣ A♠ A♥", 1),
+    ("K♠ K♥ K♦ A♣ A♠", "K♣ Q♥ Q♦ Q♣ Q♠", -1),
+    ("7♠ 7♥ 7♦ 7♣ A♠", "7♠ 7♥ 7♦ 7♣ K♠", 1),
+    ("A♥ Q♥ 9♥ 5♥ 3♥", "A♠ Q♠ 9♠ 5♠ 2♠", 1),
+    ("A♥ Q♥ 9♥ 5♥ 3♥", "A♠ Q♠ 9♠ 5♠ 3♠", 0),
+    ("K♥ Q♥ J♥ 10♥ 8♥", "A♠ 2♠ 3♠ 4♠ 6♠", -1),
+]
+
+
+def _sign(value):
+    return (value > 0) - (value < 0)
+
+
+# --- workers ---
+
+def _count_chunk(task):
+    # Category counts for every hand whose lowest card is `first`
+    name, first = task
+    evaluate, category, compare = IMPLEMENTATIONS[name]
+    counts = Counter()
+    classes = set()
+    hands = 0
+    start = time.process_time()
+    for rest in combinations(range(first + 1, NUM_CARDS), 4):
+        value = evaluate((first,) + rest)
+        counts[category(value)] += 1
+        if name == 'lookup':
+            classes.add(value)
+        hands += 1
+    return name, counts, classes, hands, time.process_time() - start
+
+
+def _compare_pair(names, first, second):
+    # {name: sign} for one pair, and whether a disagreement is a known legacy defect
+    signs = {}
+    values = {}
+    for name in names:
+        evaluate, category, compare = IMPLEMENTATIONS[name]
+        values[name] = (evaluate(first), evaluate(second))
+        signs[name] = _sign(compare(*values[name]))
+    known = False
+    if len(set(signs.values())) > 1 and 'legacy' in names:
+        others = {sign for name, sign in signs.items() if name != 'legacy'}
+        known = len(others) <= 1 and legacy_known_defect(*values['legacy'])
+    return signs, known
+
+
+def _compare_chunk(task):
+    # Seeded random pairs through every implementation:
+    # (pairs, known legacy defects, disagreements, the first `limit` disagreements)
+    names, seed, count, limit = task
+    rng = random.Random(seed)
+    total = known = disagreements = 0
+    examples = []
+    for _ in range(count):
+        cards = rng.sample(range(NUM_CARDS), 10)
+        first, second = cards[:5], cards[5:]
+        if rng.random() < 0.25:
+            # Same ranks, different suits: a split pot unless one is a flush
+            second = [(card & ~3) | rng.randrange(4) for card in first]
+            if len(set(second)) < 5:
+                continue
+        total += 1
+        signs, is_known = _compare_pair(names, first, second)
+        if len(set(signs.values())) <= 1:
+            continue
+        if is_known:
+            known += 1
+            continue
+        disagreements += 1
+        if len(examples) < limit:
+            examples.append((first, second, signs))
+    return total, known, disagreements, examples
+
+
+def check_frequencies(names, pool):
+    tasks = [(name, first) for name in names for first in range(NUM_CARDS - 4)]
+    totals = {name: Counter() for name in names}
+    hands = Counter()
+    cpu = Counter()
+    classes = set()
+    wall = {}
+    start = time.perf_counter()
+    for name, counts, chunk_classes, count, seconds in pool.imap_unordered(_count_chunk, tasks):
+        totals[name].update(counts)
+        classes |= chunk_classes
+        hands[name] += count
+        cpu[name] += seconds
+        wall[name] = time.perf_counter() - start
+
+    ok = True
+    for name in names:
+        print(f'\n{name}: {hands[name]:,} hands, {hands[name] / cpu[name]:,.0f} hands/s per process, '
+              f'{cpu[name]:.1f}s CPU')
+        if hands[name] != TOTAL_HANDS:
+            print(f'  expected {TOTAL_HANDS:,} hands')
+            ok = False
+        for category in sorted(EXPECTED_FREQUENCIES, reverse=True):
+            got = totals[name][category]
+            expected = EXPECTED_FREQUENCIES[category]
+            flag = '' if got == expected else f'  MISMATCH (expected {expected:,})'
+            ok = ok and not flag
+            print(f'  {CATEGORY_NAMES[category]:16} {got:>10,}{flag}')
+    if 'lookup' in names:
+        print(f'  lookup equivalence classes: {len(classes):,} (expected {NUM_CLASSES:,})')
+        ok = ok and len(classes) == NUM_CLASSES
+    print(f'\nFrequencies checked in {time.perf_counter() - start:.1f}s wall')
+    return ok
+
+
+def check_edge_cases(names):
+    ok = True
+    for first_text, second_text, expected in EDGE_CASES:
+        first, second = _hand(first_text), _hand(second_text)
+        for name in names:
+            evaluate, category, compare = IMPLEMENTATIONS[name]
+            first_value, second_value = evaluate(first), evaluate(second)
+            got = _sign(compare(first_value, second_value))
+            if got == expected:
+                continue
+            if name == 'legacy' and legacy_known_defect(first_value, second_value):
+                print(f'  {name}: {first_text} vs {second_text}: got {got}, expected {expected} (known legacy defect)')
+                continue
+            ok = False
+            print(f'  {name}: {first_text} vs {second_text}: got {got}, expected {expected}')
+    print(f'Edge cases: {len(EDGE_CASES)} pairs x {len(names)} implementations, {"ok" if ok else "FAILED"}')
+    return ok
+
+
+def check_orderings(names, pool, pairs, seed, show=10):
+    chunk = 5000
+    tasks = []
+    for index in range(0, pairs, chunk):
+        tasks.append((names, f'{seed}-{index}', min(chunk, pairs - index), show))
+    start = time.perf_counter()
+    total = known = disagreements = 0
+    examples = []
+    for count, chunk_known, chunk_disagreements, chunk_examples in pool.imap_unordered(_compare_chunk, tasks):
+        total += count
+        known += chunk_known
+        disagreements += chunk_disagreements
+        examples.extend(chunk_examples)
+    elapsed = time.perf_counter() - start
+    print(f'Random pairs: {total:,} compared across {", ".join(names)} in {elapsed:.1f}s, '
+          f'{disagreements:,} disagreements, {known:,} known legacy defects')
+    for first, second, signs in examples[:show]:
+        print(f'  {format_cards(first)} vs {format_cards(second)}: {signs}')
+    return not disagreements
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Verify the five card evaluators against each other.')
+    parser.add_argument('--implementations', default=','.join(IMPLEMENTATIONS),
+                        help=f'comma separated subset of {",".join(IMPLEMENTATIONS)}')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--pairs', type=int, default=200000, help='random pairs to cross-check')
+    parser.add_argument('--seed', type=int, default=52)
+    parser.add_argument('--skip-frequencies', action='store_true', help='skip the full enumeration')
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.implementations.split(',') if name.strip()]
+    unknown = set(names) - set(IMPLEMENTATIONS)
+    if unknown:
+        parser.error(f'unknown implementations: {", ".join(sorted(unknown))}')
+
+    ok = check_edge_cases(names)
+    with Pool(args.processes) as pool:
+        if len(names) > 1:
+            ok = check_orderings(names, pool, args.pairs, args.seed) and ok
+        if not args.skip_frequencies:
+            ok = check_frequencies(names, pool) and ok
+    print('\nAll checks passed' if ok else '\nVERIFICATION FAILED')
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())